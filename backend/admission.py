@@ -0,0 +1,219 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from cost_model import CostModel, fit, prior
+from jobs import ACTIVE_STATUSES
+from models import SolverJob, SolverTiming
+from services import SolverProfile, solver_timing
+
+# Admission control for the solving endpoints. Before anything runs, the solve time
+# is estimated from the problem's shape with the cost model fitted on the recorded
+# timings (cost_model.py, solver_timings), and the request is
+#     run inline          estimate <= ADMISSION_SYNC_SECONDS
+#     deferred            up to ADMISSION_MAX_SECONDS: queued as a job, 202 (jobs.py)
+#     refused (413)       beyond: no worker would finish it in reasonable time
+# Each client (see client_id) may have CLIENT_MAX_CONCURRENT
+# solves under way (inline ones and queued/running jobs) and CLIENT_COMPUTE_SECONDS
+# of solve time per CLIENT_QUOTA_WINDOW_SECONDS, counting measured timings, the
+# estimates of its active jobs and of its inline solves; past either limit: 429 with
+# Retry-After. Inline solves are counted per API process.
+
+ADMISSION_SYNC_SECONDS = float(os.getenv("ADMISSION_SYNC_SECONDS", "5"))
+ADMISSION_MAX_SECONDS = float(os.getenv("ADMISSION_MAX_SECONDS", "7200"))
+CLIENT_MAX_CONCURRENT = int(os.getenv("CLIENT_MAX_CONCURRENT", "4"))
+CLIENT_COMPUTE_SECONDS = float(os.getenv("CLIENT_COMPUTE_SECONDS", "14400"))
+CLIENT_QUOTA_WINDOW_SECONDS = float(os.getenv("CLIENT_QUOTA_WINDOW_SECONDS", "3600"))
+CONCURRENCY_RETRY_SECONDS = 5
+
+COST_MODEL_SAMPLES = 200      # latest timings per (operation, solver) the model is fitted on
+COST_MODEL_TTL_SECONDS = 60   # a fitted model is reused this long before refitting
+
+CLIENT_HEADER = "X-Client-Id"
+# Addresses of the authenticating gateways allowed to name the client in CLIENT_HEADER
+TRUSTED_PROXIES = frozenset(filter(None, (host.strip() for host in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(","))))
+
+EXECUTE = "executer"
+DEFER = "differer"
+
+
+class AdmissionRefused(Exception):
+    def __init__(self, message: str, status_code: int, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def client_id(request) -> str:
+    """
+    Client a request is accounted to: the authenticated user when an authentication
+    middleware set one, else the caller's address. X-Client-Id is only believed from
+    TRUSTED_PROXIES: from anyone else, a new name per request would reset the quotas.
+    """
+    user = request.scope.get("user")
+    if user is not None and getattr(user, "is_authenticated", False):
+        return f"utilisateur:{user.identity}"
+    host = request.client.host if request.client else "inconnu"
+    if host in TRUSTED_PROXIES:
+        return request.headers.get(CLIENT_HEADER) or host
+    return host
+
+
+def duration_label(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    minutes = int(round(seconds / 60))
+    return f"{minutes} min" if minutes < 60 else f"{minutes // 60} h {minutes % 60:02d}"
+
+
+_models: Dict[Tuple[str, str], Tuple[float, CostModel]] = {}
+_models_lock = threading.Lock()
+
+
+def cost_model(db: Session, operation: str, solveur: str) -> CostModel:
+    key = (operation, solveur)
+    with _models_lock:
+        cached = _models.get(key)
+    if cached is not None and time.monotonic() - cached[0] < COST_MODEL_TTL_SECONDS:
+        return cached[1]
+    samples = (
+        db.query(
+            SolverTiming.n_rows, SolverTiming.n_cols, SolverTiming.densite,
+            SolverTiming.duree_secondes / func.coalesce(SolverTiming.nb_calculs, 1), # per computation
+        )
+        .filter(SolverTiming.operation == operation, SolverTiming.solveur == solveur)
+        .order_by(SolverTiming.id.desc())
+        .limit(COST_MODEL_SAMPLES)
+        .all()
+    )
+    model = fit(samples, prior(operation, solveur))
+    with _models_lock:
+        _models[key] = (time.monotonic(), model)
+    return model
+
+
+def estimate(db: Session, profile: SolverProfile) -> float:
+    return cost_model(db, profile.operation, profile.solveur).estimate(profile.n_rows, profile.n_cols, profile.densite)
+
+
+class _InlineSolves:
+    """Per-client count and estimated seconds of the inline solves under way in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_client: Dict[str, Tuple[int, float]] = {}
+
+    def add(self, client: str, seconds: float, sign: int = 1) -> None:
+        count, total = self.by_client.get(client, (0, 0.0))
+        count, total = count + sign, total + sign * seconds
+        if count <= 0:
+            self.by_client.pop(client, None)
+        else:
+            self.by_client[client] = (count, total)
+
+
+_inline = _InlineSolves()
+
+
+class Admission:
+    """An admitted request; holds its client's concurrency slot until released (with-block)."""
+
+    def __init__(self, client: str, profile: SolverProfile, estimate: float, decision: str, count: int = 1):
+        self.client = client
+        self.profile = profile
+        self.count = count
+        self.estimate = estimate
+        self.decision = decision
+        self.seconds: Optional[float] = None
+        self._held = True
+
+    @property
+    def deferred(self) -> bool:
+        return self.decision == DEFER
+
+    def release(self) -> None:
+        with _inline.lock:
+            if self._held:
+                _inline.add(self.client, self.estimate, -1)
+                self._held = False
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    @contextmanager
+    def timed(self) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        self.seconds = time.perf_counter() - started
+
+    def record(self, db: Session) -> None:
+        """Adds the measured timing to the session; the caller commits it with the result."""
+        if self.seconds is not None:
+            # A batch counts against the quotas in full; the model is fitted on its time per computation
+            db.add(solver_timing(self.profile, self.seconds, self.client, self.count))
+
+
+def _usage(db: Session, client: str, now: datetime) -> Tuple[float, Optional[datetime], int, float]:
+    """(measured seconds in the window, oldest timing in it, active jobs, their estimated seconds)."""
+    since = now - timedelta(seconds=CLIENT_QUOTA_WINDOW_SECONDS)
+    used, oldest = (
+        db.query(func.coalesce(func.sum(SolverTiming.duree_secondes), 0.0), func.min(SolverTiming.date_creation))
+        .filter(SolverTiming.client == client, SolverTiming.date_creation >= since)
+        .one()
+    )
+    jobs, reserved = (
+        db.query(func.count(SolverJob.id), func.coalesce(func.sum(SolverJob.estimation_secondes), 0.0))
+        .filter(SolverJob.client == client, SolverJob.statut.in_(ACTIVE_STATUSES))
+        .one()
+    )
+    if oldest is not None and oldest.tzinfo is None: # SQLite drops the time zone
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    return float(used), oldest, int(jobs), float(reserved)
+
+
+def admit(db: Session, client: str, profile: SolverProfile, deferrable: bool = True, count: int = 1) -> Admission:
+    """
+    Admits a solve or raises AdmissionRefused. The decision is DEFER only when the
+    endpoint can queue the work (deferrable) and the estimate is too long to wait for.
+    count solves of the same profile in one request (a scenario batch) are estimated together.
+    """
+    seconds = estimate(db, profile) * count
+    if seconds > ADMISSION_MAX_SECONDS:
+        batch = f"{count} x " if count > 1 else ""
+        raise AdmissionRefused(
+            f"Calcul refusé : {batch}{profile.n_rows} x {profile.n_cols} ({profile.solveur}) est estimé à "
+            f"{duration_label(seconds)}, au-delà de la limite de {duration_label(ADMISSION_MAX_SECONDS)}.",
+            413
+        )
+    now = datetime.now(timezone.utc)
+    used, oldest, jobs, reserved = _usage(db, client, now)
+    with _inline.lock:
+        running, running_seconds = _inline.by_client.get(client, (0, 0.0))
+        if running + jobs >= CLIENT_MAX_CONCURRENT:
+            raise AdmissionRefused(
+                f"Trop de calculs en cours pour ce client ({running + jobs} sur {CLIENT_MAX_CONCURRENT}) : "
+                "réessayez quand l'un d'eux sera terminé.",
+                429, CONCURRENCY_RETRY_SECONDS
+            )
+        committed = used + reserved + running_seconds
+        if committed + seconds > CLIENT_COMPUTE_SECONDS:
+            window_end = (oldest or now) + timedelta(seconds=CLIENT_QUOTA_WINDOW_SECONDS)
+            raise AdmissionRefused(
+                f"Quota de calcul dépassé : {duration_label(committed)} utilisées ou réservées sur "
+                f"{duration_label(CLIENT_COMPUTE_SECONDS)} par période de {duration_label(CLIENT_QUOTA_WINDOW_SECONDS)}, "
+                f"et ce calcul est estimé à {duration_label(seconds)}.",
+                429, max(1, math.ceil((window_end - now).total_seconds()))
+            )
+        _inline.add(client, seconds)
+    decision = DEFER if deferrable and seconds > ADMISSION_SYNC_SECONDS else EXECUTE
+    return Admission(client, profile, seconds, decision, count)
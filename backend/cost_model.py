@@ -0,0 +1,94 @@
+import math
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Solve-time model behind admission control (admission.py). For one operation and
+# solver,
+#     seconds = t_ref * (cells / REFERENCE_CELLS) ** exposant * densite ** exposant_densite
+# where cells = n * m and densite is the share of allowed routes. It is a straight
+# line in log space, fitted by least squares on the recorded timings (solver_timings);
+# until a solver has enough of them, the priors below (measured on random instances,
+# standard mode, one core) stand in.
+
+REFERENCE_CELLS = 10_000
+MIN_SAMPLES = 5           # fewer timings: the prior is used as is
+MIN_LOG_SPREAD = math.log(2) # a feature whose samples span less than a factor 2 keeps its prior exponent
+EXPONENT_RANGE = (0.5, 4.0)  # a fitted size exponent outside this is noise: the prior's is kept
+MIN_SECONDS = 1e-4        # timer resolution and call overhead; shorter timings are clamped
+
+
+class CostModel(NamedTuple):
+    t_ref: float            # seconds at REFERENCE_CELLS, every route allowed
+    exposant: float
+    exposant_densite: float = 0.0
+    echantillons: int = 0   # 0: prior
+
+    def estimate(self, n_rows: int, n_cols: int, densite: float = 1.0) -> float:
+        cells = max(1, n_rows * n_cols)
+        return (
+            self.t_ref
+            * (cells / REFERENCE_CELLS) ** self.exposant
+            * max(densite, 1e-3) ** self.exposant_densite
+        )
+
+
+PRIORS = {
+    ("solve", "cno"): CostModel(2.5e-3, 1.0),
+    ("solve", "hammer"): CostModel(0.15, 1.5),
+    ("solve", "sinkhorn"): CostModel(0.12, 1.1),
+    ("solve", "hongroise"): CostModel(0.02, 1.2),
+    ("optimize", "hongroise"): CostModel(0.02, 1.2),
+    ("optimize", "stepping_stone"): CostModel(150.0, 2.5), # dense: pivots grow with the basis too
+    ("optimize", "stepping_stone_lean"): CostModel(0.04, 1.4),
+    # Warm start from the previous optimal basis after a PATCH: at most a lean optimization
+    ("reoptimize", "stepping_stone_lean"): CostModel(0.04, 1.4),
+    # Per scenario of a batch (solve_scenarios), cold start of the first one included
+    ("scenarios", "stepping_stone_lean"): CostModel(0.09, 1.4),
+}
+DEFAULT_PRIOR = CostModel(1.0, 2.0)
+
+
+def prior(operation: str, solveur: str) -> CostModel:
+    return PRIORS.get((operation, solveur), DEFAULT_PRIOR)
+
+
+def fit(samples: Iterable[Tuple[int, int, float, float]], base: Optional[CostModel] = None) -> CostModel:
+    """
+    Least-squares fit of log(seconds) on log(cells) and log(densite) from
+    (n_rows, n_cols, densite, seconds) samples. Features without enough spread
+    keep the exponent of base (the prior): a model fitted on one size only
+    shifts the prior's level, it does not invent a slope.
+    """
+    base = base or DEFAULT_PRIOR
+    data = np.asarray([(n * m, d, s) for n, m, d, s in samples], dtype=np.float64).reshape(-1, 3)
+    if len(data) < MIN_SAMPLES:
+        return base
+    x = np.log(np.maximum(data[:, 0], 1.0) / REFERENCE_CELLS)
+    z = np.log(np.clip(data[:, 1], 1e-3, 1.0))
+    y = np.log(np.maximum(data[:, 2], MIN_SECONDS))
+
+    def solve(free_size: bool, free_density: bool) -> CostModel:
+        target = y.copy()
+        columns = [np.ones_like(x)]
+        if free_size:
+            columns.append(x)
+        else:
+            target -= base.exposant * x
+        if free_density:
+            columns.append(z)
+        else:
+            target -= base.exposant_densite * z
+        coef, *_ = np.linalg.lstsq(np.column_stack(columns), target, rcond=None)
+        coef = list(coef)
+        level = coef.pop(0)
+        exposant = coef.pop(0) if free_size else base.exposant
+        exposant_densite = coef.pop(0) if free_density else base.exposant_densite
+        return CostModel(float(math.exp(level)), float(exposant), float(exposant_densite), len(data))
+
+    free_size = bool(np.ptp(x) >= MIN_LOG_SPREAD)
+    free_density = bool(np.ptp(z) >= MIN_LOG_SPREAD)
+    model = solve(free_size, free_density)
+    if free_size and not EXPONENT_RANGE[0] <= model.exposant <= EXPONENT_RANGE[1]:
+        model = solve(False, free_density)
+    return model
@@ -0,0 +1,205 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import ResultJSON, TransportTask, stored_result
+from solvers.delta import plan_result, result_plan
+from utils import dumps_json
+
+try: # Optional: Parquet and Arrow exports are only offered when the package is installed
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Bulk export of the task history (GET /tasks/export). The tasks are read by id
+# through a server-side cursor, EXPORT_BATCH_SIZE rows at a time, and each batch is
+# encoded and sent before the next is fetched: a chunked response whose memory
+# stays at one batch however many tasks there are. Active results are exported in
+# sparse form (cellules/flux, as stored for matrix-file tasks); costs are not,
+# they live in their matrix (matrice_id, GET /matrices/{id}).
+#   ndjson    one JSON object per line
+#   csv       one row per task, list columns as JSON text
+#   parquet   one row group per batch (pyarrow)
+#   arrow     Arrow IPC stream, one record batch per batch (pyarrow)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+NDJSON = "ndjson"
+CSV = "csv"
+PARQUET = "parquet"
+ARROW = "arrow"
+
+EXPORT_FORMATS = (NDJSON, CSV, PARQUET, ARROW) if pa is not None else (NDJSON, CSV)
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv; charset=utf-8",
+    PARQUET: "application/vnd.apache.parquet",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {NDJSON: "ndjson", CSV: "csv", PARQUET: "parquet", ARROW: "arrows"}
+
+TASK_FIELDS = (
+    "id", "nom", "algo_utilise", "n_rows", "n_cols", "offres", "demandes", "matrice_id",
+    "cout_total", "is_optimized", "date_creation", "date_derniere_maj",
+)
+EXPORT_FIELDS = TASK_FIELDS + ("cellules", "flux")
+
+# Plain columns, never whole entities: rows are tuples that go with their batch. The
+# result is read as stored, its cells exported without rebuilding the dense allocation
+EXPORT_COLUMNS = tuple(getattr(TransportTask, field) for field in TASK_FIELDS) + (
+    stored_result(TransportTask.resultat).label("resultat"),
+)
+
+
+def export_statement():
+    """SELECT of the exported columns; filter it like a query, export_batches orders it."""
+    return select(*EXPORT_COLUMNS)
+
+
+def export_record(row: Any) -> Dict[str, Any]:
+    """One task as exported: its columns and the active result's cells."""
+    record = {field: getattr(row, field) for field in TASK_FIELDS}
+    n = row.n_rows if row.n_rows is not None else len(row.offres)
+    m = row.n_cols if row.n_cols is not None else len(row.demandes)
+    record["n_rows"], record["n_cols"] = n, m
+    result = row.resultat
+    if result:
+        result = result.get(ResultJSON.SPARSE_ALLOCATION_KEY) or result
+    if not result:
+        record["cellules"] = record["flux"] = None
+    elif result.get("cellules") is not None:
+        record["cellules"], record["flux"] = result["cellules"], result["flux"]
+    else:
+        sparse = plan_result(result_plan(result), n, m, dense=False)
+        record["cellules"], record["flux"] = sparse["cellules"], sparse["flux"]
+    return record
+
+
+def export_batches(db: Session, statement) -> Iterator[List[Dict[str, Any]]]:
+    """The statement's rows in id order, EXPORT_BATCH_SIZE at a time, from a server-side cursor."""
+    result = db.execute(statement.order_by(TransportTask.id).execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for rows in result.partitions():
+        yield [export_record(row) for row in rows]
+
+
+# --- Encoders: one chunk per batch -----------------------------------------------
+
+def _ndjson(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    for records in batches:
+        yield b"".join(dumps_json(record) + b"\n" for record in records)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return dumps_json(value).decode("utf-8")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _csv(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_FIELDS)
+    for records in batches:
+        writer.writerows([_csv_value(record[field]) for field in EXPORT_FIELDS] for record in records)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8") # header only: nothing matched
+
+
+def arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("nom", pa.string()),
+        ("algo_utilise", pa.string()),
+        ("n_rows", pa.int32()),
+        ("n_cols", pa.int32()),
+        ("offres", pa.list_(pa.int64())),
+        ("demandes", pa.list_(pa.int64())),
+        ("matrice_id", pa.int64()),
+        ("cout_total", pa.float64()),
+        ("is_optimized", pa.bool_()),
+        ("date_creation", pa.timestamp("us", tz="UTC")),
+        ("date_derniere_maj", pa.timestamp("us", tz="UTC")),
+        ("cellules", pa.list_(pa.list_(pa.int32(), 2))),
+        ("flux", pa.list_(pa.float64())),
+    ])
+
+
+class _ChunkSink:
+    """Write-only file for the Arrow writers; what they wrote is taken out after each batch."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _arrow(batches: Iterable[List[Dict]], parquet: bool) -> Iterator[bytes]:
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    for records in batches:
+        writer.write_batch(pa.RecordBatch.from_pylist(records, schema=schema)) # Parquet: one row group each
+        yield sink.take()
+    writer.close() # Parquet footer / end-of-stream marker
+    yield sink.take()
+
+
+def encode_batches(fmt: str, batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    if fmt == NDJSON:
+        return _ndjson(batches)
+    if fmt == CSV:
+        return _csv(batches)
+    return _arrow(batches, parquet=fmt == PARQUET)
+
+
+def stream_export(session_factory: Callable[[], Session], statement, fmt: str) -> Iterator[bytes]:
+    """
+    Chunks of the export. The session is the generator's own: the response body is
+    sent after the request's session is gone, and the cursor stays open until the end.
+    """
+    db = session_factory()
+    try:
+        for chunk in encode_batches(fmt, export_batches(db, statement)):
+            if chunk:
+                yield chunk
+    finally:
+        db.close()
+
+
+def export_filename(fmt: str, now: Optional[datetime] = None) -> str:
+    return f"taches-{(now or datetime.utcnow()).strftime('%Y%m%d-%H%M%S')}.{EXTENSIONS[fmt]}"
@@ -0,0 +1,118 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from models import ResultVersion, TransportTask
+from solvers.delta import Plan, apply_plan_changes, compose_changes, plan_changes, plan_result, result_plan
+
+# Version history of a task's result. Each solve, optimization or edit that
+# replaces the active result appends a version holding only its changes from the
+# previous one, so the history grows with the number of cells that move, not with
+# n x m. Keyframes hold the whole plan (sparse: about n + m cells): the first
+# version, any version after the dimensions changed, every
+# VERSION_KEYFRAME_INTERVAL-th, and versions whose changes are as large as a plan
+# anyway. A version is rebuilt from its keyframe and at most
+# VERSION_KEYFRAME_INTERVAL - 1 change lists; a diff between two versions only
+# reads the change lists in between.
+
+VERSION_KEYFRAME_INTERVAL = 32
+KEYFRAME_CHANGE_SHARE = 0.5 # changes to more than this share of the plan's cells: stored as a keyframe
+
+INITIAL = "initial"
+OPTIMIZED = "optimise"
+EDITED = "modification"
+
+
+def latest_version(db: Session, task_id: int) -> Optional[ResultVersion]:
+    return (
+        db.query(ResultVersion)
+        .filter(ResultVersion.task_id == task_id)
+        .order_by(ResultVersion.version.desc())
+        .first()
+    )
+
+
+def get_version(db: Session, task_id: int, version: int) -> Optional[ResultVersion]:
+    return (
+        db.query(ResultVersion)
+        .filter(ResultVersion.task_id == task_id, ResultVersion.version == version)
+        .first()
+    )
+
+
+def version_plan(db: Session, row: ResultVersion) -> Plan:
+    keyframe = row if row.base_version == row.version else get_version(db, row.task_id, row.base_version)
+    plan = {(i, j): q for (i, j), q in zip(keyframe.plan["cellules"], keyframe.plan["flux"])}
+    steps = (
+        db.query(ResultVersion.modifications)
+        .filter(
+            ResultVersion.task_id == row.task_id,
+            ResultVersion.version > keyframe.version,
+            ResultVersion.version <= row.version,
+        )
+        .order_by(ResultVersion.version)
+    )
+    for (changes,) in steps:
+        apply_plan_changes(plan, changes)
+    return plan
+
+
+def version_result(db: Session, row: ResultVersion) -> dict:
+    """The version's result as it was stored on the task: dense allocation or cellules/flux."""
+    return {**plan_result(version_plan(db, row), row.n_rows, row.n_cols, row.dense), "cout_total": row.cout_total}
+
+
+def record_version(db: Session, task: TransportTask, result: dict, source: str) -> ResultVersion:
+    """Adds the task's new active result to its history; the caller commits it with the task."""
+    if task.id is None:
+        db.flush()
+    # The task row lock orders the writers of its history (endpoints, jobs, scheduler): two
+    # of them reading the same latest version would both insert it + 1. Held until commit.
+    db.query(TransportTask.id).filter(TransportTask.id == task.id).with_for_update().first()
+    n, m = len(task.offres), len(task.demandes)
+    plan = result_plan(result)
+    last = latest_version(db, task.id)
+    changes = None
+    if last is not None and (last.n_rows, last.n_cols) == (n, m):
+        changes = plan_changes(version_plan(db, last), plan)
+    keyframe = (
+        changes is None
+        or last.version - last.base_version + 1 >= VERSION_KEYFRAME_INTERVAL
+        or len(changes) > KEYFRAME_CHANGE_SHARE * max(1, len(plan))
+    )
+    version = 1 if last is None else last.version + 1
+    row = ResultVersion(
+        task_id=task.id,
+        version=version,
+        base_version=version if keyframe else last.base_version,
+        source=source,
+        n_rows=n,
+        n_cols=m,
+        dense="allocation" in result,
+        cout_total=result.get("cout_total"),
+        plan=plan_result(plan, n, m, dense=False) if keyframe else None,
+        modifications=changes,
+        nb_modifications=len(plan) if changes is None else len(changes),
+    )
+    db.add(row)
+    return row
+
+
+def versions_diff(db: Session, task_id: int, depuis: int, version: int) -> List[List]:
+    """
+    Changes [i, j, value in depuis, value in version] between two versions, in
+    either order. ValueError when the dimensions changed in between.
+    """
+    low, high = sorted((depuis, version))
+    steps = [
+        changes for (changes,) in
+        db.query(ResultVersion.modifications)
+        .filter(ResultVersion.task_id == task_id, ResultVersion.version > low, ResultVersion.version <= high)
+        .order_by(ResultVersion.version)
+    ]
+    if any(changes is None for changes in steps):
+        raise ValueError(f"Les dimensions du problème ont changé entre les versions {low} et {high}.")
+    net = compose_changes(steps)
+    if depuis > version:
+        net = [[i, j, after, before] for i, j, before, after in net]
+    return net
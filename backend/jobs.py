@@ -0,0 +1,228 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models import SolverJob, TransportTask
+from matrices import task_costs
+from history import INITIAL, OPTIMIZED, record_version
+from services import (
+    apply_initial_result, apply_optimized_result, initial_result, optimization_source, optimized_result, solver_profile,
+    solver_timing
+)
+
+logger = logging.getLogger(__name__)
+
+# Durable job queue in the solver_jobs table: the API enqueues solve/optimize jobs
+# and any number of workers (worker.py), on any machine sharing the database, claim
+# them with SELECT ... FOR UPDATE SKIP LOCKED.
+#
+#   en_attente --claim--> en_cours --success--> termine
+#        ^                    |
+#        +---- retry ---------+--(no attempt left / bad input)--> echoue
+#
+# A claimed job carries a lease the worker renews while it computes. When a worker
+# dies the lease runs out and the job is claimed again, as a new attempt. Results
+# are written only by the worker still holding the job, in the same transaction
+# that marks it done. Times are UTC from the workers' clocks, which must be in sync.
+# A job that ends echoue writes its error on the task (erreur_calcul), until the
+# next stored result clears it.
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "5")) # doubled at each attempt
+
+PENDING = "en_attente"
+RUNNING = "en_cours"
+DONE = "termine"
+FAILED = "echoue"
+ACTIVE_STATUSES = (PENDING, RUNNING)
+
+JOB_TYPES = ("solve", "optimize")
+
+
+class PermanentJobError(Exception):
+    """The job can never succeed (bad input, missing task): no retry."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(
+    db: Session, job_type: str, task_id: int, client: Optional[str] = None, estimation: Optional[float] = None
+) -> SolverJob:
+    """
+    Adds a job to the session; the caller commits it with the task changes.
+    client and estimation (seconds) count the job against its client's quotas (admission.py).
+    """
+    job = SolverJob(
+        type=job_type,
+        task_id=task_id,
+        client=client,
+        estimation_secondes=estimation,
+        statut=PENDING,
+        tentatives=0,
+        tentatives_max=JOB_MAX_ATTEMPTS,
+        disponible_a=_now(),
+    )
+    db.add(job)
+    return job
+
+
+def active_job(db: Session, task_id: int, job_type: str) -> Optional[SolverJob]:
+    return (
+        db.query(SolverJob)
+        .filter(SolverJob.task_id == task_id, SolverJob.type == job_type, SolverJob.statut.in_(ACTIVE_STATUSES))
+        .order_by(SolverJob.id.desc())
+        .first()
+    )
+
+
+def claim(db: Session, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[SolverJob]:
+    """Oldest claimable job, now leased to worker_id; None when the queue is empty."""
+    while True:
+        now = _now()
+        job = (
+            db.query(SolverJob)
+            .filter(or_(
+                and_(SolverJob.statut == PENDING, SolverJob.disponible_a <= now),
+                and_(SolverJob.statut == RUNNING, SolverJob.bail_expire_a < now), # its worker died
+            ))
+            .order_by(SolverJob.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.commit()
+            return None
+        if job.statut == RUNNING and job.tentatives >= job.tentatives_max:
+            _finish(job, FAILED, "Bail expiré pendant la dernière tentative.")
+            _report_failure(db, job)
+            db.commit()
+            continue
+        job.statut = RUNNING
+        job.tentatives += 1
+        job.worker = worker_id
+        job.bail_expire_a = now + timedelta(seconds=lease_seconds)
+        job.date_debut = now
+        db.commit()
+        return job
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> bool:
+    """False once the job is no longer ours (lease expired and re-claimed, or finished)."""
+    updated = (
+        db.query(SolverJob)
+        .filter(SolverJob.id == job_id, SolverJob.worker == worker_id, SolverJob.statut == RUNNING)
+        .update({SolverJob.bail_expire_a: _now() + timedelta(seconds=lease_seconds)}, synchronize_session=False)
+    )
+    db.commit()
+    return bool(updated)
+
+
+def _finish(job: SolverJob, statut: str, erreur: Optional[str] = None) -> None:
+    job.statut = statut
+    job.erreur = erreur
+    job.bail_expire_a = None
+    job.date_fin = _now()
+
+
+def _report_failure(db: Session, job: SolverJob) -> None:
+    """
+    A job that failed for good leaves its error on the task, so the task does not just
+    keep an empty or stale result: the task's validators change with it (date_derniere_maj).
+    """
+    task = db.query(TransportTask).filter(TransportTask.id == job.task_id).with_for_update().first()
+    if task is not None:
+        task.erreur_calcul = f"{'Résolution' if job.type == 'solve' else 'Optimisation'} (job {job.id}) : {job.erreur}"
+        task.date_derniere_maj = datetime.utcnow()
+
+
+def _owned(db: Session, job_id: int, worker_id: str) -> Optional[SolverJob]:
+    job = db.query(SolverJob).filter(SolverJob.id == job_id).with_for_update().first()
+    if job is None or job.worker != worker_id or job.statut != RUNNING:
+        return None
+    return job
+
+
+def fail(db: Session, job_id: int, worker_id: str, erreur: str, retry: bool = True) -> None:
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        db.rollback()
+        return
+    if retry and job.tentatives < job.tentatives_max:
+        job.statut = PENDING
+        job.erreur = erreur
+        job.worker = None
+        job.bail_expire_a = None
+        job.disponible_a = _now() + timedelta(seconds=JOB_RETRY_DELAY_SECONDS * 2 ** (job.tentatives - 1))
+    else:
+        _finish(job, FAILED, erreur)
+        _report_failure(db, job)
+    db.commit()
+
+
+def _compute(job_type: str, task_id: int, stamp, algo: str, offres, demandes, couts, source: Optional[dict]) -> dict:
+    if job_type == "solve":
+        return initial_result(algo, offres, demandes, couts)
+    if not source:
+        raise PermanentJobError("Aucune solution de base disponible pour l'optimisation.")
+    return optimized_result(source, offres, demandes, couts, task_id=task_id, stamp=stamp)
+
+
+def execute(session_factory: Callable[[], Session], job_id: int, worker_id: str) -> str:
+    """Runs a claimed job and records the outcome; returns the job's new status."""
+    db = session_factory()
+    try:
+        job = db.get(SolverJob, job_id)
+        task = db.get(TransportTask, job.task_id)
+        task_id = job.task_id
+        try:
+            if task is None:
+                raise PermanentJobError("Tâche supprimée.")
+            if job.type not in JOB_TYPES:
+                raise PermanentJobError(f"Type de job inconnu : {job.type}")
+            # Plain values only: no transaction stays open, nothing reloads during the solve
+            job_type, stamp, client = job.type, task.date_derniere_maj, job.client
+            problem = (task.algo_utilise, task.offres, task.demandes, task_costs(db, task))
+            source = optimization_source(task) if job_type == "optimize" else None
+            db.commit()
+            started = time.perf_counter()
+            result = _compute(job_type, task_id, stamp, *problem, source)
+            seconds = time.perf_counter() - started
+        except (PermanentJobError, ValueError) as e:
+            db.rollback()
+            fail(db, job_id, worker_id, str(e), retry=False)
+            return FAILED
+        except Exception as e:
+            logger.exception("Job %s : échec de la tentative", job_id)
+            db.rollback()
+            fail(db, job_id, worker_id, f"{type(e).__name__}: {e}")
+            return db.get(SolverJob, job_id).statut
+
+        job = _owned(db, job_id, worker_id)
+        if job is None: # lease lost: another worker owns this job now
+            db.rollback()
+            return RUNNING
+        # The timing feeds the admission cost model even when the result is dropped
+        db.add(solver_timing(solver_profile(job_type, *problem), seconds, client))
+        task = db.query(TransportTask).filter(TransportTask.id == task_id).with_for_update().first()
+        if task is None or task.date_derniere_maj != stamp:
+            _finish(job, FAILED, "La tâche a été modifiée pendant le calcul.")
+        else:
+            if job_type == "solve":
+                apply_initial_result(task, result)
+                task.date_derniere_maj = datetime.utcnow()
+            else:
+                apply_optimized_result(task, result)
+            record_version(db, task, result, INITIAL if job_type == "solve" else OPTIMIZED)
+            _finish(job, DONE)
+        db.commit()
+        return job.statut
+    finally:
+        db.close()
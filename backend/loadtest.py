@@ -0,0 +1,314 @@
+"""
+End-to-end load test of the API.
+
+    python loadtest.py                                   # starts main:app on a free port
+    python loadtest.py --url http://127.0.0.1:8000       # targets a running instance
+    python loadtest.py --duration 60 --concurrency 16 \\
+        --mix create=2,get=6,list=2,update=1,optimize=1 --sizes 5x5,50x50,200x200 --json report.json
+
+The started server uses the database configured in .env (run it against a local,
+disposable database: the test creates tasks and never deletes them). Traffic is
+generated from a seeded RNG, so two runs with the same options send the same
+instances in the same proportions. Results are reported per endpoint and per
+problem size: throughput, error count and latency percentiles.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_MIX = "create=2,get=6,list=2,update=1,optimize=1"
+DEFAULT_SIZES = "5x5,20x20,50x50"
+PERCENTILES = (50, 90, 99)
+MAX_COST = 100
+
+Sample = Tuple[str, str, int, float] # (endpoint, size, HTTP status, latency in seconds)
+
+
+def generate_instance(n: int, m: int, rng: random.Random) -> Dict:
+    """Balanced random instance: total supply equals total demand."""
+    offres = [rng.randint(10, 100) for _ in range(n)]
+    total = sum(offres)
+    cuts = sorted(rng.sample(range(1, total), m - 1)) if m > 1 else []
+    demandes = [b - a for a, b in zip([0] + cuts, cuts + [total])]
+    couts = [[rng.randint(1, MAX_COST) for _ in range(m)] for _ in range(n)]
+    return {"offres": offres, "demandes": demandes, "couts": couts}
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Opérations inconnues : {', '.join(sorted(unknown))}")
+    return mix
+
+
+def parse_sizes(text: str) -> List[Tuple[int, int]]:
+    return [tuple(int(x) for x in size.lower().split("x")) for size in text.split(",")]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest-rank: a value that was actually observed
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection per load-generating thread."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Optional[Dict]]:
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        for attempt in (1, 2): # a server-closed keep-alive connection is reopened once
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+class LoadTest:
+
+    def __init__(self, base_url: str, mix: Dict[str, int], sizes: List[Tuple[int, int]], seed: int, timeout: float):
+        self.base_url = base_url
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.sizes = sizes
+        self.seed = seed
+        self.timeout = timeout
+        self.tasks: List[Tuple[int, str]] = [] # (task id, size label) created during the run
+        self.lock = threading.Lock()
+        self.samples: List[Sample] = []
+
+    def _known_task(self, rng: random.Random) -> Optional[Tuple[int, str]]:
+        with self.lock:
+            return rng.choice(self.tasks) if self.tasks else None
+
+    def _record(self, samples: List[Sample], endpoint: str, size: str, status: int, started: float) -> None:
+        samples.append((endpoint, size, status, time.perf_counter() - started))
+
+    def run_one(self, client: Client, rng: random.Random, samples: List[Sample]) -> None:
+        operation = rng.choices(self.operations, self.weights)[0]
+        known = self._known_task(rng) if operation in ("get", "update", "optimize") else None
+        if operation in ("get", "update", "optimize") and known is None:
+            operation = "create" # nothing to read or change yet
+        OPERATIONS[operation](self, client, rng, samples, known)
+
+    def worker(self, index: int, deadline: float) -> None:
+        rng = random.Random(f"{self.seed}-{index}")
+        client = Client(self.base_url, self.timeout)
+        samples: List[Sample] = []
+        while time.perf_counter() < deadline:
+            try:
+                self.run_one(client, rng, samples)
+            except (OSError, http.client.HTTPException):
+                samples.append(("erreur réseau", "-", 0, 0.0))
+        with self.lock:
+            self.samples.extend(samples)
+
+    def run(self, duration: float, concurrency: int, warmup: float) -> float:
+        if warmup > 0: # fills the task pool and warms the server, not measured
+            self._run_threads(warmup, concurrency)
+            self.samples.clear()
+        return self._run_threads(duration, concurrency)
+
+    def _run_threads(self, duration: float, concurrency: int) -> float:
+        started = time.perf_counter()
+        deadline = started + duration
+        threads = [threading.Thread(target=self.worker, args=(k, deadline)) for k in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def _size_label(n: int, m: int) -> str:
+    return f"{n}x{m}"
+
+
+def op_create(test: LoadTest, client: Client, rng: random.Random, samples: List[Sample], _known) -> None:
+    n, m = rng.choice(test.sizes)
+    body = {"nom": f"charge-{rng.getrandbits(32):08x}", "algo_utilise": rng.choice(["cno", "hammer"])}
+    body.update(generate_instance(n, m, rng))
+    started = time.perf_counter()
+    status, data = client.request("POST", "/solve/", body)
+    test._record(samples, "POST /solve/", _size_label(n, m), status, started)
+    if status == 200 and data:
+        with test.lock:
+            test.tasks.append((data["id"], _size_label(n, m)))
+
+
+def op_get(test: LoadTest, client: Client, rng: random.Random, samples: List[Sample], known) -> None:
+    task_id, size = known
+    started = time.perf_counter()
+    status, _ = client.request("GET", f"/solve/{task_id}")
+    test._record(samples, "GET /solve/{id}", size, status, started)
+
+
+def op_list(test: LoadTest, client: Client, rng: random.Random, samples: List[Sample], _known) -> None:
+    started = time.perf_counter()
+    status, _ = client.request("GET", "/tasks/?limit=25")
+    test._record(samples, "GET /tasks/", "-", status, started)
+
+
+def op_update(test: LoadTest, client: Client, rng: random.Random, samples: List[Sample], known) -> None:
+    task_id, size = known
+    n, m = (int(x) for x in size.split("x"))
+    body = {"couts": generate_instance(n, m, rng)["couts"]} # same shape, new costs: forces a re-solve
+    started = time.perf_counter()
+    status, _ = client.request("PUT", f"/solve/{task_id}", body)
+    test._record(samples, "PUT /solve/{id}", size, status, started)
+
+
+def op_optimize(test: LoadTest, client: Client, rng: random.Random, samples: List[Sample], known) -> None:
+    task_id, size = known
+    started = time.perf_counter()
+    status, _ = client.request("POST", f"/solve/{task_id}/optimize/stepping-stone")
+    test._record(samples, "POST /solve/{id}/optimize", size, status, started)
+
+
+OPERATIONS = {
+    "create": op_create,
+    "get": op_get,
+    "list": op_list,
+    "update": op_update,
+    "optimize": op_optimize,
+}
+
+
+def summarize(samples: List[Sample], elapsed: float) -> List[Dict]:
+    groups: Dict[Tuple[str, str], List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[(sample[0], sample[1])].append(sample)
+        if sample[1] != "-":
+            groups[(sample[0], "*")].append(sample) # all sizes together
+    rows = []
+    for (endpoint, size), group in sorted(groups.items()):
+        latencies = sorted(s[3] for s in group if 200 <= s[2] < 300)
+        row = {
+            "endpoint": endpoint,
+            "taille": size,
+            "requetes": len(group),
+            "erreurs": sum(1 for s in group if not 200 <= s[2] < 300),
+            "req_par_s": round(len(group) / elapsed, 2),
+        }
+        for p in PERCENTILES:
+            row[f"p{p}_ms"] = round(percentile(latencies, p) * 1000, 2)
+        row["max_ms"] = round(latencies[-1] * 1000, 2) if latencies else float("nan")
+        rows.append(row)
+    return rows
+
+
+def print_report(rows: List[Dict], elapsed: float, total: int) -> None:
+    columns = ["endpoint", "taille", "requetes", "erreurs", "req_par_s"] + [f"p{p}_ms" for p in PERCENTILES] + ["max_ms"]
+    widths = {c: max(len(c), *(len(str(row[c])) for row in rows)) for c in columns} if rows else {}
+    print(f"\n{total} requêtes en {elapsed:.1f} s ({total / elapsed:.1f} req/s)\n")
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, extra_env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """uvicorn main:app from this directory, so it picks up the same .env and database."""
+    port = _free_port()
+    env = {**os.environ, **extra_env}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    client = Client(base_url, timeout=2)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("Le serveur s'est arrêté au démarrage (voir les logs ci-dessus).")
+        try:
+            if client.request("GET", "/")[0] == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Le serveur n'a pas répondu en 60 s.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API de transport")
+    parser.add_argument("--url", help="instance déjà lancée ; sinon main:app est démarré localement")
+    parser.add_argument("--server-workers", type=int, default=1, help="processus uvicorn du serveur démarré")
+    parser.add_argument("--duration", type=float, default=30, help="durée mesurée, en secondes")
+    parser.add_argument("--warmup", type=float, default=5, help="préchauffage non mesuré, en secondes")
+    parser.add_argument("--concurrency", type=int, default=8, help="clients simultanés")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="poids des opérations : create, get, list, update, optimize")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="tailles des instances générées, ex. 5x5,50x50")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="délai maximal d'une requête, en secondes")
+    parser.add_argument("--json", help="écrit aussi le rapport dans ce fichier")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        # Background re-optimization would compete with the measured traffic
+        server, base_url = start_server(args.server_workers, {"REOPTIMIZE_WORKERS": "0"})
+    try:
+        test = LoadTest(base_url, parse_mix(args.mix), parse_sizes(args.sizes), args.seed, args.timeout)
+        elapsed = test.run(args.duration, args.concurrency, args.warmup)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    rows = summarize(test.samples, elapsed)
+    print_report(rows, elapsed, len(test.samples))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "options": vars(args),
+                "duree_s": elapsed,
+                "resultats": rows,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
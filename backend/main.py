@@ -1,12 +1,60 @@
-from fastapi import FastAPI
-from database import engine, Base
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from database import engine, Base, SessionLocal
+from migrations import upgrade_schema
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from routers.transport import router as transport
 from routers.task import router as task
+from routers.jobs import router as jobs
+from routers.matrices import router as matrices
+from scheduler import ActivityHeartbeat, ReoptimizationScheduler, request_load
+from timing import log_if_slow, start_request
+
+try: # Optional: brotli for clients that accept it, with gzip fallback for the others
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optimizes un-optimized tasks while the API is idle, when REOPTIMIZE_WORKERS > 0 (off by default);
+    # the heartbeat tells a scheduler in another process (worker.py --reoptimize) about this one's requests
+    heartbeat = ActivityHeartbeat(SessionLocal)
+    heartbeat.start()
+    scheduler = ReoptimizationScheduler(SessionLocal)
+    scheduler.start()
+    yield
+    scheduler.stop()
+    heartbeat.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+
+@app.middleware("http")
+async def track_request_load(request: Request, call_next):
+    # The background scheduler only starts new work when nothing is in flight
+    request_load.begin()
+    try:
+        return await call_next(request)
+    finally:
+        request_load.end()
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    # Stage breakdown (timing.py) in a Server-Timing header, and a log line when slow
+    timings = start_request()
+    response = await call_next(request)
+    total_ms = timings.elapsed_ms()
+    response.headers["Server-Timing"] = timings.header(total_ms)
+    log_if_slow(timings, request.method, request.url.path, response.status_code, total_ms)
+    return response
 
 
 origins = [
@@ -20,11 +68,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "Link", "Server-Timing", "Retry-After"],  # total and next page of a filtered /tasks/ page; stage timings; quotas
 )
 
+# Matrices compress very well; tiny payloads are not worth the CPU
+COMPRESSION_MIN_SIZE = 1024
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
 # Inclure le routeur des prêts bancaires
 app.include_router(transport)
 app.include_router(task)
+app.include_router(jobs)
+app.include_router(matrices)
 
 @app.get("/")
 async def root_status():
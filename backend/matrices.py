@@ -0,0 +1,343 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import CostMatrix, TransportTask
+from solvers.basis import SCAN_CHUNK_CELLS
+from solvers.delta import apply_cost_changes
+
+try: # Optional: faster canonical serialization for hashing
+    import orjson
+except ImportError:
+    orjson = None
+
+# Cost matrices live in cost_matrices, one row per distinct content, and tasks point
+# at them through matrice_id: the hundreds of tasks sharing a matrix with different
+# supplies and demands store it once. Rows are keyed by a SHA-256 of the content and
+# count the tasks referencing them (acquire/release); an inline matrix goes away
+# with its last task, a registered file stays until deleted through /matrices.
+#
+# Matrices too large for JSON (20k x 20k and up) are registered as .npy files and
+# read through a read-only memory map: only the pages a solver touches are loaded,
+# and every process mapping the same file shares them in the page cache. Workers
+# on other machines need the same directory (shared storage).
+#
+# Content never changes once stored, so each process caches what it loaded by id.
+
+COST_MATRIX_DIR = os.getenv("COST_MATRIX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cost_matrices"))
+COST_MATRIX_CACHE_SIZE = int(os.getenv("COST_MATRIX_CACHE_SIZE", "64")) # matrices kept per process
+# Share of the cells a task may edit on top of its shared matrix before it gets its own copy
+COST_OVERLAY_MAX_SHARE = float(os.getenv("COST_OVERLAY_MAX_SHARE", "0.1"))
+
+MEDIA_NPY = "application/x-npy"        # .npy file, header included
+MEDIA_RAW = "application/octet-stream" # bare C-order array: dtype and shape given as parameters
+
+ALLOWED_KINDS = "iuf" # integer and float costs
+
+
+class MatrixFile(NamedTuple):
+    """Picklable reference to a registered matrix: each process maps the file itself."""
+    id: int
+    fichier: str
+
+    @property
+    def chemin(self) -> str:
+        return os.path.join(COST_MATRIX_DIR, self.fichier)
+
+
+Costs = Union[List[List[Optional[float]]], MatrixFile]
+
+
+class LRUCache:
+    """Small thread-safe LRU, e.g. matrix id -> inline couts or MatrixFile (also used by tiles.py)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def discard(self, key: Any) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+
+_cache = LRUCache(COST_MATRIX_CACHE_SIZE)
+
+
+def open_matrix(matrix: MatrixFile) -> np.ndarray:
+    """Read-only memory map of the matrix; nothing is read until a solver indexes it."""
+    return np.load(matrix.chemin, mmap_mode="r")
+
+
+def matrix_costs(db: Session, matrix_id: int) -> Optional[Costs]:
+    """
+    What the solvers (services.py) take as couts for this matrix: the JSON list,
+    shared with the cache (never modify it), or a MatrixFile. None if unknown.
+    """
+    costs = _cache.get(matrix_id)
+    if costs is not None:
+        return costs
+    row = db.query(CostMatrix.id, CostMatrix.fichier, CostMatrix.couts).filter(CostMatrix.id == matrix_id).first()
+    if row is None:
+        return None
+    costs = MatrixFile(row.id, row.fichier) if row.fichier else row.couts
+    _cache.put(matrix_id, costs)
+    return costs
+
+
+def task_costs(db: Session, task: TransportTask) -> Optional[Costs]:
+    """The task's effective costs: its shared matrix with its own edits on top."""
+    if task.matrice_id is None:
+        return task.couts # row not migrated yet
+    costs = matrix_costs(db, task.matrice_id)
+    if task.modifications_couts and isinstance(costs, list):
+        costs = apply_cost_changes(costs, task.modifications_couts)
+    return costs
+
+
+def merge_cost_changes(base: Costs, overlay: Optional[List[List]], changes: List[List]) -> Optional[List[List]]:
+    """Task edits after adding changes; cells back to the shared matrix's value are dropped."""
+    cells = {(i, j): cout for i, j, cout in overlay or []}
+    for i, j, cout in changes:
+        cells[(i, j)] = cout
+    merged = [[i, j, cout] for (i, j), cout in cells.items() if base[i][j] != cout]
+    return merged or None
+
+
+def edit_task_costs(db: Session, task: TransportTask, couts: List[List[Any]], changes: List[List]) -> None:
+    """
+    Records cell edits (PATCH): couts is the task's edited matrix. The edits are kept
+    on the task, so the write is the size of the edit and the shared matrix is left
+    alone; past COST_OVERLAY_MAX_SHARE of the cells the task moves to its own matrix.
+    """
+    if task.matrice_id is None:
+        task.couts = couts # row not migrated yet
+        return
+    overlay = merge_cost_changes(matrix_costs(db, task.matrice_id), task.modifications_couts, changes)
+    n, m = len(couts), len(couts[0]) if couts else 0
+    if overlay and len(overlay) > COST_OVERLAY_MAX_SHARE * n * m:
+        previous_matrix = task.matrice_id
+        task.matrice_id = acquire_inline(db, couts, task.nom)
+        overlay = None
+        release(db, previous_matrix)
+    task.modifications_couts = overlay
+
+
+def _canonical_json(couts: List[List[Any]]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(couts)
+    return json.dumps(couts, separators=(",", ":")).encode()
+
+
+def inline_fingerprint(couts: List[List[Any]]) -> Tuple[str, int]:
+    """(SHA-256, size in bytes) of an inline matrix's canonical JSON."""
+    data = _canonical_json(couts)
+    return hashlib.sha256(b"json:" + data).hexdigest(), len(data)
+
+
+def acquire(db: Session, matrix_id: int, count: int = 1) -> bool:
+    """count more tasks use the matrix; False if it does not exist."""
+    updated = (
+        db.query(CostMatrix)
+        .filter(CostMatrix.id == matrix_id)
+        .update({CostMatrix.nb_references: CostMatrix.nb_references + count}, synchronize_session=False)
+    )
+    return bool(updated)
+
+
+def acquire_inline(db: Session, couts: List[List[Any]], nom: str) -> int:
+    """
+    Id of the row holding this matrix, created if needed, with one more reference.
+    Runs in the caller's transaction: the reference is committed with the task.
+    """
+    empreinte, taille = inline_fingerprint(couts)
+    while True:
+        matrix_id = db.query(CostMatrix.id).filter(CostMatrix.empreinte == empreinte).scalar()
+        # The increment can miss a row that release() deleted in between: then insert
+        if matrix_id is not None and acquire(db, matrix_id):
+            return matrix_id
+        matrix = CostMatrix(
+            nom=nom,
+            empreinte=empreinte,
+            couts=couts,
+            n_rows=len(couts),
+            n_cols=len(couts[0]) if couts else 0,
+            taille_octets=taille,
+            nb_references=1,
+        )
+        try:
+            with db.begin_nested():
+                db.add(matrix)
+        except IntegrityError: # the same matrix was inserted concurrently: use that row
+            continue
+        return matrix.id
+
+
+def release(db: Session, matrix_id: Optional[int], count: int = 1) -> None:
+    """
+    count tasks less; an inline matrix no task uses any more is deleted. Pending task
+    changes are flushed first, so the task rows no longer point at the matrix.
+    """
+    if matrix_id is None:
+        return
+    db.flush()
+    (
+        db.query(CostMatrix)
+        .filter(CostMatrix.id == matrix_id)
+        .update({CostMatrix.nb_references: CostMatrix.nb_references - count}, synchronize_session=False)
+    )
+    deleted = (
+        db.query(CostMatrix)
+        .filter(CostMatrix.id == matrix_id, CostMatrix.nb_references <= 0, CostMatrix.fichier.is_(None))
+        .delete(synchronize_session=False)
+    )
+    if deleted:
+        forget_matrix(matrix_id)
+
+
+def forget_matrix(matrix_id: int) -> None:
+    """Drops a deleted matrix from this process's cache."""
+    _cache.discard(matrix_id)
+
+
+def raw_dtype(name: str) -> np.dtype:
+    try:
+        dtype = np.dtype(name)
+    except TypeError:
+        raise ValueError(f"Type de données inconnu : {name}")
+    if dtype.kind not in ALLOWED_KINDS:
+        raise ValueError("Les coûts doivent être des entiers ou des flottants.")
+    return dtype
+
+
+def _scan(array: np.ndarray) -> str:
+    """
+    One pass by row chunks over the mapped file: SHA-256 of dtype, shape and the
+    values in C order (the same for a raw upload and any .npy of the same array),
+    and the check that float costs are finite. Forbidden routes (NaN) are refused
+    because their big-M penalty depends on each task's supplies and would need a copy.
+    """
+    n, m = array.shape
+    digest = hashlib.sha256(f"npy:{array.dtype.str}:{n}x{m}:".encode())
+    step = max(1, SCAN_CHUNK_CELLS // max(m, 1))
+    for r0 in range(0, n, step):
+        block = np.ascontiguousarray(array[r0:r0 + step])
+        if array.dtype.kind == "f" and not np.isfinite(block).all():
+            raise ValueError(
+                "La matrice contient des valeurs non finies : les routes interdites (NaN) ne sont pas "
+                "prises en charge dans une matrice enregistrée, utilisez un coût prohibitif."
+            )
+        digest.update(block.data)
+    return digest.hexdigest()
+
+
+def _check_matrix(path: str) -> Tuple[np.dtype, Tuple[int, int], str]:
+    with open(path, "rb") as f:
+        if f.read(len(np.lib.format.MAGIC_PREFIX)) != np.lib.format.MAGIC_PREFIX:
+            raise ValueError("Le contenu n'est pas un fichier .npy.")
+    try:
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+    except (ValueError, OSError, EOFError) as e:
+        raise ValueError(f"Fichier .npy illisible : {e}")
+    if not isinstance(array, np.ndarray) or array.ndim != 2 or 0 in array.shape:
+        raise ValueError("Le fichier doit contenir une matrice à deux dimensions non vide.")
+    if array.dtype.kind not in ALLOWED_KINDS:
+        raise ValueError("Les coûts doivent être des entiers ou des flottants.")
+    return array.dtype, array.shape, _scan(array)
+
+
+class StoredMatrix(NamedTuple):
+    fichier: str
+    dtype: np.dtype
+    shape: Tuple[int, int]
+    taille_octets: int
+    empreinte: str
+
+
+async def store_matrix(
+    chunks: AsyncIterable[bytes],
+    media_type: str,
+    dtype: Optional[str] = None,
+    shape: Optional[Tuple[int, int]] = None
+) -> StoredMatrix:
+    """
+    Writes an uploaded matrix to COST_MATRIX_DIR chunk by chunk and validates it.
+    A raw array is stored with a .npy header in front of it, so every stored file
+    opens the same way. Files are named after their content hash: an identical
+    upload lands on the same file. Raises ValueError, leaving nothing behind, when
+    the upload is not a valid cost matrix.
+    """
+    os.makedirs(COST_MATRIX_DIR, exist_ok=True)
+    partial = os.path.join(COST_MATRIX_DIR, f"{uuid.uuid4().hex}.part")
+    try:
+        with open(partial, "wb") as f:
+            if media_type == MEDIA_RAW:
+                if dtype is None or shape is None:
+                    raise ValueError("Un tableau brut demande les paramètres dtype, n_rows et n_cols.")
+                array_dtype = raw_dtype(dtype)
+                expected = shape[0] * shape[1] * array_dtype.itemsize
+                np.lib.format.write_array_header_2_0(f, {
+                    "descr": np.lib.format.dtype_to_descr(array_dtype),
+                    "fortran_order": False,
+                    "shape": tuple(shape),
+                })
+                received = 0
+                async for chunk in chunks:
+                    received += len(chunk)
+                    if received > expected: # stop before filling the disk
+                        raise ValueError(f"Taille incorrecte : {expected} octets attendus pour {shape[0]} x {shape[1]} {array_dtype}.")
+                    f.write(chunk)
+                if received != expected:
+                    raise ValueError(f"Taille incorrecte : {received} octets reçus, {expected} attendus.")
+            elif media_type == MEDIA_NPY:
+                async for chunk in chunks:
+                    f.write(chunk)
+            else:
+                raise ValueError(f"Type de contenu non pris en charge : {media_type}")
+        # Reads the whole file once: off the event loop
+        array_dtype, array_shape, empreinte = await run_in_threadpool(_check_matrix, partial)
+        fichier = f"{empreinte}.npy"
+        path = os.path.join(COST_MATRIX_DIR, fichier)
+        taille = os.path.getsize(partial)
+        if os.path.exists(path): # same content already stored: mapped files are never rewritten
+            os.remove(partial)
+        else:
+            os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return StoredMatrix(fichier, array_dtype, array_shape, taille, empreinte)
+
+
+def remove_matrix_file(fichier: str) -> None:
+    # Callers check first that no row still points at the file
+    try:
+        os.remove(os.path.join(COST_MATRIX_DIR, fichier))
+    except FileNotFoundError:
+        pass
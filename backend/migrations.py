@@ -0,0 +1,135 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.schema import CreateIndex
+
+from matrices import acquire_inline
+from models import CostMatrix, SolverJob, TransportTask
+
+logger = logging.getLogger(__name__)
+
+# Base.metadata.create_all only creates missing tables: columns and indexes added
+# to an existing table are brought in here. Every step is idempotent, so this runs
+# at each start-up right after create_all.
+
+ADDED_COLUMNS = {
+    "transport_tasks": [
+        ("n_rows", "INTEGER"),
+        ("n_cols", "INTEGER"),
+        ("optimization_checkpoint", "JSON"),
+        ("matrice_id", "INTEGER REFERENCES cost_matrices(id)"),
+        ("modifications_couts", "JSON"),
+        ("erreur_calcul", "TEXT"),
+        ("reoptimisation_vaine", "TIMESTAMP WITH TIME ZONE"),
+    ],
+    "cost_matrices": [
+        ("empreinte", "VARCHAR(64)"),
+        ("couts", "JSON"),
+        ("nb_references", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+    "solver_timings": [
+        ("nb_calculs", "INTEGER NOT NULL DEFAULT 1"),
+    ],
+    "solver_jobs": [
+        ("client", "VARCHAR"),
+        ("estimation_secondes", "FLOAT"),
+    ],
+}
+
+# Columns that became nullable. SQLite cannot alter them, but create_all already
+# creates new SQLite tables with the current definition.
+RELAXED_COLUMNS = {
+    "transport_tasks": ["couts"], # the matrix now lives in cost_matrices
+    "cost_matrices": ["fichier", "dtype"], # inline matrices have neither
+}
+
+MOVE_COSTS_BATCH = 200 # tasks per transaction when moving couts to cost_matrices
+
+# Substring search (ILIKE '%abc%') on nom: a GIN trigram index, PostgreSQL only
+TRIGRAM_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_transport_tasks_nom_trgm "
+    "ON transport_tasks USING gin (nom gin_trgm_ops)"
+)
+
+
+def _add_columns(engine: Engine) -> None:
+    inspector = inspect(engine)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        with engine.begin() as conn:
+            for name, ddl_type in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+
+
+def _relax_not_null(engine: Engine) -> None:
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table, columns in RELAXED_COLUMNS.items():
+            for name in columns:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {name} DROP NOT NULL"))
+
+
+def _backfill_dimensions(engine: Engine) -> None:
+    # Rows created before n_rows/n_cols existed; the JSON arrays give the sizes
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE transport_tasks "
+            "SET n_rows = json_array_length(offres), n_cols = json_array_length(demandes) "
+            "WHERE n_rows IS NULL OR n_cols IS NULL"
+        ))
+
+
+def _move_costs_to_matrices(engine: Engine) -> None:
+    # Rows created before cost_matrices: each matrix is stored once and referenced,
+    # batch by batch, so an interrupted start-up resumes where it stopped
+    last_id = 0
+    while True:
+        with Session(bind=engine) as db:
+            tasks = (
+                db.query(TransportTask)
+                .options(load_only(TransportTask.id, TransportTask.nom, TransportTask.couts, TransportTask.matrice_id))
+                .filter(TransportTask.matrice_id.is_(None), TransportTask.id > last_id)
+                .order_by(TransportTask.id)
+                .limit(MOVE_COSTS_BATCH)
+                .all()
+            )
+            if not tasks:
+                return
+            for task in tasks:
+                if task.couts is not None:
+                    task.matrice_id = acquire_inline(db, task.couts, task.nom)
+                    task.couts = None
+            last_id = tasks[-1].id
+            db.commit()
+            logger.info("Matrices de coûts partagées : tâches jusqu'à %s migrées", last_id)
+
+
+def _create_indexes(engine: Engine) -> None:
+    # IF NOT EXISTS rather than checkfirst: reflection does not see expression indexes
+    with engine.begin() as conn:
+        for index in [*TransportTask.__table__.indexes, *CostMatrix.__table__.indexes, *SolverJob.__table__.indexes]:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(TRIGRAM_INDEX))
+    except SQLAlchemyError as e:
+        # Needs a role allowed to create extensions; substring search still works, unindexed
+        logger.warning("Index trigramme sur nom non créé : %s", e)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    _add_columns(engine)
+    _relax_not_null(engine)
+    _backfill_dimensions(engine)
+    _create_indexes(engine) # before the move: the unique hash index deduplicates it
+    _move_costs_to_matrices(engine)
@@ -1,8 +1,80 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, Text, Boolean, Index, ForeignKey, type_coerce
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from database import Base  # Assure-toi d’avoir Base depuis ton engine SQLAlchemy
 
+
+class ResultJSON(TypeDecorator):
+    """
+    JSON column holding a result. A dense allocation is written as its basis cells
+    under SPARSE_ALLOCATION_KEY and rebuilt when the row is loaded, so each write is
+    the size of the plan (n + m - 1 cells), not n x m. The other keys are stored as
+    they are, so they can still be extracted in SQL; rows written with the dense
+    allocation are read unchanged.
+    """
+    impl = JSON
+    cache_ok = True
+
+    SPARSE_ALLOCATION_KEY = "allocation_creuse" # {"n_rows", "n_cols", "cellules", "flux"}
+
+    def process_bind_param(self, value, dialect):
+        if not isinstance(value, dict) or value.get("allocation") is None:
+            return value
+        allocation = value["allocation"]
+        cells = [(i, j, q) for i, row in enumerate(allocation) for j, q in enumerate(row) if q is not None]
+        stored = {key: item for key, item in value.items() if key != "allocation"}
+        stored[self.SPARSE_ALLOCATION_KEY] = {
+            "n_rows": len(allocation),
+            "n_cols": len(allocation[0]) if allocation else 0,
+            "cellules": [[i, j] for i, j, _ in cells],
+            "flux": [q for _, _, q in cells],
+        }
+        return stored
+
+    def process_result_value(self, value, dialect):
+        if not isinstance(value, dict) or self.SPARSE_ALLOCATION_KEY not in value:
+            return value
+        value = dict(value)
+        sparse = value.pop(self.SPARSE_ALLOCATION_KEY)
+        allocation = [[None] * sparse["n_cols"] for _ in range(sparse["n_rows"])]
+        for (i, j), q in zip(sparse["cellules"], sparse["flux"]):
+            allocation[i][j] = q
+        return {"allocation": allocation, **value}
+
+
+def stored_result(column):
+    """
+    A ResultJSON column read as stored: a dense allocation stays as its cells under
+    ResultJSON.SPARSE_ALLOCATION_KEY, for readers that want them (tiles, export)
+    rather than the n x m rebuild.
+    """
+    return type_coerce(column, JSON)
+
+class CostMatrix(Base):
+    """
+    Cost matrix shared by tasks through matrice_id, stored once per content (see
+    matrices.py). Either inline JSON (the couts sent with a task, None marking a
+    forbidden route) or a .npy file under COST_MATRIX_DIR, registered through
+    /matrices for instances too large for JSON and read through a memory map.
+    """
+    __tablename__ = "cost_matrices"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nom = Column(String, nullable=False)
+    # SHA-256 of the content (matrices.py): identical matrices share one row
+    empreinte = Column(String(64), nullable=True, unique=True, index=True)
+    couts = Column(JSON, nullable=True)    # inline matrix
+    fichier = Column(String, nullable=True) # file matrix, relative to COST_MATRIX_DIR
+    dtype = Column(String, nullable=True)   # file matrix: numpy dtype, e.g. "<f4"
+    n_rows = Column(Integer, nullable=False)
+    n_cols = Column(Integer, nullable=False)
+    taille_octets = Column(BigInteger, nullable=False)
+    # Tasks using the matrix; an inline matrix is deleted when it drops to 0
+    nb_references = Column(Integer, nullable=False, default=0, server_default="0")
+    date_creation = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class TransportTask(Base):
     __tablename__ = "transport_tasks"
 
@@ -10,18 +82,152 @@ class TransportTask(Base):
     nom = Column(String, nullable=False)
     offres = Column(JSON, nullable=False)
     demandes = Column(JSON, nullable=False)
-    couts = Column(JSON, nullable=False)
-    algo_utilise = Column(String, nullable=False)  # "coin" ou "hammer"
+    couts = Column(JSON, nullable=True) # rows older than cost_matrices only; see matrice_id
+    matrice_id = Column(Integer, ForeignKey("cost_matrices.id"), nullable=True, index=True)
+    # Cells edited through PATCH on top of the shared matrix: [[i, j, cout], ...]
+    modifications_couts = Column(JSON, nullable=True)
+    algo_utilise = Column(String, nullable=False)  # "cno", "hammer" ou "sinkhorn"
+    # Problem dimensions, stored so the history can be filtered without reading couts
+    n_rows = Column(Integer, nullable=True)
+    n_cols = Column(Integer, nullable=True)
 
     # result stores the current active solution (can be initial or optimized)
-    resultat = Column(JSON, nullable=True)  # allocation + cout_total
+    resultat = Column(ResultJSON, nullable=True)  # allocation + cout_total
     # cout_total is deprecated here, should be part of 'resultat' to keep things consistent.
     # For now, I will keep it to minimize immediate breaking changes, but it should be refactored.
     cout_total = Column(Float, nullable=True)
 
-    initial_result = Column(JSON, nullable=True) # Stores the result from CNO/Hammer
-    optimized_result = Column(JSON, nullable=True) # Stores the result from Stepping Stone
+    initial_result = Column(ResultJSON, nullable=True) # Stores the result from CNO/Hammer
+    optimized_result = Column(ResultJSON, nullable=True) # Stores the result from Stepping Stone
     is_optimized = Column(Boolean, default=False, nullable=False)
+    # Basis of an optimization still in progress: {"allocation", "cout_total", "iteration"}
+    optimization_checkpoint = Column(ResultJSON, nullable=True)
+    # Why the last queued solve/optimize of this task failed for good (jobs.py); cleared by the next result
+    erreur_calcul = Column(Text, nullable=True)
+    # date_derniere_maj of the task when the background re-optimization (scheduler.py) last
+    # ran on it without certifying the optimum: it is only picked up again once edited
+    reoptimisation_vaine = Column(DateTime(timezone=True), nullable=True)
 
     date_creation = Column(DateTime(timezone=True), server_default=func.now())
     date_derniere_maj = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        # Name prefix search (LIKE 'abc%'), independent of the database collation.
+        # The trigram index for substring search needs pg_trgm: see migrations.py
+        Index("ix_transport_tasks_nom_prefix", "nom", postgresql_ops={"nom": "text_pattern_ops"}),
+        Index("ix_transport_tasks_algo_date", "algo_utilise", "date_creation"),
+        Index("ix_transport_tasks_optimized_date", "is_optimized", "date_creation"),
+        Index("ix_transport_tasks_date_creation", "date_creation"),
+        Index("ix_transport_tasks_cout_total", "cout_total"),
+        Index("ix_transport_tasks_dimensions", "n_rows", "n_cols"),
+    )
+
+
+# Pick-up order of the background re-optimization (scheduler.py): smallest, then
+# oldest un-optimized task. Partial, so optimized tasks cost nothing here.
+Index(
+    "ix_transport_tasks_reoptimize",
+    TransportTask.n_rows * TransportTask.n_cols,
+    TransportTask.date_creation,
+    postgresql_where=TransportTask.is_optimized.is_(False),
+)
+
+
+class SolverJob(Base):
+    """
+    Solve/optimize request waiting for, or handled by, a queue worker (worker.py).
+    Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED and hold them under a
+    lease they keep renewing; an expired lease means the worker died and the job
+    can be claimed again.
+    """
+    __tablename__ = "solver_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String, nullable=False) # "solve" (CNO/Hammer) or "optimize" (Stepping Stone)
+    task_id = Column(Integer, ForeignKey("transport_tasks.id", ondelete="CASCADE"), nullable=False, index=True)
+    statut = Column(String, nullable=False, default="en_attente") # en_attente, en_cours, termine, echoue
+    tentatives = Column(Integer, nullable=False, default=0)
+    tentatives_max = Column(Integer, nullable=False, default=3)
+    disponible_a = Column(DateTime(timezone=True), nullable=False) # not claimable before (retry back-off)
+    bail_expire_a = Column(DateTime(timezone=True), nullable=True)
+    worker = Column(String, nullable=True)
+    erreur = Column(Text, nullable=True)
+    # Admission control (admission.py): who asked, and the solve time it was admitted at
+    client = Column(String, nullable=True, index=True)
+    estimation_secondes = Column(Float, nullable=True)
+
+    date_creation = Column(DateTime(timezone=True), server_default=func.now())
+    date_debut = Column(DateTime(timezone=True), nullable=True)
+    date_fin = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Claim scan: pending jobs by availability, running jobs by lease expiry
+        Index("ix_solver_jobs_claim", "statut", "disponible_a"),
+        Index("ix_solver_jobs_lease", "statut", "bail_expire_a"),
+    )
+
+
+class ApiActivity(Base):
+    """
+    Request activity of one API process, published by scheduler.ActivityHeartbeat so
+    that a background re-optimization running in another process knows when the API is idle.
+    """
+    __tablename__ = "api_activity"
+
+    processus = Column(String, primary_key=True) # host-pid
+    requetes_en_cours = Column(Integer, nullable=False, default=0)
+    derniere_activite = Column(DateTime(timezone=True), nullable=False)
+
+
+class SolverTiming(Base):
+    """
+    Measured duration of one solve (inline or by a queue worker): the samples the
+    admission cost model is fitted on (cost_model.py), and each client's compute
+    usage for its quota (admission.py).
+    """
+    __tablename__ = "solver_timings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    operation = Column(String, nullable=False) # "solve", "optimize", "reoptimize" or "scenarios"
+    solveur = Column(String, nullable=False)   # cno, hammer, sinkhorn, hongroise, stepping_stone, stepping_stone_lean
+    n_rows = Column(Integer, nullable=False)
+    n_cols = Column(Integer, nullable=False)
+    densite = Column(Float, nullable=False)    # share of allowed routes
+    duree_secondes = Column(Float, nullable=False)
+    # Computations the duration covers (a scenario batch: one per scenario); the model is fitted per computation
+    nb_calculs = Column(Integer, nullable=False, default=1, server_default="1")
+    client = Column(String, nullable=True)
+    date_creation = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Latest samples of one solver; a client's usage over the quota window
+        Index("ix_solver_timings_model", "operation", "solveur", "id"),
+        Index("ix_solver_timings_client", "client", "date_creation"),
+    )
+
+
+class ResultVersion(Base):
+    """
+    One version of a task's result (history.py). Every version stores its changes
+    from the previous one, [[i, j, before, after], ...]; keyframes also store the
+    whole plan, sparse, and any version is rebuilt from the keyframe it follows.
+    """
+    __tablename__ = "result_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("transport_tasks.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)      # 1, 2, ... per task
+    base_version = Column(Integer, nullable=False) # keyframe this version is rebuilt from (itself for a keyframe)
+    source = Column(String, nullable=False)        # "initial", "optimise" or "modification"
+    n_rows = Column(Integer, nullable=False)
+    n_cols = Column(Integer, nullable=False)
+    dense = Column(Boolean, nullable=False)        # stored as an allocation matrix (else cellules/flux)
+    cout_total = Column(Float, nullable=True)
+    plan = Column(JSON, nullable=True)             # keyframes: {"cellules": [[i, j]], "flux": [...]}
+    modifications = Column(JSON, nullable=True)    # None when the dimensions changed
+    nb_modifications = Column(Integer, nullable=False, default=0)
+    date_creation = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_result_versions_task_version", "task_id", "version", unique=True),
+    )
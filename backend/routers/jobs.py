@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Depends, Path
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from database import get_db
+from models import SolverJob
+from schemas import SolverJobOut
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/{job_id}", response_model=SolverJobOut)
+def get_job(job_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    job = db.query(SolverJob).filter(SolverJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return job
+
+
+def job_accepted(job: SolverJob) -> JSONResponse:
+    """202 answer of an endpoint that queued a job instead of computing inline."""
+    return JSONResponse(
+        jsonable_encoder(SolverJobOut.model_validate(job)),
+        status_code=202,
+        headers={"Location": f"{router.prefix}/{job.id}"}
+    )
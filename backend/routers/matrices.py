@@ -0,0 +1,141 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import get_db
+from models import CostMatrix
+from schemas import CostMatrixOut, MatrixRepricing, MatrixRepricingResult
+from matrices import MEDIA_NPY, MEDIA_RAW, forget_matrix, remove_matrix_file, store_matrix
+from solvers.delta import apply_cost_changes
+from tariffs import reprice_matrix
+from timing import note, stage
+
+router = APIRouter(prefix="/matrices", tags=["Matrices"])
+
+# The body is streamed to disk, never held in memory: declared by hand for the docs
+MATRIX_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            MEDIA_NPY: {"schema": {"type": "string", "format": "binary"}},
+            MEDIA_RAW: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+
+def _save(db: Session, matrix: CostMatrix) -> CostMatrix:
+    """The new row, or the row already registered with the same content."""
+    existing = db.query(CostMatrix).filter(CostMatrix.empreinte == matrix.empreinte).first()
+    if existing is not None:
+        return existing
+    db.add(matrix)
+    try:
+        db.commit()
+    except IntegrityError: # identical upload registered concurrently
+        db.rollback()
+        return db.query(CostMatrix).filter(CostMatrix.empreinte == matrix.empreinte).one()
+    db.refresh(matrix)
+    return matrix
+
+
+@router.post(
+    "/", response_model=CostMatrixOut, status_code=201, openapi_extra=MATRIX_UPLOAD_OPENAPI,
+    responses={200: {"model": CostMatrixOut, "description": "Matrice identique déjà enregistrée"}}
+)
+async def register_matrix(
+    request: Request,
+    nom: str = Query(..., min_length=1),
+    dtype: Optional[str] = Query(None, description="Tableau brut : type numpy des coûts, ex. float32, <i4"),
+    n_rows: Optional[int] = Query(None, gt=0, description="Tableau brut : nombre d'offres"),
+    n_cols: Optional[int] = Query(None, gt=0, description="Tableau brut : nombre de demandes"),
+    db: Session = Depends(get_db)
+):
+    media_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    shape = (n_rows, n_cols) if n_rows and n_cols else None
+    try:
+        stored = await store_matrix(request.stream(), media_type, dtype, shape)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    matrix = CostMatrix(
+        nom=nom,
+        empreinte=stored.empreinte,
+        fichier=stored.fichier,
+        dtype=stored.dtype.str,
+        n_rows=stored.shape[0],
+        n_cols=stored.shape[1],
+        taille_octets=stored.taille_octets,
+        nb_references=0,
+    )
+    saved = await run_in_threadpool(_save, db, matrix)
+    if saved is not matrix: # identical content: the existing registration is returned
+        return JSONResponse(jsonable_encoder(CostMatrixOut.model_validate(saved)), status_code=200)
+    return saved
+
+
+@router.get("/", response_model=List[CostMatrixOut])
+def list_matrices(db: Session = Depends(get_db)):
+    return db.query(CostMatrix).order_by(CostMatrix.date_creation.desc(), CostMatrix.id.desc()).all()
+
+
+@router.get("/{matrix_id}", response_model=CostMatrixOut)
+def get_matrix(matrix_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    matrix = db.query(CostMatrix).filter(CostMatrix.id == matrix_id).first()
+    if not matrix:
+        raise HTTPException(status_code=404, detail="Matrice de coûts non trouvée")
+    return matrix
+
+
+@router.post("/{matrix_id}/tarifs", response_model=MatrixRepricingResult)
+def reprice_matrix_tasks(repricing: MatrixRepricing, matrix_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    # New costs for every stored plan on the matrix, without re-solving (tariffs.py)
+    query = db.query(CostMatrix).filter(CostMatrix.id == matrix_id)
+    matrix = (query.with_for_update() if repricing.appliquer else query).first()
+    if not matrix:
+        raise HTTPException(status_code=404, detail="Matrice de coûts non trouvée")
+    if matrix.fichier:
+        raise HTTPException(
+            status_code=400,
+            detail="Les coûts d'une matrice enregistrée ne se modifient pas : enregistrez la nouvelle matrice."
+        )
+    n, m = matrix.n_rows, matrix.n_cols
+    if repricing.couts is not None:
+        if len(repricing.couts) != n or any(len(row) != m for row in repricing.couts):
+            raise HTTPException(status_code=400, detail=f"'couts' doit être une matrice {n} x {m}.")
+        couts = repricing.couts
+    else:
+        if any(not (0 <= c.i < n and 0 <= c.j < m) for c in repricing.modifications):
+            raise HTTPException(status_code=400, detail=f"Indice hors de la matrice ({n} x {m}).")
+        couts = apply_cost_changes(matrix.couts, [[c.i, c.j, c.cout] for c in repricing.modifications])
+    note(n_rows=n, n_cols=m, appliquer=repricing.appliquer)
+    with stage("solve"):
+        report = reprice_matrix(db, matrix, couts, repricing.verifier_optimalite, repricing.appliquer)
+    note(n_taches=report["nb_taches"])
+    with stage("db"):
+        if repricing.appliquer:
+            db.commit()
+        else:
+            db.rollback() # releases the read locks; nothing was written
+    return report
+
+
+@router.delete("/{matrix_id}", status_code=204)
+def delete_matrix(matrix_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    matrix = db.query(CostMatrix).filter(CostMatrix.id == matrix_id).with_for_update().first()
+    if not matrix:
+        raise HTTPException(status_code=404, detail="Matrice de coûts non trouvée")
+    if matrix.nb_references > 0:
+        raise HTTPException(status_code=409, detail="La matrice est utilisée par des tâches.")
+    fichier = matrix.fichier
+    db.delete(matrix)
+    db.commit()
+    forget_matrix(matrix_id)
+    if fichier:
+        remove_matrix_file(fichier) # after the commit: a failed delete never loses a referenced file
+    return
@@ -1,35 +1,194 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from schemas import TransportTaskSummary
 from sqlalchemy import func
-from typing import List
-from database import get_db
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from database import SessionLocal, get_db
+from export import EXPORT_FORMATS, MEDIA_TYPES, NDJSON, export_filename, export_statement, stream_export
+from sqlalchemy.orm import Session, load_only
 from models import TransportTask
-from typing import List
+from utils import cache_headers, is_not_modified, make_etag, not_modified_response
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
+# Summaries never need couts or the allocations: keep the heavy JSON columns out of the SELECT
+SUMMARY_COLUMNS = load_only(
+    TransportTask.id,
+    TransportTask.nom,
+    TransportTask.algo_utilise,
+    TransportTask.cout_total,
+    TransportTask.is_optimized,
+    TransportTask.erreur_calcul,
+    TransportTask.date_creation,
+    TransportTask.date_derniere_maj,
+    TransportTask.n_rows,
+    TransportTask.n_cols,
+)
+
+LAST_CHANGE = func.coalesce(TransportTask.date_derniere_maj, TransportTask.date_creation)
+
+
+def _collection_validators(db: Session):
+    # Any create/update bumps the latest date, any delete changes the count
+    count, latest = db.query(func.count(TransportTask.id), func.max(LAST_CHANGE)).one()
+    return cache_headers(make_etag("tasks", count, latest or 0), latest), latest
+
+
+def _end_of_range(request: Request, date_fin: Optional[datetime]):
+    """(bound, exclusive): a date_fin given without a time covers that whole day."""
+    raw = request.query_params.get("date_fin", "").strip()
+    if date_fin is not None and len(raw) == len("AAAA-MM-JJ"):
+        return date_fin + timedelta(days=1), True
+    return date_fin, False
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filter_tasks(
+    query,
+    nom: Optional[str],
+    nom_prefixe: Optional[str],
+    algo_utilise: Optional[str],
+    is_optimized: Optional[bool],
+    cout_min: Optional[float],
+    cout_max: Optional[float],
+    n_rows_min: Optional[int],
+    n_rows_max: Optional[int],
+    n_cols_min: Optional[int],
+    n_cols_max: Optional[int],
+    date_debut: Optional[datetime],
+    date_fin: Optional[datetime],
+    date_fin_exclue: bool = False,
+):
+    # Each filter maps onto an index: trigram (ILIKE '%x%'), text_pattern_ops (LIKE 'x%'),
+    # (algo_utilise, date_creation), (is_optimized, date_creation), cout_total, (n_rows, n_cols)
+    if nom:
+        query = query.filter(TransportTask.nom.ilike(f"%{_like_escape(nom)}%", escape="\\"))
+    if nom_prefixe:
+        query = query.filter(TransportTask.nom.like(f"{_like_escape(nom_prefixe)}%", escape="\\"))
+    if algo_utilise is not None:
+        query = query.filter(TransportTask.algo_utilise == algo_utilise)
+    if is_optimized is not None:
+        query = query.filter(TransportTask.is_optimized == is_optimized)
+    if cout_min is not None:
+        query = query.filter(TransportTask.cout_total >= cout_min)
+    if cout_max is not None:
+        query = query.filter(TransportTask.cout_total <= cout_max)
+    if n_rows_min is not None:
+        query = query.filter(TransportTask.n_rows >= n_rows_min)
+    if n_rows_max is not None:
+        query = query.filter(TransportTask.n_rows <= n_rows_max)
+    if n_cols_min is not None:
+        query = query.filter(TransportTask.n_cols >= n_cols_min)
+    if n_cols_max is not None:
+        query = query.filter(TransportTask.n_cols <= n_cols_max)
+    if date_debut is not None:
+        query = query.filter(TransportTask.date_creation >= date_debut)
+    if date_fin is not None:
+        query = query.filter(
+            TransportTask.date_creation < date_fin if date_fin_exclue else TransportTask.date_creation <= date_fin
+        )
+    return query
+
+
 @router.get("/", response_model=List[TransportTaskSummary])
-def list_tasks(db: Session = Depends(get_db)):
-    return db.query(TransportTask).order_by(TransportTask.date_creation.desc()).all()
+def list_tasks(
+    request: Request,
+    response: Response,
+    nom: Optional[str] = Query(None, description="Sous-chaîne du nom (insensible à la casse)"),
+    nom_prefixe: Optional[str] = Query(None, description="Début du nom"),
+    algo_utilise: Optional[Literal["cno", "hammer", "sinkhorn"]] = None,
+    is_optimized: Optional[bool] = None,
+    cout_min: Optional[float] = None,
+    cout_max: Optional[float] = None,
+    n_rows_min: Optional[int] = Query(None, ge=0),
+    n_rows_max: Optional[int] = Query(None, ge=0),
+    n_cols_min: Optional[int] = Query(None, ge=0),
+    n_cols_max: Optional[int] = Query(None, ge=0),
+    date_debut: Optional[datetime] = None,
+    date_fin: Optional[datetime] = Query(None, description="Fin de la période ; une date sans heure inclut toute la journée"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    # Validators cover the whole table; the URL (filters, page) already keys the client cache
+    headers, latest = _collection_validators(db)
+    if is_not_modified(request, headers["ETag"], latest):
+        return not_modified_response(headers)
+
+    query = _filter_tasks(
+        db.query(TransportTask), nom, nom_prefixe, algo_utilise, is_optimized, cout_min, cout_max,
+        n_rows_min, n_rows_max, n_cols_min, n_cols_max, date_debut, *_end_of_range(request, date_fin)
+    )
+    total = query.with_entities(func.count(TransportTask.id)).scalar()
+    tasks = (
+        query.options(SUMMARY_COLUMNS)
+        .order_by(TransportTask.date_creation.desc(), TransportTask.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
+    response.headers.update(headers)
+    response.headers["X-Total-Count"] = str(total)
+    if offset + len(tasks) < total: # a truncated page says where the rest is
+        response.headers["Link"] = f'<{request.url.include_query_params(offset=offset + limit)}>; rel="next"'
+    return tasks
 
 
 
+@router.get("/export", response_class=StreamingResponse)
+def export_tasks(
+    request: Request,
+    format: Literal["ndjson", "csv", "parquet", "arrow"] = NDJSON,
+    nom: Optional[str] = Query(None, description="Sous-chaîne du nom (insensible à la casse)"),
+    nom_prefixe: Optional[str] = Query(None, description="Début du nom"),
+    algo_utilise: Optional[Literal["cno", "hammer", "sinkhorn"]] = None,
+    is_optimized: Optional[bool] = None,
+    cout_min: Optional[float] = None,
+    cout_max: Optional[float] = None,
+    n_rows_min: Optional[int] = Query(None, ge=0),
+    n_rows_max: Optional[int] = Query(None, ge=0),
+    n_cols_min: Optional[int] = Query(None, ge=0),
+    n_cols_max: Optional[int] = Query(None, ge=0),
+    date_debut: Optional[datetime] = None,
+    date_fin: Optional[datetime] = Query(None, description="Fin de la période ; une date sans heure inclut toute la journée"),
+):
+    # Every matching task with its active result, streamed in batches (export.py):
+    # one request instead of a listing and a GET per task
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format '{format}' indisponible : pyarrow n'est pas installé.")
+    statement = _filter_tasks(
+        export_statement(), nom, nom_prefixe, algo_utilise, is_optimized, cout_min, cout_max,
+        n_rows_min, n_rows_max, n_cols_min, n_cols_max, date_debut, *_end_of_range(request, date_fin)
+    )
+    return StreamingResponse(
+        stream_export(SessionLocal, statement, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(format)}"'},
+    )
+
+
 @router.get("/recent", response_model=List[TransportTaskSummary])
-def get_recent_tasks(db: Session = Depends(get_db)):
+def get_recent_tasks(request: Request, response: Response, db: Session = Depends(get_db)):
+    headers, latest = _collection_validators(db)
+    if is_not_modified(request, headers["ETag"], latest):
+        return not_modified_response(headers)
     tasks = (
         db.query(TransportTask)
-        .order_by(
-            func.coalesce(TransportTask.date_derniere_maj, TransportTask.date_creation).desc()
-        )
+        .options(SUMMARY_COLUMNS)
+        .order_by(LAST_CHANGE.desc())
         .limit(5)
         .all()
     )
+    response.headers.update(headers)
     return tasks
 
 @router.get("/{task_id}", response_model=TransportTaskSummary)
 def get_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(TransportTask).filter(TransportTask.id == task_id).first()
+    task = db.query(TransportTask).options(SUMMARY_COLUMNS).filter(TransportTask.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
\ No newline at end of file
+    return task
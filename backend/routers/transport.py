@@ -1,64 +1,368 @@
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy.orm import Session, defer, load_only
+from contextlib import contextmanager
 from datetime import datetime
-from fastapi import Path
+from fastapi import Path, Query
 from database import get_db
-from typing import Optional
-from models import TransportTask
-from schemas import TransportTaskCreate, TransportTaskOut, TransportTaskUpdate, TransportTaskResult
-from solvers.cno import solve_coin_nord_ouest
-from solvers.hammer import solve_hammer
-from solvers.stepping_stone import solve_stepping_stone # Import the new solver
+from typing import List, Literal, Optional, Union
+from models import CostMatrix, ResultVersion, TransportTask, stored_result
+from utils import FastJSONResponse, cache_headers, is_not_modified, make_etag, not_modified_response
+from serialization import (
+    BINARY_MEDIA_TYPES, MEDIA_JSON, ArrayTask, couts_to_json, decode_task, encode_task, is_binary, negotiate
+)
+from schemas import (
+    TransportTaskCreate, TransportTaskOut, TransportTaskUpdate, TransportTaskResult, TransportTaskPatch, TransportTaskPatchResult,
+    TransportTaskSensitivity, TransportTaskTile, TransportTaskVerification, WhatIfRequest, WhatIfResult, ScenarioBatchCreate, ScenarioResult, SolverJobOut,
+    ResultVersionDetail, ResultVersionDiff, ResultVersionOut
+)
+from solvers.sensitivity import sensitivity_analysis, what_if
+from solvers.scenarios import solve_scenarios
+from solvers.delta import apply_cost_changes, result_changes
+from solvers.certificate import check_certificate
+from services import (
+    INITIAL_SOLVERS, apply_initial_result, apply_optimized_result, edited_result, initial_result, optimization_source,
+    optimized_result, solver_profile
+)
+from admission import Admission, AdmissionRefused, admit, client_id
+from history import EDITED, INITIAL, OPTIMIZED, get_version, record_version, version_result, versions_diff
+from tiles import MATRIX_KEYS, RESULT_COLUMNS, TILE_MAX_CELLS, allocation_window, cached_result_cells, cost_window
+from matrices import MatrixFile, acquire, acquire_inline, edit_task_costs, matrix_costs, open_matrix, release, task_costs
+from jobs import active_job, enqueue
+from timing import note, stage
+from routers.jobs import job_accepted
 
 router = APIRouter(prefix="/solve", tags=["Solver"]) # Existing router for HTTP
 ws_router = APIRouter(prefix="/ws/transport", tags=["WebSocket"]) # New router for WebSockets
 
+def _run_initial_solver(algo: str, offres, demandes, couts) -> Optional[dict]:
+    try:
+        return initial_result(algo, offres, demandes, couts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-@router.post("/", response_model=TransportTaskOut)
-def create_solve_task(task_data: TransportTaskCreate, db: Session = Depends(get_db)):
-    if sum(task_data.offres) != sum(task_data.demandes):
+def _admit(
+    db: Session, request: Request, operation: str, algo: str, offres, demandes, couts, deferrable: bool = True, count: int = 1
+) -> Admission:
+    try:
+        admission = admit(db, client_id(request), solver_profile(operation, algo, offres, demandes, couts), deferrable, count)
+    except AdmissionRefused as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+    note(estimation_s=round(admission.estimate, 3), admission=admission.decision)
+    return admission
+
+
+def _stored_costs(db: Session, matrix_id: int, n: int, m: int):
+    matrix = db.query(CostMatrix.n_rows, CostMatrix.n_cols).filter(CostMatrix.id == matrix_id).first()
+    if not matrix:
+        raise HTTPException(status_code=404, detail="Matrice de coûts non trouvée")
+    if (matrix.n_rows, matrix.n_cols) != (n, m):
         raise HTTPException(
             status_code=400,
-            detail="La somme des offres doit être égale à la somme des demandes."
+            detail=f"La matrice {matrix_id} est {matrix.n_rows} x {matrix.n_cols}, le problème est {n} x {m}."
         )
+    return matrix_costs(db, matrix_id)
 
-    initial_calc_result: Optional[dict] = None
-    if task_data.algo_utilise == "cno":
-        initial_calc_result = solve_coin_nord_ouest(task_data.offres.copy(), task_data.demandes.copy(), task_data.couts)
-    elif task_data.algo_utilise == "hammer":
-        initial_calc_result = solve_hammer(task_data.offres.copy(), task_data.demandes.copy(), task_data.couts)
-    else:
-        raise HTTPException(status_code=400, detail="Algorithme non reconnu")
 
-    if initial_calc_result is None:
-         raise HTTPException(status_code=500, detail="Erreur interne du serveur lors du calcul initial.")
+def _acquire_costs(db: Session, matrix_id: Optional[int], couts, nom: str) -> int:
+    # Taken right before the commit: the reference count UPDATE locks the shared
+    # cost_matrices row until then, and a solve in between would serialize every
+    # task on the same matrix
+    if matrix_id is None:
+        return acquire_inline(db, couts, nom) # identical matrices are stored once
+    if not acquire(db, matrix_id):
+        raise HTTPException(status_code=404, detail="Matrice de coûts non trouvée")
+    return matrix_id
+
+
+def _analysis_costs(db: Session, task: TransportTask):
+    couts = task_costs(db, task)
+    # The analyses work on dense n x m arrays, which is what a matrix file avoids
+    if isinstance(couts, MatrixFile):
+        raise HTTPException(
+            status_code=400,
+            detail="Analyse non disponible pour une tâche sur une matrice de coûts enregistrée."
+        )
+    return couts
+
+
+async def _task_input(request: Request) -> Union[TransportTaskCreate, ArrayTask]:
+    body = await request.body()
+    content_type = request.headers.get("content-type")
+    if is_binary(content_type):
+        try:
+            with stage("validation"):
+                return decode_task(body, content_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        with stage("validation"):
+            return TransportTaskCreate.model_validate_json(body)
+    except ValidationError as e:
+        # Same 422 shape as a regular body parameter
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False, include_context=False)],
+            body=body
+        )
 
+
+# _task_input reads the body itself, so the accepted media types are declared by hand
+TASK_INPUT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            MEDIA_JSON: {"schema": TransportTaskCreate.model_json_schema()},
+            **{media: {"schema": {"type": "string", "format": "binary"}} for media in BINARY_MEDIA_TYPES},
+        },
+    }
+}
+
+
+def _task_payload(task: TransportTask, couts, results: Optional[dict] = None) -> dict:
+    # Same shape as TransportTaskOut, built straight from the row: the JSON columns are
+    # already plain dicts/lists, so re-validating them through pydantic is pure overhead.
+    # results replaces the three result columns when they were not loaded.
+    if results is None:
+        results = {column: getattr(task, column) for column in RESULT_COLUMNS.values()}
+    return {
+        "id": task.id,
+        "nom": task.nom,
+        "offres": task.offres,
+        "demandes": task.demandes,
+        "couts": None if isinstance(couts, MatrixFile) else couts, # a file is never sent back
+        "matrice_id": task.matrice_id,
+        "algo_utilise": task.algo_utilise,
+        "resultat": results["resultat"],
+        "cout_total": task.cout_total,
+        "initial_result": results["initial_result"],
+        "optimized_result": results["optimized_result"],
+        "is_optimized": task.is_optimized,
+        "erreur_calcul": task.erreur_calcul,
+        "date_creation": task.date_creation,
+        "date_derniere_maj": task.date_derniere_maj,
+    }
+
+
+def _task_headers(task_id: int, last_modified: Optional[datetime], media_type: str, matrices: bool = True) -> dict:
+    # Each representation needs its own validator
+    parts = (task_id, last_modified) if media_type == MEDIA_JSON else (task_id, last_modified, media_type)
+    if not matrices:
+        parts += ("meta",)
+    headers = cache_headers(make_etag(*parts), last_modified)
+    headers["Vary"] = "Accept"
+    return headers
+
+
+# Result keys that stay small whatever n x m: all of them but the allocation and the cells
+LIGHT_RESULT_KEYS = tuple(key for key in TransportTaskResult.model_fields if key not in MATRIX_KEYS)
+
+
+def _results_without_matrices(db: Session, task_id: int) -> dict:
+    """The three result columns reduced to their light keys, extracted by the database: the allocations are never read."""
+    columns = list(RESULT_COLUMNS.values())
+    row = (
+        db.query(*(getattr(TransportTask, column)[key] for column in columns for key in LIGHT_RESULT_KEYS))
+        .filter(TransportTask.id == task_id)
+        .first()
+    )
+    results = {}
+    for k, column in enumerate(columns):
+        values = row[k * len(LIGHT_RESULT_KEYS):(k + 1) * len(LIGHT_RESULT_KEYS)] if row else ()
+        result = {key: value for key, value in zip(LIGHT_RESULT_KEYS, values) if value is not None}
+        results[column] = result if "cout_total" in result else None # every stored result has its cost
+    return results
+
+
+def _task_response(db: Session, task: TransportTask, media_type: str = MEDIA_JSON, matrices: bool = True) -> Response:
+    last_modified = task.date_derniere_maj or task.date_creation
+    headers = _task_headers(task.id, last_modified, media_type, matrices)
+    with stage("serialization"):
+        if matrices:
+            payload = _task_payload(task, task_costs(db, task)) # shared matrices come from the process cache
+        else:
+            # Metadata only: the detail page reads the matrices by tiles (GET /solve/{id}/matrix)
+            payload = _task_payload(task, None, _results_without_matrices(db, task.id))
+        if media_type == MEDIA_JSON:
+            return FastJSONResponse(payload, headers=headers)
+        return Response(encode_task(payload, media_type), media_type=media_type, headers=headers)
+
+
+# ?asynchrone=true: the solve goes to the job queue (worker.py) and the answer is a 202 with the job
+ASYNC_QUERY = Query(False, description="Met le calcul en file d'attente (202 + job, suivi sur /jobs/{id})")
+JOB_ACCEPTED = {202: {"model": SolverJobOut, "description": "Calcul mis en file d'attente"}}
+
+
+@router.post("/", response_model=TransportTaskOut, openapi_extra=TASK_INPUT_OPENAPI, responses=JOB_ACCEPTED)
+def create_solve_task(
+    request: Request,
+    task_data: Union[TransportTaskCreate, ArrayTask] = Depends(_task_input),
+    asynchrone: bool = ASYNC_QUERY,
+    db: Session = Depends(get_db)
+):
+    binary = isinstance(task_data, ArrayTask)
+    offres = task_data.offres.tolist() if binary else task_data.offres
+    demandes = task_data.demandes.tolist() if binary else task_data.demandes
+    note(n_rows=len(offres), n_cols=len(demandes), algo_utilise=task_data.algo_utilise)
+    if sum(offres) != sum(demandes):
+        raise HTTPException(
+            status_code=400,
+            detail="La somme des offres doit être égale à la somme des demandes."
+        )
+
+    couts = couts_to_json(task_data.couts) if binary else task_data.couts # the JSON column stores lists
+    matrice_id = None if binary else task_data.matrice_id
+    if matrice_id is not None:
+        with stage("db"):
+            couts = _stored_costs(db, matrice_id, len(offres), len(demandes))
     db_task = TransportTask(
         nom=task_data.nom,
-        offres=task_data.offres,
-        demandes=task_data.demandes,
-        couts=task_data.couts,
+        offres=offres,
+        demandes=demandes,
+        couts=None,
         algo_utilise=task_data.algo_utilise,
-        initial_result=initial_calc_result, # Store initial result
-        resultat=initial_calc_result,       # Active result is initially the initial_result
-        cout_total=initial_calc_result["cout_total"], # Also set the root cout_total for now
+        n_rows=len(offres),
+        n_cols=len(demandes),
         is_optimized=False
     )
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
 
-    return db_task
+    # Solves estimated too long to wait for go to the job queue even without ?asynchrone
+    with _admit(db, request, "solve", task_data.algo_utilise, offres, demandes, task_data.couts if binary else couts) as admission:
+        if asynchrone or admission.deferred:
+            db_task.matrice_id = _acquire_costs(db, matrice_id, couts, task_data.nom)
+            db.add(db_task)
+            db.flush()
+            job = enqueue(db, "solve", db_task.id, client=admission.client, estimation=admission.estimate)
+            db.commit()
+            return job_accepted(job)
+
+        with stage("solve"), admission.timed():
+            # Binary payloads take the same dispatch as JSON ones (SOLVER_MODE, blocks, forbidden routes)
+            initial_calc_result = _run_initial_solver(task_data.algo_utilise, offres, demandes, couts)
+
+        if initial_calc_result is None:
+             raise HTTPException(status_code=500, detail="Erreur interne du serveur lors du calcul initial.")
+
+        apply_initial_result(db_task, initial_calc_result)
+        with stage("db"):
+            db_task.matrice_id = _acquire_costs(db, matrice_id, couts, task_data.nom)
+            db.add(db_task)
+            record_version(db, db_task, initial_calc_result, INITIAL)
+            admission.record(db)
+            db.commit()
+            db.refresh(db_task)
+
+    return _task_response(db, db_task, negotiate(request.headers.get("accept")))
+
+@router.post("/scenarios", response_model=List[ScenarioResult])
+def solve_scenario_batch(request: Request, batch: ScenarioBatchCreate, db: Session = Depends(get_db)):
+    # One cost matrix, many (offres, demandes): each scenario warm-starts from a neighbour's optimal basis.
+    # Admitted per scenario on the model of these batches (operation "scenarios"); answered inline.
+    if not batch.scenarios:
+        return []
+    first = batch.scenarios[0]
+    with _admit(
+        db, request, "scenarios", batch.algo_utilise, first.offres, first.demandes, batch.couts,
+        deferrable=False, count=len(batch.scenarios)
+    ) as admission:
+        try:
+            with stage("solve"), admission.timed():
+                results = solve_scenarios(
+                    batch.couts,
+                    [(s.offres, s.demandes) for s in batch.scenarios],
+                    INITIAL_SOLVERS[batch.algo_utilise]
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        admission.record(db)
+        db.commit()
+    return results
 
 @router.get("/{task_id}", response_model=TransportTaskOut)
-def get_task(task_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
-    task = db.query(TransportTask).filter(TransportTask.id == task_id).first()
+def get_task(
+    request: Request,
+    task_id: int = Path(..., gt=0),
+    matrices: bool = Query(True, description="false : sans les coûts ni les allocations (lus par /solve/{id}/matrix)"),
+    db: Session = Depends(get_db)
+):
+    # Validators only need the light columns: a 304 never loads couts or the allocations
+    stamp = (
+        db.query(TransportTask.date_derniere_maj, TransportTask.date_creation)
+        .filter(TransportTask.id == task_id)
+        .first()
+    )
+    if not stamp:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    last_modified = stamp.date_derniere_maj or stamp.date_creation
+    media_type = negotiate(request.headers.get("accept"))
+    headers = _task_headers(task_id, last_modified, media_type, matrices)
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return not_modified_response(headers)
+
+    query = db.query(TransportTask)
+    if not matrices: # neither the costs nor the result columns: their light keys are read apart
+        query = query.options(*(defer(getattr(TransportTask, column)) for column in ("couts", *RESULT_COLUMNS.values())))
+    task = query.filter(TransportTask.id == task_id).first()
+    if not task: # deleted between the two queries
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    return _task_response(db, task, media_type, matrices)
+
+@router.get("/{task_id}/matrix", response_model=TransportTaskTile)
+def get_task_matrix(
+    request: Request,
+    task_id: int = Path(..., gt=0),
+    row0: int = Query(0, ge=0),
+    rows: int = Query(50, ge=1),
+    col0: int = Query(0, ge=0),
+    cols: int = Query(20, ge=1),
+    solution: Literal["actif", "initial", "optimise"] = Query("actif", description="Allocation à lire"),
+    db: Session = Depends(get_db)
+):
+    # A window of the costs and of one allocation; only that window is read from the matrix file
+    if rows * cols > TILE_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"La fenêtre demandée dépasse {TILE_MAX_CELLS} cellules.")
+    task = (
+        db.query(TransportTask)
+        .options(load_only(
+            TransportTask.id, TransportTask.offres, TransportTask.demandes, TransportTask.matrice_id,
+            TransportTask.modifications_couts, TransportTask.date_derniere_maj, TransportTask.date_creation
+        ))
+        .filter(TransportTask.id == task_id)
+        .first()
+    )
     if not task:
         raise HTTPException(status_code=404, detail="Tâche non trouvée")
-    return task
+    n, m = len(task.offres), len(task.demandes)
+    if row0 >= n or col0 >= m:
+        raise HTTPException(status_code=400, detail="La fenêtre demandée est hors de la matrice.")
+    last_modified = task.date_derniere_maj or task.date_creation
+    headers = cache_headers(make_etag(task_id, last_modified, "matrix", row0, rows, col0, cols, solution), last_modified)
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return not_modified_response(headers)
+
+    row1, col1 = min(n, row0 + rows), min(m, col0 + cols)
+    costs = matrix_costs(db, task.matrice_id) if task.matrice_id is not None else task.couts
+    if costs is None:
+        raise HTTPException(status_code=404, detail="Matrice de coûts non trouvée")
+    column = getattr(TransportTask, RESULT_COLUMNS[solution])
+    cells = cached_result_cells(
+        (task_id, last_modified, solution),
+        lambda: db.query(stored_result(column)).filter(TransportTask.id == task_id).scalar()
+    )
+    return FastJSONResponse({
+        "n_rows": n,
+        "n_cols": m,
+        "row0": row0,
+        "col0": col0,
+        "couts": cost_window(costs, task.modifications_couts, row0, row1, col0, col1),
+        "allocation": allocation_window(cells, row0, row1, col0, col1),
+    }, headers=headers)
 
 @router.put("/{task_id}", response_model=TransportTaskOut)
 def update_task(
+    request: Request,
     task_id: int,
     updates: TransportTaskUpdate,
     db: Session = Depends(get_db)
@@ -71,8 +375,14 @@ def update_task(
         task.offres = updates.offres
     if updates.demandes is not None:
         task.demandes = updates.demandes
-    if updates.couts is not None:
-        task.couts = updates.couts
+    matrix_changed = updates.couts is not None or updates.matrice_id is not None
+    previous_matrix = task.matrice_id
+    if matrix_changed:
+        # The references are moved after the solve (see _acquire_costs)
+        if updates.matrice_id is not None and updates.couts is None:
+            task.matrice_id = updates.matrice_id
+        task.couts = None
+        task.modifications_couts = None # cell edits applied to the previous matrix
     if updates.algo_utilise is not None:
         task.algo_utilise = updates.algo_utilise
     if updates.nom is not None: # Added nom to TransportTaskUpdate schema
@@ -83,6 +393,7 @@ def update_task(
         updates.offres is not None,
         updates.demandes is not None,
         updates.couts is not None,
+        updates.matrice_id is not None,
         updates.algo_utilise is not None
     ])
 
@@ -94,31 +405,137 @@ def update_task(
                 detail="La somme des offres doit être égale à la somme des demandes."
             )
 
-        new_initial_result: Optional[dict] = None
-        if task.algo_utilise == "cno":
-            new_initial_result = solve_coin_nord_ouest(task.offres, task.demandes, task.couts)
-        elif task.algo_utilise == "hammer":
-            new_initial_result = solve_hammer(task.offres, task.demandes, task.couts)
+        if updates.couts is not None:
+            couts = updates.couts
+        elif task.matrice_id is not None:
+            _stored_costs(db, task.matrice_id, len(task.offres), len(task.demandes))
+            couts = task_costs(db, task) # with the task's own cell edits
         else:
-            raise HTTPException(status_code=400, detail="Algorithme inconnu")
+            couts = task.couts
+        note(n_rows=len(task.offres), n_cols=len(task.demandes), algo_utilise=task.algo_utilise)
+        # PUT answers with the task, so it is never deferred; the limits and quotas still apply
+        with _admit(db, request, "solve", task.algo_utilise, task.offres, task.demandes, couts, deferrable=False) as admission:
+            with stage("solve"), admission.timed():
+                new_initial_result = _run_initial_solver(task.algo_utilise, task.offres, task.demandes, couts)
+        admission.record(db)
 
         if new_initial_result is None:
             raise HTTPException(status_code=500, detail="Erreur recalculating initial solution during update.")
 
-        task.initial_result = new_initial_result
-        task.resultat = new_initial_result # Active result is the new initial
-        task.cout_total = new_initial_result["cout_total"]
-        task.optimized_result = None # Reset optimization
-        task.is_optimized = False
+        task.n_rows, task.n_cols = len(task.offres), len(task.demandes)
+        # New active result; the optimization and any checkpoint belong to the previous problem
+        apply_initial_result(task, new_initial_result)
+        record_version(db, task, new_initial_result, INITIAL)
 
     task.date_derniere_maj = datetime.utcnow()
 
-    db.commit()
-    db.refresh(task)
+    with stage("db"):
+        if matrix_changed:
+            task.matrice_id = _acquire_costs(
+                db, None if updates.couts is not None else updates.matrice_id, updates.couts, task.nom
+            )
+            release(db, previous_matrix) # after the acquire: the same matrix is never dropped in between
+        db.commit()
+        db.refresh(task)
 
-    return task
+    return _task_response(db, task)
 
 
+@router.patch("/{task_id}", response_model=TransportTaskPatchResult)
+def patch_task(
+    request: Request, edits: TransportTaskPatch, task_id: int = Path(..., gt=0), db: Session = Depends(get_db)
+):
+    # Small edits to a large task: only the edited cells are sent, stored and, when
+    # the plan moves, sent back; the solve restarts from the current basis if it can.
+    task = db.query(TransportTask).filter(TransportTask.id == task_id).with_for_update().first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    n, m = len(task.offres), len(task.demandes)
+    if any(not (0 <= c.i < n and 0 <= c.j < m) for c in edits.couts) \
+            or any(not 0 <= s.i < n for s in edits.offres) or any(not 0 <= d.j < m for d in edits.demandes):
+        raise HTTPException(status_code=400, detail=f"Indice hors du problème ({n} x {m}).")
+
+    couts_before = task_costs(db, task)
+    if edits.couts and isinstance(couts_before, MatrixFile):
+        raise HTTPException(
+            status_code=400,
+            detail="Les coûts d'une matrice enregistrée ne se modifient pas cellule par cellule."
+        )
+    latest = {(c.i, c.j): c.cout for c in edits.couts} # the last edit of a cell wins
+    changes = [[i, j, cout] for (i, j), cout in latest.items() if couts_before[i][j] != cout]
+
+    offres, demandes = list(task.offres), list(task.demandes)
+    for s in edits.offres:
+        offres[s.i] += s.delta
+    for d in edits.demandes:
+        demandes[d.j] += d.delta
+    if min(offres) < 0 or min(demandes) < 0:
+        raise HTTPException(status_code=400, detail="Les offres et les demandes doivent rester positives.")
+    if sum(offres) != sum(demandes):
+        raise HTTPException(
+            status_code=400,
+            detail="La somme des offres doit être égale à la somme des demandes."
+        )
+    supplies_changed = offres != task.offres or demandes != task.demandes
+
+    recalcul, allocation = "aucun", []
+    if changes or supplies_changed:
+        if not task.resultat:
+            raise HTTPException(status_code=400, detail="La tâche n'a pas de solution à mettre à jour.")
+        couts = apply_cost_changes(couts_before, changes) if changes else couts_before
+        if supplies_changed:
+            task.offres, task.demandes = offres, demandes
+        note(n_rows=n, n_cols=m, cellules_modifiees=len(changes))
+        # Only the solves are admitted, each priced on its own model: a warm re-optimization
+        # on the lean simplex, a full solve (plus its optimization for an optimized task).
+        # PATCH answers with the new plan, so they run inline within the quotas
+        admissions = []
+
+        @contextmanager
+        def admitted(recalcul: str):
+            if recalcul == "reoptimisation":
+                operation = "reoptimize"
+            else:
+                operation = "optimize" if task.is_optimized else "solve"
+            with _admit(db, request, operation, task.algo_utilise, offres, demandes, couts, deferrable=False) as admission:
+                with admission.timed():
+                    yield
+            admissions.append(admission)
+
+        try:
+            with stage("solve"):
+                recalcul, result, initial = edited_result(task, couts_before, couts, changes, supplies_changed, admitted)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for admission in admissions:
+            admission.record(db)
+        if changes:
+            edit_task_costs(db, task, couts, changes)
+        if result is not None:
+            allocation = result_changes(task.resultat, result)
+            if task.is_optimized:
+                apply_optimized_result(task, result)
+                task.initial_result = initial # the previous one solved another problem
+            else:
+                apply_initial_result(task, result)
+            record_version(db, task, result, EDITED)
+        task.date_derniere_maj = datetime.utcnow()
+        with stage("db"):
+            db.commit()
+            db.refresh(task)
+
+    last_modified = task.date_derniere_maj or task.date_creation
+    return FastJSONResponse(
+        {
+            "id": task.id,
+            "recalcul": recalcul,
+            "cout_total": task.cout_total,
+            "is_optimized": task.is_optimized,
+            "allocation": allocation,
+            "date_derniere_maj": task.date_derniere_maj,
+        },
+        headers=_task_headers(task.id, last_modified, MEDIA_JSON)
+    )
 
 
 @router.delete("/{task_id}", status_code=204)
@@ -127,13 +544,20 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
     if not task:
         raise HTTPException(status_code=404, detail="Tâche non trouvée")
     
+    matrix_id = task.matrice_id
     db.delete(task)
+    release(db, matrix_id)
     db.commit()
     return
 
 # New endpoint for Stepping Stone Optimization
-@router.post("/{task_id}/optimize/stepping-stone", response_model=TransportTaskOut)
-def optimize_task_with_stepping_stone(task_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+@router.post("/{task_id}/optimize/stepping-stone", response_model=TransportTaskOut, responses=JOB_ACCEPTED)
+def optimize_task_with_stepping_stone(
+    request: Request,
+    task_id: int = Path(..., gt=0),
+    asynchrone: bool = ASYNC_QUERY,
+    db: Session = Depends(get_db)
+):
     task = db.query(TransportTask).filter(TransportTask.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Tâche non trouvée")
@@ -148,12 +572,21 @@ def optimize_task_with_stepping_stone(task_id: int = Path(..., gt=0), db: Sessio
     # Or, if already optimized, perhaps we don't allow re-optimizing via this simple endpoint
     # A more robust approach would be to decide based on `is_optimized` or allow choice.
 
-    source_solution_for_optimization = task.initial_result
+    source_solution_for_optimization = optimization_source(task)
     if not source_solution_for_optimization:
-        # Fallback if initial_result wasn't populated, use current resultat
-        source_solution_for_optimization = task.resultat
-        if not source_solution_for_optimization:
-             raise HTTPException(status_code=400, detail="Aucune solution de base disponible pour l'optimisation.")
+        raise HTTPException(status_code=400, detail="Aucune solution de base disponible pour l'optimisation.")
+
+    # One optimize job per task at a time: a repeated request follows the queued one
+    queued = active_job(db, task.id, "optimize")
+    if asynchrone and queued:
+        return job_accepted(queued)
+    couts = task_costs(db, task)
+    admission = _admit(db, request, "optimize", task.algo_utilise, task.offres, task.demandes, couts)
+    if asynchrone or admission.deferred:
+        with admission:
+            job = queued or enqueue(db, "optimize", task.id, client=admission.client, estimation=admission.estimate)
+            db.commit()
+        return job_accepted(job)
 
 
     # Ensure 'allocation' is a list of lists of floats/None, as expected by stepping_stone
@@ -165,10 +598,14 @@ def optimize_task_with_stepping_stone(task_id: int = Path(..., gt=0), db: Sessio
 
     try:
         # The solve_stepping_stone function expects 'initial_solution' dict and 'couts' list.
-        optimized_ss_result_dict = solve_stepping_stone(
-            initial_solution=source_solution_for_optimization, # This is a dict from JSON
-            couts=task.couts
-        )
+        note(n_rows=len(task.offres), n_cols=len(task.demandes))
+        with stage("solve"), admission, admission.timed():
+            optimized_ss_result_dict = optimized_result(
+                source_solution_for_optimization, task.offres, task.demandes, couts,
+                task_id=task.id, stamp=task.date_derniere_maj
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Catch potential errors from stepping stone, especially if path finding is not robust yet
         print(f"Error during Stepping Stone optimization: {e}")
@@ -176,15 +613,146 @@ def optimize_task_with_stepping_stone(task_id: int = Path(..., gt=0), db: Sessio
 
 
     # Update task with optimized results
-    task.optimized_result = optimized_ss_result_dict
-    task.resultat = optimized_ss_result_dict # Update active result
-    task.cout_total = optimized_ss_result_dict["cout_total"] # Update root cout_total
-    task.is_optimized = True
-    task.date_derniere_maj = datetime.utcnow()
+    apply_optimized_result(task, optimized_ss_result_dict)
+    record_version(db, task, optimized_ss_result_dict, OPTIMIZED)
+    admission.record(db)
+
+    with stage("db"):
+        db.commit()
+        db.refresh(task)
+    return _task_response(db, task)
+
+@router.post("/{task_id}/verify", response_model=TransportTaskVerification)
+def verify_task(task_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    # Checks the active result against its stored potentials in one pass over the
+    # costs, instead of re-solving; a task whose result fails is no longer optimized.
+    task = db.query(TransportTask).filter(TransportTask.id == task_id).with_for_update().first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    if not task.resultat:
+        raise HTTPException(status_code=400, detail="La tâche n'a pas de solution à vérifier.")
+    couts = task_costs(db, task)
+    note(n_rows=len(task.offres), n_cols=len(task.demandes))
+    try:
+        with stage("verify"):
+            certificate = check_certificate(
+                task.offres, task.demandes, open_matrix(couts) if isinstance(couts, MatrixFile) else couts, task.resultat
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = {"id": task.id, "is_optimized": task.is_optimized and certificate["verifie"], **certificate}
+    if task.is_optimized and not certificate["verifie"]:
+        task.is_optimized = False
+        task.date_derniere_maj = datetime.utcnow()
+        db.commit()
+    else:
+        db.rollback() # releases the row lock
+    return response
 
-    db.commit()
-    db.refresh(task)
-    return task
+
+VERSION_COLUMNS = (
+    ResultVersion.version, ResultVersion.source, ResultVersion.cout_total, ResultVersion.n_rows, ResultVersion.n_cols,
+    ResultVersion.nb_modifications, ResultVersion.date_creation
+)
+
+
+def _version_or_404(db: Session, task_id: int, version: int) -> ResultVersion:
+    row = get_version(db, task_id, version)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Version non trouvée")
+    return row
+
+
+@router.get("/{task_id}/versions", response_model=List[ResultVersionOut])
+def list_result_versions(task_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    # Metadata only: neither the keyframe plans nor the change lists are read
+    if not db.query(TransportTask.id).filter(TransportTask.id == task_id).first():
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    return (
+        db.query(ResultVersion)
+        .options(load_only(*VERSION_COLUMNS))
+        .filter(ResultVersion.task_id == task_id)
+        .order_by(ResultVersion.version)
+        .all()
+    )
+
+@router.get("/{task_id}/versions/{version}", response_model=ResultVersionDetail)
+def get_result_version(
+    request: Request,
+    task_id: int = Path(..., gt=0),
+    version: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    # Versions never change once written: the validator is just their number
+    row = _version_or_404(db, task_id, version)
+    headers = cache_headers(make_etag(task_id, "version", version), row.date_creation)
+    if is_not_modified(request, headers["ETag"], row.date_creation):
+        return not_modified_response(headers)
+    payload = {column.key: getattr(row, column.key) for column in VERSION_COLUMNS}
+    payload["resultat"] = version_result(db, row)
+    return FastJSONResponse(payload, headers=headers)
+
+@router.get("/{task_id}/versions/{version}/diff", response_model=ResultVersionDiff)
+def diff_result_versions(
+    request: Request,
+    task_id: int = Path(..., gt=0),
+    version: int = Path(..., gt=0),
+    depuis: Optional[int] = Query(None, ge=1, description="Version de départ (par défaut, la précédente)"),
+    db: Session = Depends(get_db)
+):
+    # Reads only the change lists between the two versions, never a whole plan
+    if depuis is None:
+        if version == 1:
+            raise HTTPException(status_code=400, detail="La version 1 n'a pas de version précédente.")
+        depuis = version - 1
+    costs = dict(
+        db.query(ResultVersion.version, ResultVersion.cout_total)
+        .filter(ResultVersion.task_id == task_id, ResultVersion.version.in_((depuis, version)))
+        .all()
+    )
+    if depuis not in costs or version not in costs:
+        raise HTTPException(status_code=404, detail="Version non trouvée")
+    headers = cache_headers(make_etag(task_id, "diff", depuis, version), None)
+    if is_not_modified(request, headers["ETag"], None):
+        return not_modified_response(headers)
+    try:
+        modifications = versions_diff(db, task_id, depuis, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "depuis": depuis,
+        "version": version,
+        "cout_avant": costs[depuis],
+        "cout_apres": costs[version],
+        "modifications": modifications,
+    }, headers=headers)
+
+@router.get("/{task_id}/sensitivity", response_model=TransportTaskSensitivity)
+def get_task_sensitivity(task_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    task = db.query(TransportTask).filter(TransportTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    if not task.resultat:
+        raise HTTPException(status_code=400, detail="La tâche n'a pas de solution à analyser.")
+    couts = _analysis_costs(db, task)
+
+    return sensitivity_analysis(task.resultat["allocation"], couts, task.resultat.get("potentiels"))
+
+
+@router.post("/{task_id}/sensitivity/what-if", response_model=List[WhatIfResult])
+def evaluate_what_if(request: WhatIfRequest, task_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
+    task = db.query(TransportTask).filter(TransportTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    if not task.resultat:
+        raise HTTPException(status_code=400, detail="La tâche n'a pas de solution à analyser.")
+    couts = _analysis_costs(db, task)
+
+    scenarios = [[(p.i, p.j, p.delta) for p in scenario] for scenario in request.scenarios]
+    try:
+        return what_if(task.resultat["allocation"], couts, scenarios, task.resultat.get("potentiels"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # The ws_router is defined but not used yet. It will be for WebSocket endpoints.
 # Need to ensure the main FastAPI app includes this router if it's separate.
@@ -0,0 +1,326 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, load_only
+
+from database import engine
+from history import OPTIMIZED, record_version
+from jobs import ACTIVE_STATUSES
+from matrices import task_costs
+from models import ApiActivity, SolverJob, TransportTask
+from services import apply_optimized_result, optimization_source, optimized_result
+
+logger = logging.getLogger(__name__)
+
+# Background re-optimization: tasks still at their CNO/Hammer cost (is_optimized =
+# False) are sent through Stepping Stone while the API is idle, smallest and oldest
+# first, so the optimum is usually stored before anyone asks for it.
+#
+# Interactive traffic keeps priority twice over: a new task is only picked up when
+# no request has been in flight for REOPTIMIZE_IDLE_SECONDS in any API process and
+# the job queue is empty, and the solves run in worker processes started with a
+# lower CPU priority (nice), so a run already under way gives the CPU back to the
+# request handlers. Each API process publishes its activity in api_activity
+# (ActivityHeartbeat), which a scheduler in another process reads.
+#
+# Off by default: every API process would otherwise start its own pool. Enable it in
+# one dedicated process (python worker.py --reoptimize 1) or in a single API process
+# (REOPTIMIZE_WORKERS=1).
+
+REOPTIMIZE_WORKERS = int(os.getenv("REOPTIMIZE_WORKERS", "0")) # 0 disables the scheduler
+REOPTIMIZE_POLL_SECONDS = float(os.getenv("REOPTIMIZE_POLL_SECONDS", "5"))
+REOPTIMIZE_IDLE_SECONDS = float(os.getenv("REOPTIMIZE_IDLE_SECONDS", "2"))
+REOPTIMIZE_NICE = 10
+# A task whose run raised is skipped for REOPTIMIZE_RETRY_SECONDS; at most REOPTIMIZE_FAILED_MAX are
+# remembered. A run that ends without a certificate marks the task for good (reoptimisation_vaine)
+REOPTIMIZE_RETRY_SECONDS = float(os.getenv("REOPTIMIZE_RETRY_SECONDS", "3600"))
+REOPTIMIZE_FAILED_MAX = 1000
+REOPTIMIZE_MIN_GAIN = 1e-9 # relative: an uncertified run that saves less changed nothing and is not stored
+# API activity is published at most every ACTIVITY_HEARTBEAT_SECONDS (0: not published);
+# a process silent for ACTIVITY_STALE_SECONDS is gone and its in-flight count ignored
+ACTIVITY_HEARTBEAT_SECONDS = float(os.getenv("ACTIVITY_HEARTBEAT_SECONDS", "1"))
+ACTIVITY_STALE_SECONDS = 30
+
+
+class RequestLoad:
+    """In-flight request counter, fed by the HTTP middleware in main.py."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.last_activity = time.monotonic()
+
+    def begin(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.last_activity = time.monotonic()
+
+    def end(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.last_activity = time.monotonic()
+
+    def is_idle(self, grace_seconds: float) -> bool:
+        with self._lock:
+            return self.in_flight == 0 and time.monotonic() - self.last_activity >= grace_seconds
+
+    def snapshot(self) -> Tuple[int, float]:
+        """(requests in flight, time.monotonic() of the last activity)"""
+        with self._lock:
+            return self.in_flight, self.last_activity
+
+
+request_load = RequestLoad()
+
+
+class ActivityHeartbeat:
+    """Publishes a RequestLoad in api_activity, only when there was activity since the last write."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        load: RequestLoad = request_load,
+        interval: float = ACTIVITY_HEARTBEAT_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.load = load
+        self.interval = interval
+        self.processus = f"{socket.gethostname()}-{os.getpid()}"
+        self._published: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="activity-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is None:
+            return
+        self._thread.join()
+        self._thread = None
+        db = self.session_factory()
+        try:
+            db.query(ApiActivity).filter(ApiActivity.processus == self.processus).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Activité de l'API non publiée")
+
+    def publish(self) -> None:
+        in_flight, last_activity = self.load.snapshot()
+        # A long request keeps the row fresh; an idle process writes nothing
+        if not in_flight and last_activity == self._published:
+            return
+        age = 0.0 if in_flight else time.monotonic() - last_activity
+        db = self.session_factory()
+        try:
+            row = db.get(ApiActivity, self.processus)
+            if row is None:
+                row = ApiActivity(processus=self.processus)
+                db.add(row)
+            row.requetes_en_cours = in_flight
+            row.derniere_activite = datetime.now(timezone.utc) - timedelta(seconds=age)
+            db.commit()
+        finally:
+            db.close()
+        self._published = last_activity
+
+
+def api_is_idle(db: Session, grace_seconds: float) -> bool:
+    """No API process active for grace_seconds and no job queued or running."""
+    now = datetime.now(timezone.utc)
+    busy = db.query(ApiActivity.processus).filter(or_(
+        ApiActivity.derniere_activite > now - timedelta(seconds=grace_seconds),
+        and_(
+            ApiActivity.requetes_en_cours > 0,
+            ApiActivity.derniere_activite > now - timedelta(seconds=ACTIVITY_STALE_SECONDS),
+        ),
+    ))
+    queued = db.query(SolverJob.id).filter(SolverJob.statut.in_(ACTIVE_STATUSES))
+    return not db.query(busy.exists()).scalar() and not db.query(queued.exists()).scalar()
+
+
+def _init_worker() -> None:
+    try:
+        os.nice(REOPTIMIZE_NICE)
+    except (AttributeError, OSError): # not available on every platform
+        pass
+    # Checkpoints are written from the worker: never reuse connections inherited from the parent
+    engine.dispose(close=False)
+
+
+class ReoptimizationScheduler:
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = REOPTIMIZE_WORKERS,
+        poll_seconds: float = REOPTIMIZE_POLL_SECONDS,
+        idle_seconds: float = REOPTIMIZE_IDLE_SECONDS,
+        load: RequestLoad = request_load,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.idle_seconds = idle_seconds
+        self.load = load
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # task id -> (date_derniere_maj read before the run, future)
+        self._running: Dict[int, Tuple[Optional[datetime], Future]] = {}
+        # task id -> time of the failure, oldest first
+        self._failed: Dict[int, float] = {}
+
+    def _mark_failed(self, task_id: int) -> None:
+        self._failed.pop(task_id, None)
+        self._failed[task_id] = time.monotonic()
+        while len(self._failed) > REOPTIMIZE_FAILED_MAX:
+            del self._failed[next(iter(self._failed))]
+
+    def _skipped(self) -> List[int]:
+        # Expired failures are retried: the task may have been edited, or the failure was transient
+        horizon = time.monotonic() - REOPTIMIZE_RETRY_SECONDS
+        for task_id, failed_at in list(self._failed.items()):
+            if failed_at > horizon:
+                break
+            del self._failed[task_id]
+        return list(self._running) + list(self._failed)
+
+    def start(self) -> None:
+        if self.workers <= 0 or self._thread is not None:
+            return
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._thread = threading.Thread(target=self._run, name="reoptimization-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Réoptimisation en arrière-plan : itération échouée")
+
+    def tick(self) -> None:
+        self._collect()
+        free = self.workers - len(self._running)
+        if free <= 0 or not self.load.is_idle(self.idle_seconds):
+            return
+        db = self.session_factory()
+        try:
+            if not api_is_idle(db, self.idle_seconds):
+                return
+            for task in self._candidates(db, free):
+                source = optimization_source(task)
+                if not source:
+                    self._mark_failed(task.id)
+                    continue
+                future = self._pool.submit(
+                    optimized_result, source, task.offres, task.demandes, task_costs(db, task),
+                    task_id=task.id, stamp=task.date_derniere_maj
+                )
+                self._running[task.id] = (task.date_derniere_maj, future)
+        finally:
+            db.close()
+
+    def _candidates(self, db: Session, limit: int) -> List[TransportTask]:
+        # Smallest problems first (cheap to optimize, most likely to be opened), then oldest
+        skip = self._skipped()
+        # Tasks without an initial solution yet, or with a queued job, belong to the job queue
+        queued = db.query(SolverJob.id).filter(
+            SolverJob.task_id == TransportTask.id, SolverJob.statut.in_(ACTIVE_STATUSES)
+        )
+        query = db.query(TransportTask).filter(
+            TransportTask.is_optimized.is_(False),
+            TransportTask.cout_total.isnot(None),
+            ~queued.exists(),
+            or_(
+                TransportTask.reoptimisation_vaine.is_(None),
+                TransportTask.reoptimisation_vaine != TransportTask.date_derniere_maj, # edited since
+            ),
+        )
+        if skip:
+            query = query.filter(TransportTask.id.notin_(skip))
+        return (
+            query.order_by(
+                TransportTask.n_rows * TransportTask.n_cols, # same expression as ix_transport_tasks_reoptimize
+                TransportTask.date_creation,
+                TransportTask.id,
+            )
+            .limit(limit)
+            .all()
+        )
+
+    def _collect(self) -> None:
+        for task_id, (stamp, future) in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[task_id]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning("Réoptimisation de la tâche %s échouée : %s", task_id, e)
+                self._mark_failed(task_id)
+                continue
+            self._store(task_id, stamp, result)
+
+    def _store(self, task_id: int, stamp: Optional[datetime], result: dict) -> None:
+        # Optimistic write: if the task was edited, optimized or deleted meanwhile, the
+        # result no longer matches it and is dropped.
+        db = self.session_factory()
+        try:
+            task = (
+                db.query(TransportTask)
+                .options(load_only(
+                    TransportTask.id, TransportTask.is_optimized, TransportTask.cout_total, TransportTask.date_derniere_maj
+                ))
+                .filter(TransportTask.id == task_id)
+                .with_for_update()
+                .first()
+            )
+            if task is None or task.is_optimized or task.date_derniere_maj != stamp:
+                db.rollback()
+                return
+            certified = bool((result.get("certificat") or {}).get("verifie"))
+            if certified or result["cout_total"] < task.cout_total * (1 - REOPTIMIZE_MIN_GAIN):
+                apply_optimized_result(task, result)
+                record_version(db, task, result, OPTIMIZED)
+            if not certified: # another run would not do better: done until the task is edited
+                db.flush()
+                db.query(TransportTask).filter(TransportTask.id == task_id).update({
+                    TransportTask.reoptimisation_vaine: TransportTask.date_derniere_maj,
+                    TransportTask.date_derniere_maj: TransportTask.date_derniere_maj, # not an edit: no onupdate
+                }, synchronize_session=False)
+                db.commit()
+                logger.warning("Tâche %s : résultat non certifié optimal", task_id)
+                return
+            db.commit()
+            logger.info("Tâche %s optimisée en arrière-plan (coût %s)", task_id, result["cout_total"])
+        finally:
+            db.close()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, model_validator
 from typing import List, Optional, Literal
 from datetime import datetime
 
@@ -6,15 +6,52 @@ class TransportTaskBase(BaseModel):
     nom: str
     offres: List[int]
     demandes: List[int]
-    couts: List[List[int]]
-    algo_utilise: Literal["cno", "hammer"]
+    couts: Optional[List[List[Optional[int]]]] = None # None marks a forbidden route
+    matrice_id: Optional[int] = None # stored cost matrix (/matrices), instead of couts
+    algo_utilise: Literal["cno", "hammer", "sinkhorn"]
+
+    @model_validator(mode="after")
+    def check_shape(self):
+        if (self.couts is None) == (self.matrice_id is None):
+            raise ValueError("Indiquer soit 'couts', soit 'matrice_id'.")
+        if self.couts is None:
+            return self # the matrix shape is checked against the registered file
+        # Ragged matrices would otherwise only fail deep inside a solver
+        n, m = len(self.offres), len(self.demandes)
+        if len(self.couts) != n or any(len(row) != m for row in self.couts):
+            raise ValueError(f"'couts' doit être une matrice {n} x {m}.")
+        return self
 
 class TransportTaskCreate(TransportTaskBase):
     pass
 
+class TransportTaskPotentials(BaseModel):
+    offres: List[Optional[float]]   # u_i, shadow price of each supply
+    demandes: List[Optional[float]] # v_j, shadow price of each demand
+
+class OptimalityCertificate(BaseModel):
+    # Outcome of checking a plan against its potentials (solvers/certificate.py)
+    verifie: bool                 # all three below: the plan is optimal
+    realisable: bool              # offres shipped, demandes met, nothing on a forbidden route
+    duale_realisable: bool        # c_ij - u_i - v_j >= 0 on every allowed route
+    ecarts_complementaires: bool  # c_ij - u_i - v_j = 0 wherever the plan ships
+    cout_plan: float
+    borne_duale: float            # sum(u offres) + sum(v demandes): a lower bound when duale_realisable
+    cout_reduit_min: Optional[float] = None
+
 class TransportTaskResult(BaseModel):
-    allocation: List[List[Optional[float]]] # Epsilon can be float
+    allocation: Optional[List[List[Optional[float]]]] = None # Epsilon can be float
+    # Tasks on a registered matrix keep only the basis: cells [i, j] and their flows
+    cellules: Optional[List[List[int]]] = None
+    flux: Optional[List[float]] = None
     cout_total: float
+    potentiels: Optional[TransportTaskPotentials] = None # Duals of the final basis (optimized results only)
+    # Approximate solutions (sinkhorn): lower bound on the optimal cost and cout_total minus that bound
+    borne_duale: Optional[float] = None
+    ecart: Optional[float] = None
+    # "hongroise" when the problem was an assignment (all quantities 1), solved optimally whatever the algorithm
+    methode: Optional[str] = None
+    certificat: Optional[OptimalityCertificate] = None # optimized results: their potentials checked
 
 class TransportTaskOut(TransportTaskBase):
     id: int
@@ -25,6 +62,7 @@ class TransportTaskOut(TransportTaskBase):
     initial_result: Optional[TransportTaskResult] = None
     optimized_result: Optional[TransportTaskResult] = None
     is_optimized: bool = False
+    erreur_calcul: Optional[str] = None # last queued computation that failed for good
 
     date_creation: datetime
     date_derniere_maj: Optional[datetime] = None
@@ -40,6 +78,9 @@ class TransportTaskSummary(BaseModel):
     # This cout_total should reflect the one in 'resultat'
     cout_total: Optional[float] = None
     is_optimized: bool = False
+    erreur_calcul: Optional[str] = None
+    n_rows: Optional[int] = None
+    n_cols: Optional[int] = None
     date_creation: datetime
     date_derniere_maj: Optional[datetime] = None
 
@@ -50,5 +91,179 @@ class TransportTaskUpdate(BaseModel):
     nom: Optional[str] = None # Allow updating name
     offres: Optional[List[int]] = None
     demandes: Optional[List[int]] = None
-    couts: Optional[List[List[int]]] = None
+    couts: Optional[List[List[Optional[int]]]] = None
+    matrice_id: Optional[int] = None # switches the task to a stored matrix
     algo_utilise: Optional[str] = None  # facultatif
+
+    @model_validator(mode="after")
+    def check_costs(self):
+        if self.couts is not None and self.matrice_id is not None:
+            raise ValueError("Indiquer soit 'couts', soit 'matrice_id'.")
+        return self
+
+
+class CostChange(BaseModel):
+    i: int
+    j: int
+    cout: Optional[int] # None forbids the route
+
+class SupplyDelta(BaseModel):
+    i: int
+    delta: int
+
+class DemandDelta(BaseModel):
+    j: int
+    delta: int
+
+class TransportTaskPatch(BaseModel):
+    # Cell-level edits; supplies and demands move by deltas and must stay balanced
+    couts: List[CostChange] = []
+    offres: List[SupplyDelta] = []
+    demandes: List[DemandDelta] = []
+
+class TransportTaskPatchResult(BaseModel):
+    id: int
+    # What the edit required: nothing, the plan's cost only, a warm re-optimization from
+    # the current basis, or a solve from scratch
+    recalcul: Literal["aucun", "cout", "reoptimisation", "complet"]
+    cout_total: Optional[float] = None
+    is_optimized: bool
+    # Changed cells of the active result: [i, j, new value] (None: the cell left the plan)
+    allocation: List[List[Optional[float]]]
+    date_derniere_maj: Optional[datetime] = None
+
+
+class TransportTaskTile(BaseModel):
+    # Window [row0, row0 + len(couts)) x [col0, col0 + len(couts[0])) of a task's matrices
+    n_rows: int
+    n_cols: int
+    row0: int
+    col0: int
+    couts: List[List[Optional[float]]]
+    allocation: Optional[List[List[Optional[float]]]] = None # None off the basis; no allocation if never solved
+
+class ResultVersionOut(BaseModel):
+    # One entry of a task's result history (history.py)
+    model_config = ConfigDict(from_attributes=True)
+
+    version: int
+    source: Literal["initial", "optimise", "modification"]
+    cout_total: Optional[float] = None
+    n_rows: int
+    n_cols: int
+    nb_modifications: int # cells changed from the previous version (all of them after a change of dimensions)
+    date_creation: Optional[datetime] = None
+
+class ResultVersionDetail(ResultVersionOut):
+    resultat: TransportTaskResult # rebuilt from the history
+
+class ResultVersionDiff(BaseModel):
+    depuis: int
+    version: int
+    cout_avant: Optional[float] = None
+    cout_apres: Optional[float] = None
+    modifications: List[List[Optional[float]]] # [i, j, value in depuis, value in version]; None off the basis
+
+class TransportTaskVerification(OptimalityCertificate):
+    id: int
+    is_optimized: bool
+
+class TransportTaskSensitivity(BaseModel):
+    base_optimale: bool
+    potentiels: TransportTaskPotentials
+    couts_reduits: List[List[Optional[float]]] # 0 on basic cells, None on forbidden routes
+    # Cost range over which the current plan stays optimal, per cell (None = unbounded)
+    cout_min: List[List[Optional[float]]]
+    cout_max: List[List[Optional[float]]]
+
+class CostPerturbation(BaseModel):
+    i: int
+    j: int
+    delta: float
+
+class WhatIfRequest(BaseModel):
+    scenarios: List[List[CostPerturbation]]
+
+class WhatIfResult(BaseModel):
+    cout_total: float
+    variation: float
+    reste_optimal: bool
+
+
+class ScenarioInput(BaseModel):
+    offres: List[int]
+    demandes: List[int]
+
+class ScenarioBatchCreate(BaseModel):
+    couts: List[List[Optional[int]]] # Shared by every scenario, None marks a forbidden route
+    algo_utilise: Literal["cno", "hammer", "sinkhorn"] # Used for the first (cold) solve only
+    scenarios: List[ScenarioInput]
+
+class ScenarioResult(BaseModel):
+    index: int # Position in the request
+    cout_total: float
+    cellules: List[List[float]] # Sparse allocation: [i, j, quantite]
+    realisable: bool
+    optimal: bool
+    depart: Optional[int] = None # Scenario whose basis was used as warm start
+    iterations: int
+
+
+class SolverJobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    type: Literal["solve", "optimize"]
+    task_id: int
+    statut: Literal["en_attente", "en_cours", "termine", "echoue"]
+    tentatives: int
+    tentatives_max: int
+    worker: Optional[str] = None
+    erreur: Optional[str] = None
+    estimation_secondes: Optional[float] = None # solve time estimated at admission (admission.py)
+    date_creation: Optional[datetime] = None
+    date_debut: Optional[datetime] = None
+    date_fin: Optional[datetime] = None
+
+
+class CostMatrixOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    nom: str
+    empreinte: Optional[str] = None
+    dtype: Optional[str] = None # None for a matrix stored inline (JSON couts)
+    n_rows: int
+    n_cols: int
+    taille_octets: int
+    nb_references: int
+    date_creation: Optional[datetime] = None
+
+class MatrixRepricing(BaseModel):
+    # New tariff of a shared matrix: the whole matrix, or changed cells
+    couts: Optional[List[List[Optional[int]]]] = None # None marks a forbidden route
+    modifications: List[CostChange] = []
+    verifier_optimalite: bool = False # also check each plan's basis against the new costs
+    appliquer: bool = False # else a dry run: nothing is written
+
+    @model_validator(mode="after")
+    def check_tariff(self):
+        if (self.couts is None) == (not self.modifications):
+            raise ValueError("Indiquer soit 'couts', soit 'modifications'.")
+        return self
+
+class RepricedTask(BaseModel):
+    id: int
+    nom: str
+    cout_avant: Optional[float] = None
+    cout_apres: Optional[float] = None # None: the plan ships on a route the new tariff forbids
+    realisable: bool
+    optimal: Optional[bool] = None # verifier_optimalite only: the basis is still optimal
+    a_resoudre: bool = False # applied and no longer feasible: results cleared, erreur_calcul set, to re-solve (PUT)
+
+class MatrixRepricingResult(BaseModel):
+    matrice_id: int
+    nouvelle_matrice_id: Optional[int] = None # applied: the matrix the tasks now share
+    applique: bool
+    nb_taches: int # tasks on the matrix, solved or not
+    taches: List[RepricedTask] # solved tasks only
@@ -0,0 +1,227 @@
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try: # Optional: MessagePack bodies are only offered when the package is installed
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Binary representations of a transport task, negotiated with Content-Type / Accept.
+# Matrices travel as typed arrays and are checked with vectorized shape/dtype tests,
+# so a large couts matrix never becomes a million Python ints.
+#   application/x-npz    numpy .npz archive, one .npy array per field (always available)
+#   application/msgpack  map of fields, matrices as {"dtype", "shape", "data"} typed arrays
+# Forbidden routes (None in JSON) are NaN in a floating-point couts array.
+MEDIA_JSON = "application/json"
+MEDIA_NPZ = "application/x-npz"
+MEDIA_MSGPACK = "application/msgpack"
+
+BINARY_MEDIA_TYPES = (MEDIA_NPZ, MEDIA_MSGPACK) if msgpack is not None else (MEDIA_NPZ,)
+ALGORITHMS = ("cno", "hammer", "sinkhorn")
+
+
+class ArrayTask(NamedTuple):
+    nom: str
+    algo_utilise: str
+    offres: np.ndarray   # int64, shape (n,)
+    demandes: np.ndarray # int64, shape (m,)
+    couts: np.ndarray    # int64, or float64 with NaN for forbidden routes, shape (n, m)
+
+
+def _media_type(header: Optional[str]) -> str:
+    return (header or "").split(";")[0].strip().lower()
+
+
+def is_binary(content_type: Optional[str]) -> bool:
+    return _media_type(content_type) in BINARY_MEDIA_TYPES
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Best supported media type for an Accept header; JSON unless a binary type is preferred."""
+    best, best_q = MEDIA_JSON, 0.0
+    for item in (accept or "").split(","):
+        media, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        media = media.lower()
+        # Strictly greater: on equal quality the first listed type wins
+        if media in BINARY_MEDIA_TYPES + (MEDIA_JSON,) and q > best_q:
+            best, best_q = media, q
+    return best
+
+
+# --- Decoding -------------------------------------------------------------------
+
+def _integral(values: np.ndarray, field: str, allow_nan: bool = False) -> np.ndarray:
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64, copy=False)
+    if values.dtype.kind != "f":
+        raise ValueError(f"'{field}' doit être un tableau numérique (dtype reçu : {values.dtype}).")
+    finite = ~np.isnan(values) if allow_nan else np.ones(values.shape, dtype=bool)
+    checked = values[finite]
+    if not np.isfinite(checked).all() or (checked != np.floor(checked)).any():
+        raise ValueError(f"'{field}' doit contenir des entiers.")
+    if allow_nan and not finite.all():
+        return values.astype(np.float64, copy=False)
+    return values.astype(np.int64)
+
+
+def validate_arrays(offres: np.ndarray, demandes: np.ndarray, couts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized equivalent of the TransportTaskBase checks; raises ValueError."""
+    if offres.ndim != 1 or demandes.ndim != 1:
+        raise ValueError("'offres' et 'demandes' doivent être des vecteurs.")
+    if couts.ndim != 2:
+        raise ValueError("'couts' doit être une matrice.")
+    if couts.shape != (offres.shape[0], demandes.shape[0]):
+        raise ValueError(
+            f"'couts' doit être de taille {offres.shape[0]} x {demandes.shape[0]} "
+            f"(reçu : {couts.shape[0]} x {couts.shape[1]})."
+        )
+    return (
+        _integral(offres, "offres"),
+        _integral(demandes, "demandes"),
+        _integral(couts, "couts", allow_nan=True),
+    )
+
+
+def _scalar_text(value: Any, field: str) -> str:
+    if isinstance(value, np.ndarray):
+        if value.ndim != 0 or value.dtype.kind != "U":
+            raise ValueError(f"'{field}' doit être une chaîne.")
+        value = str(value)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if not isinstance(value, str):
+        raise ValueError(f"'{field}' doit être une chaîne.")
+    return value
+
+
+def _typed_array(value: Any, field: str) -> np.ndarray:
+    if isinstance(value, dict):
+        try:
+            dtype = np.dtype(value["dtype"])
+            array = np.frombuffer(value["data"], dtype=dtype).reshape(value["shape"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Tableau typé '{field}' invalide : {e}")
+        if dtype.kind not in "iuf":
+            raise ValueError(f"'{field}' doit être un tableau numérique (dtype reçu : {dtype}).")
+        return array
+    if isinstance(value, list) and field != "couts": # short vectors may stay plain lists
+        return np.asarray(value, dtype=np.float64 if any(isinstance(x, float) for x in value) else np.int64)
+    raise ValueError(f"'{field}' doit être un tableau typé {{dtype, shape, data}}.")
+
+
+def _decode_npz(body: bytes) -> Dict[str, Any]:
+    # np.load would otherwise try to read anything that is not a zip as a pickle
+    if not body.startswith(b"PK"):
+        raise ValueError("Archive .npz illisible : le corps n'est pas une archive zip.")
+    try:
+        # allow_pickle=False: only plain .npy arrays, never arbitrary objects
+        with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+            return {key: archive[key] for key in archive.files}
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Archive .npz illisible : {e}")
+
+
+def _decode_msgpack(body: bytes) -> Dict[str, Any]:
+    try:
+        fields = msgpack.unpackb(body, raw=False)
+    except Exception as e: # msgpack raises several unrelated exception types
+        raise ValueError(f"Corps MessagePack illisible : {e}")
+    if not isinstance(fields, dict):
+        raise ValueError("Le corps MessagePack doit être une table de champs.")
+    return {key: (_typed_array(value, key) if key in ("offres", "demandes", "couts") else value)
+            for key, value in fields.items()}
+
+
+def decode_task(body: bytes, content_type: str) -> ArrayTask:
+    media = _media_type(content_type)
+    fields = _decode_npz(body) if media == MEDIA_NPZ else _decode_msgpack(body)
+    missing = [key for key in ArrayTask._fields if key not in fields]
+    if missing:
+        raise ValueError(f"Champs manquants : {', '.join(missing)}.")
+    algo = _scalar_text(fields["algo_utilise"], "algo_utilise")
+    if algo not in ALGORITHMS:
+        raise ValueError("Algorithme non reconnu")
+    offres, demandes, couts = validate_arrays(
+        np.asarray(fields["offres"]), np.asarray(fields["demandes"]), np.asarray(fields["couts"])
+    )
+    return ArrayTask(_scalar_text(fields["nom"], "nom"), algo, offres, demandes, couts)
+
+
+def couts_to_json(couts: np.ndarray) -> List[List[Optional[int]]]:
+    """JSON column value of a validated couts array (NaN back to None)."""
+    if couts.dtype.kind == "f":
+        return np.where(np.isnan(couts), None, couts.astype(object)).tolist()
+    return couts.tolist()
+
+
+# --- Encoding -------------------------------------------------------------------
+
+def _is_matrix(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(row, list) for row in value)
+
+
+def _is_vector(value: Any) -> bool:
+    return isinstance(value, list) and all(x is None or isinstance(x, (int, float)) for x in value)
+
+
+def _numeric_array(value: List) -> np.ndarray:
+    # None (forbidden route / non-basic cell) becomes NaN in a float64 array
+    array = np.array(value, dtype=np.float64)
+    if not np.isnan(array).any() and (array == np.floor(array)).all():
+        return array.astype(np.int64)
+    return array
+
+
+def _flatten(payload: Dict[str, Any], prefix: str = "") -> Dict[str, np.ndarray]:
+    arrays = {}
+    for key, value in payload.items():
+        name = prefix + key
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            arrays.update(_flatten(value, name + "."))
+        elif _is_matrix(value) or (_is_vector(value) and value):
+            arrays[name] = _numeric_array(value)
+        elif isinstance(value, datetime):
+            arrays[name] = np.array(value.isoformat())
+        elif isinstance(value, (str, bool, int, float)):
+            arrays[name] = np.array(value)
+        else:
+            arrays[name] = np.array(json.dumps(value))
+    return arrays
+
+
+def _encode_npz(payload: Dict[str, Any]) -> bytes:
+    # Nested results are flattened with dotted keys: "resultat.allocation", "resultat.cout_total", ...
+    buffer = io.BytesIO()
+    np.savez(buffer, **_flatten(payload))
+    return buffer.getvalue()
+
+
+def _pack_typed(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _pack_typed(item) for key, item in value.items()}
+    if _is_matrix(value) or (_is_vector(value) and len(value) > 0):
+        array = np.ascontiguousarray(_numeric_array(value))
+        return {"dtype": array.dtype.str, "shape": list(array.shape), "data": array.tobytes()}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_task(payload: Dict[str, Any], media_type: str) -> bytes:
+    """Binary body for a task payload (the dict built for the JSON response)."""
+    if media_type == MEDIA_NPZ:
+        return _encode_npz(payload)
+    return msgpack.packb(_pack_typed(payload), use_bin_type=True)
@@ -0,0 +1,401 @@
+import logging
+import os
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, ContextManager, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import SessionLocal
+from models import SolverTiming, TransportTask
+from solvers.cno import solve_coin_nord_ouest
+from solvers.hammer import solve_hammer
+from solvers.stepping_stone import solve_stepping_stone
+from solvers.sinkhorn import solve_sinkhorn
+from solvers.assignment import is_assignment, solve_assignment, solve_assignment_lean
+from solvers.decomposition import has_forbidden_routes, optimize_decomposed, solve_decomposed
+from solvers.basis import compute_potentials
+from solvers.sensitivity import basis_potentials
+from solvers.delta import plan_cost_after, reoptimize, still_optimal
+from solvers.certificate import certificate_potentials, check_certificate
+from solvers.lean import (
+    LEAN_INITIAL_SOLVERS, cost_buffer, result_from_store, solve_initial_lean, solve_stepping_stone_lean, sparse_result,
+    store_from_result, store_from_sparse
+)
+from matrices import MatrixFile, open_matrix
+
+# Solving shared by the HTTP endpoints, the background scheduler (scheduler.py) and
+# the job queue workers (worker.py). Everything below works on plain values so it
+# can also run in a worker process; only the apply_* helpers touch the ORM object.
+# couts is either the JSON matrix or a MatrixFile (matrices.py): a registered file is
+# always solved in lean mode on its memory map, and its results are sparse
+# ({"cellules", "flux", "cout_total"}, see sparse_result).
+
+INITIAL_SOLVERS = {
+    "cno": solve_coin_nord_ouest,
+    "hammer": solve_hammer,
+    "sinkhorn": solve_sinkhorn, # approximate, reports its gap to a dual bound
+}
+
+# "lean": solvers run on one shared read-only NumPy cost buffer with a sparse basis
+# (solvers/lean.py); the dense allocation is only built for storage.
+SOLVER_MODE = os.getenv("SOLVER_MODE", "standard")
+
+# Long optimizations save their current basis to optimization_checkpoint at most this
+# often, and a later run resumes from it instead of from initial_result. 0 disables.
+CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "60"))
+
+# Result keys computed from the costs: dropped when a cost edit keeps the plan
+COST_KEYS = ("potentiels", "certificat")
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointWriter:
+    """
+    Saves optimizer snapshots from a background thread. The pivot loop only hands
+    over its latest snapshot; if a write is still running, the next write takes
+    the newest snapshot and skips the ones in between.
+    """
+
+    def __init__(self, task_id: int, stamp: Optional[datetime]):
+        self.task_id = task_id
+        self.stamp = stamp # date_derniere_maj when the run started
+        self._pending = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"checkpoint-{task_id}", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot: dict, encode: Optional[Callable[[dict], dict]] = None) -> None:
+        # encode turns the snapshot into the stored JSON value; it runs on the writer thread
+        with self._condition:
+            self._pending = (snapshot, encode)
+            self._condition.notify()
+
+    def close(self, discard: bool = False) -> None:
+        """Stops the writer; the last snapshot is still written unless discard is set."""
+        with self._condition:
+            if discard:
+                self._pending = None
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                (snapshot, encode), self._pending = self._pending, None
+            self._write(encode(snapshot) if encode else snapshot)
+
+    def _write(self, checkpoint: dict) -> None:
+        db = SessionLocal()
+        try:
+            # Skipped if the task changed since the run started. date_derniere_maj is
+            # set to itself so its onupdate does not fire: a checkpoint is not an edit.
+            current = (
+                db.query(TransportTask.date_derniere_maj)
+                .filter(TransportTask.id == self.task_id)
+                .with_for_update()
+                .first()
+            )
+            if current is None or current.date_derniere_maj != self.stamp:
+                db.rollback()
+                return
+            (
+                db.query(TransportTask)
+                .filter(TransportTask.id == self.task_id)
+                .update(
+                    {
+                        TransportTask.optimization_checkpoint: checkpoint,
+                        TransportTask.date_derniere_maj: TransportTask.date_derniere_maj,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Point de reprise de la tâche %s non enregistré : %s", self.task_id, e)
+        finally:
+            db.close()
+
+
+def assignment_result(offres, demandes, couts) -> dict:
+    """
+    Optimal plan of an assignment problem (see is_assignment), with its duals,
+    whatever initial algorithm the task asked for; "methode" records it.
+    """
+    if isinstance(couts, MatrixFile):
+        cost = open_matrix(couts)
+        store = solve_assignment_lean(cost)
+        result = sparse_result(store)
+        u, v = compute_potentials(cost, store["cellules"])
+        result["potentiels"] = {"offres": u.tolist(), "demandes": v.tolist()}
+    else:
+        result = solve_assignment(offres, demandes, couts)
+        result["potentiels"] = basis_potentials(result["allocation"], couts)
+    result["methode"] = "hongroise"
+    return result
+
+
+def initial_result(algo: str, offres, demandes, couts) -> dict:
+    """CNO/Hammer solution; raises ValueError for an unknown algorithm or an unbalanced block."""
+    solver = INITIAL_SOLVERS.get(algo)
+    if solver is None:
+        raise ValueError("Algorithme non reconnu")
+    if is_assignment(offres, demandes):
+        return assignment_result(offres, demandes, couts)
+    if isinstance(couts, MatrixFile):
+        return sparse_result(LEAN_INITIAL_SOLVERS[algo](offres, demandes, open_matrix(couts)))
+    if SOLVER_MODE == "lean":
+        solver = partial(solve_initial_lean, algo)
+    # Independent regional blocks (split by forbidden routes) are solved separately
+    return solve_decomposed(solver, list(offres), list(demandes), couts)
+
+
+class SolverProfile(NamedTuple):
+    """What a solve costs depends on (cost_model.py): the solver that will actually run and the problem's shape."""
+    operation: str # "solve", "optimize", "reoptimize" (warm start after edits) or "scenarios" (per scenario of a batch)
+    solveur: str
+    n_rows: int
+    n_cols: int
+    densite: float # share of allowed routes
+
+
+def allowed_share(couts) -> float:
+    if isinstance(couts, MatrixFile): # registered files have no forbidden routes
+        return 1.0
+    if isinstance(couts, np.ndarray):
+        return 1.0 - np.count_nonzero(np.isnan(couts)) / couts.size if couts.size else 1.0
+    cells = sum(len(row) for row in couts)
+    return 1.0 - sum(row.count(None) for row in couts) / cells if cells else 1.0
+
+
+def solver_profile(operation: str, algo: str, offres, demandes, couts) -> SolverProfile:
+    # Same routing as initial_result, run_optimizer and solve_scenarios
+    if operation in ("scenarios", "reoptimize"): # warm-started basis simplex, whatever SOLVER_MODE
+        solveur = "stepping_stone_lean"
+    elif is_assignment(offres, demandes):
+        solveur = "hongroise"
+    elif operation == "solve":
+        solveur = algo
+    elif isinstance(couts, MatrixFile) or SOLVER_MODE == "lean":
+        solveur = "stepping_stone_lean"
+    else:
+        solveur = "stepping_stone"
+    return SolverProfile(operation, solveur, len(offres), len(demandes), allowed_share(couts))
+
+
+def solver_timing(profile: SolverProfile, seconds: float, client: Optional[str], count: int = 1) -> SolverTiming:
+    return SolverTiming(
+        **profile._asdict(), duree_secondes=seconds, nb_calculs=count, client=client,
+        date_creation=datetime.now(timezone.utc)
+    )
+
+
+def apply_initial_result(task: TransportTask, result: dict) -> None:
+    task.initial_result = result # Store initial result
+    task.resultat = result       # Active result is initially the initial_result
+    task.cout_total = result["cout_total"]
+    task.optimized_result = None
+    task.optimization_checkpoint = None
+    task.is_optimized = False
+    task.erreur_calcul = None
+
+
+def _optimize_matrix_file(initial_solution: dict, matrix: MatrixFile, checkpoints: Optional[CheckpointWriter]) -> dict:
+    cost = open_matrix(matrix)
+    on_checkpoint = None
+    if checkpoints is not None:
+        on_checkpoint = partial(
+            checkpoints.submit, encode=lambda store: {**sparse_result(store), "iteration": store["iteration"]}
+        )
+    store = solve_stepping_stone_lean(
+        store_from_sparse(initial_solution, cost), cost,
+        on_checkpoint=on_checkpoint, checkpoint_interval=CHECKPOINT_INTERVAL_SECONDS
+    )
+    result = sparse_result(store)
+    u, v = compute_potentials(cost, store["cellules"])
+    result["potentiels"] = {"offres": u.tolist(), "demandes": v.tolist()}
+    return result
+
+
+def run_optimizer(initial_solution: dict, offres, demandes, couts, checkpoints: Optional[CheckpointWriter] = None) -> dict:
+    if is_assignment(offres, demandes):
+        # A Hungarian plan is optimal already: Stepping Stone would only pivot zero flows
+        if initial_solution.get("methode") == "hongroise":
+            return dict(initial_solution)
+        return assignment_result(offres, demandes, couts)
+    if isinstance(couts, MatrixFile):
+        return _optimize_matrix_file(initial_solution, couts, checkpoints)
+    if SOLVER_MODE == "lean":
+        cost = cost_buffer(couts, sum(offres))
+        on_checkpoint = None
+        if checkpoints is not None:
+            # The dense conversion happens on the writer thread, not in the pivot loop
+            on_checkpoint = partial(
+                checkpoints.submit,
+                encode=lambda store: {**result_from_store(store, cost), "iteration": store["iteration"]}
+            )
+        return result_from_store(
+            solve_stepping_stone_lean(
+                store_from_result(initial_solution, cost), cost,
+                on_checkpoint=on_checkpoint, checkpoint_interval=CHECKPOINT_INTERVAL_SECONDS
+            ),
+            cost
+        )
+    if checkpoints is not None and not has_forbidden_routes(couts):
+        # Single block: the same solve optimize_decomposed would run, with checkpoints.
+        # Split problems are optimized block by block in worker processes, without them.
+        return solve_stepping_stone(
+            initial_solution, couts,
+            on_checkpoint=checkpoints.submit, checkpoint_interval=CHECKPOINT_INTERVAL_SECONDS
+        )
+    return optimize_decomposed(
+        solve_stepping_stone,
+        initial_solution, # This is a dict from JSON
+        offres,
+        demandes,
+        couts
+    )
+
+
+def optimized_result(
+    initial_solution: dict,
+    offres,
+    demandes,
+    couts,
+    task_id: Optional[int] = None,
+    stamp: Optional[datetime] = None
+) -> dict:
+    """With a task_id, the run checkpoints to that task (see CheckpointWriter)."""
+    checkpoints = None
+    if task_id is not None and CHECKPOINT_INTERVAL_SECONDS > 0:
+        checkpoints = CheckpointWriter(task_id, stamp)
+    try:
+        result = run_optimizer(initial_solution, offres, demandes, couts, checkpoints)
+    except BaseException:
+        if checkpoints is not None:
+            checkpoints.close() # keep the latest basis for the next attempt
+        raise
+    if checkpoints is not None:
+        checkpoints.close(discard=True)
+    return certified(result, offres, demandes, couts, initial_solution)
+
+
+def certified(result: dict, offres, demandes, couts, initial_solution: Optional[dict] = None) -> dict:
+    """
+    An optimized result with its optimality certificate: the duals of the final
+    basis under "potentiels" (also what sensitivity analysis reads) and the outcome
+    of checking them under "certificat". A dense Stepping Stone run that stopped
+    short (MAX_ITERATIONS, a missed loop) fails the check and is finished by the
+    lean solver from its last basis, or from initial_solution when that basis is
+    not even a feasible plan. Raises ValueError rather than return a plan that
+    does not ship offres to demandes.
+    """
+    if isinstance(couts, MatrixFile): # the lean solver already left the potentials
+        certificate = check_certificate(offres, demandes, open_matrix(couts), result)
+    else:
+        result["potentiels"] = certificate_potentials(result, couts, sum(offres))
+        certificate = check_certificate(offres, demandes, couts, result)
+        if not certificate["verifie"]:
+            sources = [result] if certificate["realisable"] else []
+            sources += [initial_solution] if initial_solution and initial_solution.get("allocation") else []
+            for source in sources:
+                logger.warning("Résultat non certifié optimal (%s) : optimisation terminée en mode lean", certificate)
+                finished = _finish_lean(source, offres, demandes, couts)
+                if finished is not None:
+                    result, certificate = finished
+                    break
+    if not certificate["realisable"]:
+        raise ValueError("L'optimisation n'a pas abouti à un plan réalisable : résultat non enregistré.")
+    result["certificat"] = certificate
+    return result
+
+
+def _finish_lean(source: dict, offres, demandes, couts) -> Optional[Tuple[dict, dict]]:
+    """(result, certificate) of the lean solver run from source; None when its plan is not feasible either."""
+    cost = cost_buffer(couts, sum(offres))
+    try:
+        result = result_from_store(solve_stepping_stone_lean(store_from_result(source, cost), cost), cost)
+    except ValueError: # no spanning basis from this plan
+        return None
+    result["potentiels"] = certificate_potentials(result, couts, sum(offres))
+    certificate = check_certificate(offres, demandes, couts, result)
+    return (result, certificate) if certificate["realisable"] else None
+
+
+def optimization_source(task: TransportTask) -> Optional[dict]:
+    # An interrupted run resumes from its checkpoint; otherwise Stepping Stone starts
+    # from the CNO/Hammer solution, with resultat as the fallback for old rows
+    return task.optimization_checkpoint or task.initial_result or task.resultat
+
+
+def apply_optimized_result(task: TransportTask, result: dict) -> None:
+    task.optimized_result = result
+    task.resultat = result # Update active result
+    task.cout_total = result["cout_total"] # Update root cout_total
+    # Optimized means proven optimal: the certificate attached by certified() checked out
+    task.is_optimized = bool((result.get("certificat") or {}).get("verifie"))
+    task.optimization_checkpoint = None
+    task.erreur_calcul = None
+    task.date_derniere_maj = datetime.utcnow()
+
+
+def edited_result(
+    task: TransportTask,
+    couts_before,
+    couts,
+    changes: List[List],
+    supplies_changed: bool,
+    admitted: Optional[Callable[[str], ContextManager]] = None
+) -> Tuple[str, Optional[dict], Optional[dict]]:
+    """
+    Result of a task after small edits (PATCH), doing only the work they need:
+    (recalcul, new result, its initial solution), the result being None when the
+    current one stands; a warm re-optimization has no initial solution.
+    task already holds the edited offres/demandes; couts_before and couts are the
+    costs before and after the cost changes [[i, j, cout], ...].
+    The solves run inside admitted("reoptimisation") / admitted("complet") (admission
+    control, see routers/transport.py); the cheaper outcomes run no solver at all.
+    """
+    admitted = admitted or (lambda recalcul: nullcontext())
+    current = task.resultat or {}
+    allocation = current.get("allocation")
+    if allocation is not None and task.is_optimized:
+        if not supplies_changed and still_optimal(allocation, couts_before, changes, current.get("potentiels")):
+            return "aucun", None, None # only non-basic cells changed, none became worth using
+        with admitted("reoptimisation"):
+            try:
+                result = reoptimize(allocation, couts, task.offres, task.demandes)
+            except ValueError:
+                result = None # the old basis is of no use: solved from scratch below
+            if result is not None and result.pop("optimal"):
+                try:
+                    return "reoptimisation", certified(result, task.offres, task.demandes, couts), None
+                except ValueError:
+                    pass # not a feasible plan: solved from scratch below
+    elif allocation is not None and not supplies_changed and task.algo_utilise == "cno" and current.get("methode") != "hongroise":
+        # North-West Corner ignores costs: the plan stands unless a forbidden route moved.
+        # An assignment was solved on the costs (Hungarian method): solved again below
+        if not any(cout is None or couts_before[i][j] is None for i, j, cout in changes):
+            cout_total = plan_cost_after(allocation, current["cout_total"], couts_before, changes)
+            if cout_total is not None:
+                result = {key: value for key, value in current.items() if key not in COST_KEYS}
+                result["cout_total"] = cout_total
+                return "cout", result, result
+
+    with admitted("complet"):
+        initial = initial_result(task.algo_utilise, task.offres, task.demandes, couts)
+        if task.is_optimized: # the task stays optimized
+            return "complet", optimized_result(initial, task.offres, task.demandes, couts), initial
+        return "complet", initial, initial
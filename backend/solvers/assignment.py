@@ -0,0 +1,180 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from solvers.basis import SCAN_CHUNK_CELLS, allocation_from_basis, cost_array, primal_simplex
+from solvers.lean import cost_buffer
+
+# Assignment problems (every supply and demand equal to 1: drivers to jobs) are the
+# most degenerate transport problems there are: CNO/Hammer add n - 1 EPSILON cells
+# and Stepping Stone spends its pivots moving zero flow. The Hungarian method
+# (shortest augmenting paths with dual potentials, O(n^3)) solves them directly;
+# each step works on a whole row of the matrix at once.
+
+TIGHT_TOLERANCE = 1e-9 # Reduced costs this close to 0 count as tight
+
+
+def is_assignment(offres, demandes) -> bool:
+    n = len(offres)
+    return n > 0 and n == len(demandes) and bool(np.all(np.asarray(offres) == 1)) and bool(np.all(np.asarray(demandes) == 1))
+
+
+def _reduced_potentials(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Row then column reductions, by row chunks: u_i = min_j c_ij, v_j = min_i (c_ij - u_i)."""
+    n, m = cost.shape
+    step = max(1, SCAN_CHUNK_CELLS // max(m, 1))
+    u = np.empty(n)
+    v = np.full(m, np.inf)
+    for r0 in range(0, n, step):
+        block = np.asarray(cost[r0:r0 + step], dtype=np.float64)
+        u[r0:r0 + step] = block.min(axis=1)
+        v = np.minimum(v, (block - u[r0:r0 + step, None]).min(axis=0))
+    return u, v
+
+
+def hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Minimum-cost perfect matching of a square matrix with finite costs.
+    Returns the column of each row and optimal dual potentials u, v
+    (c_ij - u_i - v_j >= 0, with equality on the matching).
+    """
+    n = cost.shape[0]
+    u, v_cols = _reduced_potentials(cost)
+    v = np.append(v_cols, 0.0) # column n is the virtual start of each augmenting path
+    row_of = np.full(n + 1, -1, dtype=np.intp)
+
+    # Reductions leave a zero in every row: match greedily on them first
+    for i in range(n):
+        tight = np.flatnonzero(np.asarray(cost[i], dtype=np.float64) - u[i] - v[:n] <= TIGHT_TOLERANCE)
+        free = tight[row_of[tight] == -1]
+        if len(free):
+            row_of[free[0]] = i
+
+    matched = np.zeros(n, dtype=bool)
+    matched[row_of[:n][row_of[:n] >= 0]] = True
+    for i in np.flatnonzero(~matched):
+        # Dijkstra on reduced costs from row i to the nearest free column
+        row_of[n] = i
+        j0 = n
+        min_reduced = np.full(n, np.inf)
+        way = np.full(n, n, dtype=np.intp)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = row_of[j0]
+            free = ~used[:n]
+            reduced = np.asarray(cost[i0], dtype=np.float64) - u[i0] - v[:n]
+            better = free & (reduced < min_reduced)
+            min_reduced[better] = reduced[better]
+            way[better] = j0
+            candidates = np.where(free, min_reduced, np.inf)
+            j1 = int(np.argmin(candidates))
+            delta = candidates[j1]
+            visited = np.flatnonzero(used)
+            u[row_of[visited]] += delta
+            v[visited] -= delta
+            min_reduced[free] -= delta
+            j0 = j1
+            if row_of[j0] == -1:
+                break
+        while j0 != n: # flip the path
+            j1 = way[j0]
+            row_of[j0] = row_of[j1]
+            j0 = j1
+
+    col_of = np.empty(n, dtype=np.intp)
+    col_of[row_of[:n]] = np.arange(n)
+    return col_of, u, v[:n]
+
+
+def _reduced_cost_tree(cost: np.ndarray, u: np.ndarray, v: np.ndarray, cells) -> list:
+    """
+    Spanning basis tree around the matching (its cells first): the components it
+    leaves are joined by Boruvka rounds on the reduced costs c_ij - u_i - v_j, each
+    component taking its cheapest crossing cell, so the added zero-flow cells are the
+    tight ones whenever possible. The reduced costs are priced by row chunks and
+    never held as a whole matrix.
+    """
+    n, m = cost.shape
+    parent = list(range(n + m))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    tree = []
+    for i, j in cells:
+        parent[find(n + j)] = find(i)
+        tree.append((i, j))
+    step = max(1, SCAN_CHUNK_CELLS // max(m, 1))
+    while len(tree) < n + m - 1:
+        labels = np.array([find(x) for x in range(n + m)])
+        best_value = np.full(n + m, np.inf)
+        best_cell = np.zeros((n + m, 2), dtype=np.intp)
+        for r0 in range(0, n, step):
+            rows = np.arange(r0, min(r0 + step, n))
+            block = np.asarray(cost[r0:r0 + step], dtype=np.float64) - u[rows, None] - v[None, :]
+            block[(labels[rows, None] == labels[None, n:]) | np.isnan(block)] = np.inf
+            # Cheapest crossing cell of each row and of each column of the chunk
+            row_best = block.argmin(axis=1)
+            col_best = block.argmin(axis=0)
+            comp = np.concatenate([labels[rows], labels[n:]])
+            value = np.concatenate([block[rows - r0, row_best], block[col_best, np.arange(m)]])
+            cell_i = np.concatenate([rows, r0 + col_best])
+            cell_j = np.concatenate([row_best, np.arange(m)])
+            order = np.argsort(value, kind="stable")
+            _, first = np.unique(comp[order], return_index=True)
+            pick = order[first]
+            better = value[pick] < best_value[comp[pick]]
+            pick = pick[better]
+            best_value[comp[pick]] = value[pick]
+            best_cell[comp[pick]] = np.column_stack([cell_i[pick], cell_j[pick]])
+        added = False
+        for root in np.flatnonzero(np.isfinite(best_value)):
+            i, j = (int(x) for x in best_cell[root])
+            ri, rj = find(i), find(n + j)
+            if ri != rj:
+                parent[rj] = ri
+                tree.append((i, j))
+                added = True
+        if not added:
+            raise ValueError("Les routes autorisées ne relient pas toutes les offres et demandes.")
+    return tree
+
+
+def solve_assignment_lean(cost: np.ndarray) -> Dict:
+    """
+    Optimal assignment as a sparse basis store (see solvers/lean.py): the n matched
+    cells carry 1 and n - 1 zero-flow cells join them into a spanning tree, chosen
+    among the tight cells so the basis is (nearly always) dual feasible already;
+    a few zero-flow Stepping Stone pivots finish the job when it is not.
+    """
+    n = cost.shape[0]
+    col_of, u, v = hungarian(cost)
+    tree = _reduced_cost_tree(cost, u, v, [(i, int(j)) for i, j in enumerate(col_of)])
+    flows = np.array([1.0 if k < n else 0.0 for k in range(len(tree))])
+    tree, flows, _, _ = primal_simplex(cost, tree, flows, max_iterations=n * n)
+    # Only the n shipping cells are read back: no full-matrix conversion for the total
+    rows, cols = zip(*(cell for cell, q in zip(tree, flows) if q > 0.5))
+    return {
+        "cellules": tree,
+        "flux": flows,
+        "cout_total": round(float(np.asarray(cost[list(rows), list(cols)], dtype=np.float64).sum()), 2),
+    }
+
+
+def solve_assignment(offres, demandes, couts) -> Dict:
+    """
+    Same result format as the other solvers (allocation with EPSILON cells,
+    cout_total), optimal. Raises ValueError when forbidden routes leave no
+    complete assignment.
+    """
+    n = len(offres)
+    cost = cost_buffer(couts, n) # forbidden routes: big-M penalty
+    store = solve_assignment_lean(cost)
+    forbidden = np.isnan(cost_array(couts))
+    if any(forbidden[i, j] and q > 0.5 for (i, j), q in zip(store["cellules"], store["flux"])):
+        raise ValueError("Aucune affectation complète n'évite les routes interdites.")
+    return allocation_from_basis(n, n, store["cellules"], store["flux"], cost)
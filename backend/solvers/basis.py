@@ -0,0 +1,473 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EPSILON = 1e-6 # Degeneracy marker used by the CNO/Hammer solvers
+EPSILON_BASIS = EPSILON / 10 # Same "is basic" threshold as the Stepping Stone solver
+
+SCAN_MAX_COMPONENTS = 32 # spanning_basis: above this, sort the whole matrix once instead of scanning
+SCAN_CHUNK_CELLS = 1 << 20 # Cells examined per numpy call when scanning a matrix by row chunks
+
+# Nodes of the basis graph: rows are 0..n-1, columns are n..n+m-1.
+# A basic cell (i, j) is the edge between node i and node n + j.
+
+
+def cost_array(couts) -> np.ndarray:
+    """Float copy of the cost matrix, with NaN for forbidden (None) routes."""
+    if isinstance(couts, np.ndarray):
+        return couts.astype(np.float64, copy=False)
+    try:
+        return np.asarray(couts, dtype=np.float64)
+    except TypeError: # None entries
+        return np.array([[np.nan if c is None else c for c in row] for row in couts], dtype=np.float64)
+
+
+def basic_cells(allocation: List[List[Optional[float]]]) -> List[Tuple[int, int]]:
+    return [
+        (i, j)
+        for i, row in enumerate(allocation)
+        for j, val in enumerate(row)
+        if val is not None and val > EPSILON_BASIS
+    ]
+
+
+def flow_array(allocation: List[List[Optional[float]]]) -> np.ndarray:
+    """Dense float copy of an allocation with None read as 0."""
+    return np.array([[0.0 if v is None else v for v in row] for row in allocation], dtype=np.float64)
+
+
+def tree_order(n: int, m: int, cells: List[Tuple[int, int]]) -> Dict:
+    """
+    Walks the basis graph breadth-first from one root per connected component.
+    Returns the visit order, each node's parent and the index (in cells) of the
+    edge leading to it. Edges closing a cycle are ignored; 'is_tree' tells whether
+    the basis is a single spanning tree (n + m - 1 cells, no cycle).
+    """
+    adjacency: List[List[Tuple[int, int]]] = [[] for _ in range(n + m)]
+    for k, (i, j) in enumerate(cells):
+        adjacency[i].append((n + j, k))
+        adjacency[n + j].append((i, k))
+
+    parent = [-1] * (n + m)
+    parent_edge = [-1] * (n + m)
+    component = [-1] * (n + m)
+    order: List[int] = []
+    n_components = 0
+    for root in range(n + m):
+        if component[root] != -1:
+            continue
+        component[root] = n_components
+        head = len(order)
+        order.append(root)
+        while head < len(order):
+            node = order[head]
+            head += 1
+            for other, k in adjacency[node]:
+                if component[other] == -1:
+                    component[other] = n_components
+                    parent[other] = node
+                    parent_edge[other] = k
+                    order.append(other)
+        n_components += 1
+
+    return {
+        "order": order,
+        "parent": parent,
+        "parent_edge": parent_edge,
+        "component": component,
+        "is_tree": n_components == 1 and len(cells) == n + m - 1,
+    }
+
+
+def compute_potentials(cost: np.ndarray, cells: List[Tuple[int, int]], tree: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MODI potentials: u_i + v_j = c_ij on every basic cell, with the root of each
+    basis component fixed at 0. O(n + m) once the tree order is known.
+    """
+    n, m = cost.shape
+    if tree is None:
+        tree = tree_order(n, m, cells)
+    potential = np.zeros(n + m)
+    parent, parent_edge = tree["parent"], tree["parent_edge"]
+    for node in tree["order"]:
+        if parent[node] == -1:
+            continue
+        i, j = cells[parent_edge[node]]
+        potential[node] = cost[i, j] - potential[parent[node]]
+    return potential[:n], potential[n:]
+
+
+def reduced_costs(cost: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """d_ij = c_ij - u_i - v_j for every cell (NaN on forbidden routes)."""
+    d = np.subtract(cost, u[:, None], dtype=np.float64)
+    d -= v[None, :] # in place: one n x m temporary instead of two
+    return d
+
+
+def euler_times(n: int, m: int, tree: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Entry/exit times of a depth-first walk of the basis forest:
+    node y is in the subtree of x iff tin[x] <= tin[y] <= tout[x].
+    """
+    children: List[List[int]] = [[] for _ in range(n + m)]
+    for node in tree["order"]:
+        if tree["parent"][node] != -1:
+            children[tree["parent"][node]].append(node)
+
+    tin = np.zeros(n + m, dtype=np.int64)
+    tout = np.zeros(n + m, dtype=np.int64)
+    clock = 0
+    for root in tree["order"]:
+        if tree["parent"][root] != -1:
+            continue
+        stack = [(root, False)]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                tout[node] = clock - 1
+                continue
+            tin[node] = clock
+            clock += 1
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children[node]))
+    return tin, tout
+
+
+def spanning_basis(cost: np.ndarray, cells: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Turns a set of candidate basic cells into a spanning tree of the basis graph:
+    cells closing a cycle are dropped (in order, so flows should come first) and
+    the remaining components are joined by the cheapest allowed zero-flow cells.
+    Raises ValueError when forbidden routes make the graph impossible to connect.
+    """
+    n, m = cost.shape
+    parent = list(range(n + m))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    tree: List[Tuple[int, int]] = []
+    for i, j in cells:
+        ri, rj = find(i), find(n + j)
+        if ri != rj:
+            parent[rj] = ri
+            tree.append((i, j))
+    if len(tree) == n + m - 1:
+        return tree
+
+    # Few components (the usual degenerate case): a chunked scan per missing edge keeps
+    # memory bounded. Many components: one global sort of the allowed cells.
+    if n + m - len(tree) <= SCAN_MAX_COMPONENTS:
+        while len(tree) < n + m - 1:
+            labels = np.array([find(x) for x in range(n + m)])
+            best = _cheapest_crossing(cost, labels[:n], labels[n:])
+            if best is None:
+                break
+            i, j = best
+            parent[find(n + j)] = find(i)
+            tree.append((i, j))
+        if len(tree) == n + m - 1:
+            return tree
+    else:
+        flat_cost = cost_array(cost).ravel()
+        allowed = np.flatnonzero(~np.isnan(flat_cost))
+        for flat in allowed[np.argsort(flat_cost[allowed], kind="stable")]:
+            i, j = divmod(int(flat), m)
+            ri, rj = find(i), find(n + j)
+            if ri != rj:
+                parent[rj] = ri
+                tree.append((i, j))
+                if len(tree) == n + m - 1:
+                    return tree
+    raise ValueError("Les routes autorisées ne relient pas toutes les offres et demandes.")
+
+
+def _forest_path(adjacency: Dict[int, Dict[int, Tuple[int, int]]], source: int, target: int) -> List[Tuple[int, int]]:
+    """Cells on the forest path from node source to node target (they are connected)."""
+    came_from = {source: None}
+    queue = [source]
+    for node in queue:
+        if node == target:
+            break
+        for neighbour, cell in adjacency[node].items():
+            if neighbour not in came_from:
+                came_from[neighbour] = (node, cell)
+                queue.append(neighbour)
+    path = []
+    node = target
+    while came_from[node] is not None:
+        node, cell = came_from[node]
+        path.append(cell)
+    return path[::-1]
+
+
+def plan_basis(cost: np.ndarray, cells: List[Tuple[int, int]], flows) -> Tuple[List[Tuple[int, int]], np.ndarray]:
+    """
+    Spanning basis tree (cells, flows) carrying the same plan: every cell with flow
+    is kept. A plan whose flows close a cycle (a dense Stepping Stone result can) is
+    first moved around the cycle, in the direction that does not raise its cost,
+    until one of the cycle's cells is empty; the pieces are then joined by zero-flow
+    cells, the plan's own first (see spanning_basis). Raises ValueError when they
+    cannot be joined.
+    """
+    n, m = cost.shape
+    flow_of: Dict[Tuple[int, int], float] = {}
+    empty: List[Tuple[int, int]] = []
+    adjacency: Dict[int, Dict[int, Tuple[int, int]]] = {node: {} for node in range(n + m)}
+    parent = list(range(n + m))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def link(cell: Tuple[int, int], flow: float) -> None:
+        i, j = cell
+        adjacency[i][n + j] = cell
+        adjacency[n + j][i] = cell
+        flow_of[cell] = flow
+
+    for (i, j), flow in zip(cells, flows):
+        cell, flow = (int(i), int(j)), float(flow)
+        if flow <= EPSILON: # degeneracy marker or empty cell
+            empty.append(cell)
+            continue
+        ri, rj = find(cell[0]), find(n + cell[1])
+        if ri != rj:
+            parent[rj] = ri
+            link(cell, flow)
+            continue
+        # Cycle: cell +, then alternately - / + along the forest path from its column to its row
+        loop = [cell] + _forest_path(adjacency, n + cell[1], cell[0])
+        signs = [1 if k % 2 == 0 else -1 for k in range(len(loop))]
+        loop_flows = [flow] + [flow_of[c] for c in loop[1:]]
+        delta = sum(sign * float(cost[c]) for sign, c in zip(signs, loop))
+        direction = 1 if delta <= 0 else -1
+        losing = [k for k, sign in enumerate(signs) if sign * direction < 0]
+        theta = min(loop_flows[k] for k in losing)
+        emptied = next(k for k in losing if loop_flows[k] == theta)
+        for k, sign in enumerate(signs):
+            loop_flows[k] += sign * direction * theta
+        loop_flows[emptied] = 0.0
+        for c, value in zip(loop[1:], loop_flows[1:]):
+            flow_of[c] = value
+        if emptied == 0:
+            empty.append(cell)
+            continue
+        gone = loop[emptied]
+        i, j = gone
+        del adjacency[i][n + j], adjacency[n + j][i], flow_of[gone]
+        empty.append(gone)
+        link(cell, loop_flows[0])
+        parent[:] = range(n + m) # an edge left the forest: rebuild the components
+        for a, b in flow_of:
+            ra, rb = find(a), find(n + b)
+            if ra != rb:
+                parent[rb] = ra
+
+    forest = list(flow_of)
+    tree = spanning_basis(cost, forest + empty)
+    return tree, np.array([flow_of.get(cell, 0.0) for cell in tree], dtype=np.float64)
+
+
+def _cheapest_crossing(cost: np.ndarray, row_labels: np.ndarray, col_labels: np.ndarray) -> Optional[Tuple[int, int]]:
+    """Cheapest allowed cell whose row and column are in different components, scanned by row chunks."""
+    n, m = cost.shape
+    step = max(1, SCAN_CHUNK_CELLS // max(m, 1))
+    best, best_value = None, np.inf
+    for r0 in range(0, n, step):
+        block = cost[r0:r0 + step]
+        crossing = row_labels[r0:r0 + step, None] != col_labels[None, :]
+        if block.dtype.kind == "f":
+            crossing &= ~np.isnan(block)
+        values = np.where(crossing, block, np.inf)
+        k = int(np.argmin(values))
+        if values.flat[k] < best_value:
+            best_value = values.flat[k]
+            best = (r0 + k // m, k % m)
+    return best
+
+
+def tree_flows(n: int, m: int, cells: List[Tuple[int, int]], tree: Dict, offres, demandes) -> np.ndarray:
+    """
+    Flows of a basis tree, which are fully determined by supplies and demands:
+    each edge carries the net supply of the subtree hanging below it. O(n + m).
+    Negative flows mean the basis is not primal feasible for these supplies.
+    """
+    net = np.concatenate([np.asarray(offres, dtype=np.float64), -np.asarray(demandes, dtype=np.float64)])
+    flows = np.zeros(len(cells))
+    parent, parent_edge = tree["parent"], tree["parent_edge"]
+    for node in reversed(tree["order"]):
+        p = parent[node]
+        if p == -1:
+            if abs(net[node]) > EPSILON_BASIS:
+                raise ValueError("Les offres et demandes ne sont pas équilibrées sur la base.")
+            continue
+        flows[parent_edge[node]] = net[node] if node < n else -net[node]
+        net[p] += net[node]
+    return flows
+
+
+def _entering_candidates(cost: np.ndarray, cells: List[Tuple[int, int]], u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    d = reduced_costs(cost, u, v)
+    if cost.dtype.kind == "f":
+        d[np.isnan(d)] = np.inf
+    if cells:
+        rows, cols = zip(*cells)
+        d[list(rows), list(cols)] = np.inf
+    return d
+
+
+def _most_negative_reduced_cost(
+    cost: np.ndarray,
+    cells: List[Tuple[int, int]],
+    u: np.ndarray,
+    v: np.ndarray
+) -> Tuple[int, int, float]:
+    """
+    Entering cell of primal_simplex: the first minimum of the candidate reduced costs
+    in row-major order, priced by row chunks so a large (possibly memory-mapped)
+    matrix never needs a full n x m temporary.
+    """
+    n, m = cost.shape
+    step = max(1, SCAN_CHUNK_CELLS // max(m, 1))
+    basic_rows, basic_cols = (np.array(axis) for axis in zip(*cells)) if cells else (np.empty(0, int), np.empty(0, int))
+    best, best_value = (0, 0), np.inf
+    for r0 in range(0, n, step):
+        d = _entering_candidates(cost[r0:r0 + step], [], u[r0:r0 + step], v)
+        in_block = (basic_rows >= r0) & (basic_rows < r0 + step)
+        d[basic_rows[in_block] - r0, basic_cols[in_block]] = np.inf
+        k = int(np.argmin(d))
+        if d.flat[k] < best_value:
+            best_value = float(d.flat[k])
+            best = (r0 + k // m, k % m)
+    return best[0], best[1], best_value
+
+
+def dual_simplex(
+    cost: np.ndarray,
+    cells: List[Tuple[int, int]],
+    offres,
+    demandes,
+    max_iterations: int
+) -> Tuple[List[Tuple[int, int]], np.ndarray, int]:
+    """
+    Restores primal feasibility of a spanning basis after supplies/demands changed.
+    Costs are unchanged, so an optimal basis is still dual feasible: each pivot drops
+    the most negative flow and lets in the cheapest cell crossing the cut it leaves,
+    which keeps every reduced cost non-negative.
+    """
+    n, m = cost.shape
+    cells = list(cells)
+    for iteration in range(max_iterations + 1):
+        tree = tree_order(n, m, cells)
+        flows = tree_flows(n, m, cells, tree, offres, demandes)
+        leaving = int(np.argmin(flows)) if len(flows) else -1
+        if leaving == -1 or flows[leaving] >= -EPSILON_BASIS:
+            return cells, flows, iteration
+        if iteration == max_iterations:
+            break
+
+        u, v = compute_potentials(cost, cells, tree)
+        candidates = _entering_candidates(cost, cells, u, v)
+        child = next(node for node in range(n + m) if tree["parent_edge"][node] == leaving)
+        tin, tout = euler_times(n, m, tree)
+        in_subtree = (tin >= tin[child]) & (tin <= tout[child])
+        p, _ = cells[leaving]
+        p_side = in_subtree if in_subtree[p] else ~in_subtree
+        # The side of row p lacks supply: ship it from the other side's rows to this side's columns
+        rows_from = np.flatnonzero(~p_side[:n])
+        cols_to = np.flatnonzero(p_side[n:])
+        block = candidates[np.ix_(rows_from, cols_to)]
+        if block.size == 0 or not np.isfinite(block).any():
+            raise ValueError("Aucune base réalisable : les routes autorisées ne couvrent pas les demandes.")
+        r, c = divmod(int(np.argmin(block)), block.shape[1])
+        cells[leaving] = (int(rows_from[r]), int(cols_to[c]))
+    raise ValueError("Le simplexe dual n'a pas convergé.")
+
+
+def primal_simplex(
+    cost: np.ndarray,
+    cells: List[Tuple[int, int]],
+    flows: np.ndarray,
+    max_iterations: int,
+    tolerance: float = 1e-9,
+    on_checkpoint: Optional[Callable[[List[Tuple[int, int]], np.ndarray, int], None]] = None,
+    checkpoint_interval: Optional[float] = None
+) -> Tuple[List[Tuple[int, int]], np.ndarray, int, bool]:
+    """
+    Stepping Stone on a spanning basis tree with MODI pricing: the entering cell is
+    the most negative reduced cost, and its loop is the tree path between its row
+    and column, so each pivot costs O(n + m) plus one vectorized O(n * m) pricing.
+    Returns the final basis, its flows, the pivot count and whether it is optimal.
+    on_checkpoint(cells, flows, pivots) gets copies of the basis at most every
+    checkpoint_interval seconds.
+    """
+    n, m = cost.shape
+    cells = list(cells)
+    flows = np.array(flows, dtype=np.float64)
+    next_checkpoint = time.monotonic() + (checkpoint_interval or 0) if on_checkpoint else None
+    for iteration in range(max_iterations + 1):
+        if next_checkpoint is not None and iteration and time.monotonic() >= next_checkpoint:
+            on_checkpoint(list(cells), flows.copy(), iteration)
+            next_checkpoint = time.monotonic() + (checkpoint_interval or 0)
+        tree = tree_order(n, m, cells)
+        u, v = compute_potentials(cost, cells, tree)
+        r, c, value = _most_negative_reduced_cost(cost, cells, u, v)
+        if not value < -tolerance:
+            return cells, flows, iteration, True
+        if iteration == max_iterations:
+            break
+
+        path = _tree_path(tree, n + c, r)
+        # Loop: (r, c) +theta, then alternately -theta / +theta walking from column c back to row r
+        minus = path[0::2]
+        theta = min(flows[k] for k in minus)
+        leaving = next(k for k in minus if flows[k] == theta)
+        for pos, k in enumerate(path):
+            flows[k] += theta if pos % 2 else -theta
+        cells[leaving] = (r, c)
+        flows[leaving] = theta
+    return cells, flows, max_iterations, False
+
+
+def _tree_path(tree: Dict, a: int, b: int) -> List[int]:
+    """Edge indices on the tree path from node a to node b."""
+    parent, parent_edge = tree["parent"], tree["parent_edge"]
+    depth = tree.get("depth")
+    if depth is None:
+        depth = [0] * len(parent)
+        for node in tree["order"]:
+            if parent[node] != -1:
+                depth[node] = depth[parent[node]] + 1
+        tree["depth"] = depth
+    up_a, up_b = [], []
+    while depth[a] > depth[b]:
+        up_a.append(parent_edge[a]); a = parent[a]
+    while depth[b] > depth[a]:
+        up_b.append(parent_edge[b]); b = parent[b]
+    while a != b:
+        up_a.append(parent_edge[a]); a = parent[a]
+        up_b.append(parent_edge[b]); b = parent[b]
+    return up_a + up_b[::-1]
+
+
+def allocation_from_basis(n: int, m: int, cells: List[Tuple[int, int]], flows: np.ndarray, cost: np.ndarray) -> Dict:
+    """Back to the usual result format; zero-flow basic cells keep an EPSILON marker."""
+    allocation = [[None for _ in range(m)] for _ in range(n)]
+    total_cost = 0
+    for (i, j), flow in zip(cells, flows.tolist()):
+        if flow > EPSILON_BASIS:
+            allocation[i][j] = flow
+            total_cost += flow * cost[i, j]
+        else:
+            allocation[i][j] = EPSILON
+    return {
+        "allocation": allocation,
+        "cout_total": round(float(total_cost), 2)
+    }
@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from solvers.basis import SCAN_CHUNK_CELLS, basic_cells, compute_potentials, cost_array
+from solvers.lean import cost_buffer
+
+# Optimality certificates. A transport plan x is optimal when dual potentials (u, v)
+# exist with
+#     x feasible: rows ship the offres, columns receive the demandes, x >= 0,
+#                 nothing on a forbidden route;
+#     dual feasible: c_ij - u_i - v_j >= 0 on every allowed route;
+#     complementary slackness: c_ij - u_i - v_j = 0 wherever x_ij > 0.
+# Then sum(c x) = sum(u offres) + sum(v demandes), a lower bound on every plan's
+# cost, so nobody has to re-solve the LP to trust the result: checking is one
+# vectorized pass over the matrix. The potentials of an optimal basis are such a
+# certificate; results store them under "potentiels".
+
+FLOW_TOLERANCE = 1e-5   # below this, a stored value is a degeneracy marker (EPSILON), not a flow
+COST_TOLERANCE = 1e-6   # relative to the largest cost: reduced costs this close to 0 count as 0
+
+
+def plan_cells(result: Dict, n: int, m: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(rows, cols, flows) of the cells a result stores, dense or sparse."""
+    if result.get("cellules") is not None:
+        cells = np.asarray(result["cellules"], dtype=np.intp).reshape(-1, 2)
+        return cells[:, 0], cells[:, 1], np.asarray(result["flux"], dtype=np.float64)
+    allocation = np.nan_to_num(cost_array(result["allocation"]), nan=0.0)
+    if allocation.shape != (n, m):
+        raise ValueError("L'allocation ne correspond pas aux dimensions de la tâche.")
+    rows, cols = np.nonzero(allocation)
+    return rows, cols, allocation[rows, cols]
+
+
+def _plan_basis(result: Dict) -> List[Tuple[int, int]]:
+    if result.get("cellules") is not None:
+        return [(int(i), int(j)) for i, j in result["cellules"]]
+    return basic_cells(result["allocation"])
+
+
+def certificate_potentials(result: Dict, couts, total_supply: float) -> Dict:
+    """
+    Potentials of the basis a result holds, on the costs the solvers optimize:
+    forbidden routes at their big-M penalty, so every entry is a number.
+    """
+    cost = cost_buffer(couts, total_supply)
+    u, v = compute_potentials(cost, _plan_basis(result))
+    return {"offres": u.tolist(), "demandes": v.tolist()}
+
+
+def _stored_potentials(result: Dict, n: int, m: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    potentiels = result.get("potentiels")
+    if not potentiels or len(potentiels["offres"]) != n or len(potentiels["demandes"]) != m:
+        return None
+    if any(x is None for x in potentiels["offres"]) or any(x is None for x in potentiels["demandes"]):
+        return None
+    return np.asarray(potentiels["offres"], dtype=np.float64), np.asarray(potentiels["demandes"], dtype=np.float64)
+
+
+def check_certificate(offres, demandes, couts, result: Dict) -> Dict:
+    """
+    Checks a result against its stored potentials (or, when it has none, those of
+    its basis). O(n m) on the costs, by row chunks; O(n + m) on the plan.
+    """
+    n, m = len(offres), len(demandes)
+    offres = np.asarray(offres, dtype=np.float64)
+    demandes = np.asarray(demandes, dtype=np.float64)
+    cost = cost_array(couts) if not isinstance(couts, np.ndarray) else couts
+    rows, cols, flows = plan_cells(result, n, m)
+
+    # Primal feasibility
+    shipped = flows > FLOW_TOLERANCE
+    flow_tolerance = FLOW_TOLERANCE * (n + m) + 1e-9 * float(offres.sum())
+    rows_ok = np.abs(np.bincount(rows, weights=flows, minlength=n) - offres).max(initial=0) <= flow_tolerance
+    cols_ok = np.abs(np.bincount(cols, weights=flows, minlength=m) - demandes).max(initial=0) <= flow_tolerance
+    cell_costs = np.asarray(cost[rows, cols], dtype=np.float64)
+    on_forbidden = shipped & np.isnan(cell_costs)
+    feasible = bool(rows_ok and cols_ok and flows.min(initial=0) >= -FLOW_TOLERANCE and not on_forbidden.any())
+    plan_cost = float(np.dot(np.nan_to_num(cell_costs[shipped]), flows[shipped]))
+
+    potentials = _stored_potentials(result, n, m)
+    if potentials is None:
+        u, v = compute_potentials(cost_buffer(couts, float(offres.sum())), _plan_basis(result))
+    else:
+        u, v = potentials
+
+    # Dual feasibility on the allowed routes, one row chunk at a time
+    step = max(1, SCAN_CHUNK_CELLS // max(m, 1))
+    min_reduced = np.inf
+    max_cost = 0.0
+    for r0 in range(0, n, step):
+        block = np.asarray(cost[r0:r0 + step], dtype=np.float64)
+        reduced = block - u[r0:r0 + step, None] - v[None, :]
+        allowed = ~np.isnan(block)
+        if allowed.any():
+            min_reduced = min(min_reduced, float(reduced[allowed].min()))
+            max_cost = max(max_cost, float(np.abs(block[allowed]).max()))
+    cost_tolerance = COST_TOLERANCE * max(1.0, max_cost)
+    dual_feasible = bool(min_reduced >= -cost_tolerance)
+
+    # Complementary slackness on the shipping cells
+    slack = cell_costs[shipped] - u[rows[shipped]] - v[cols[shipped]]
+    slackness = bool(np.all(np.abs(slack) <= cost_tolerance)) if slack.size else True
+
+    dual_bound = float(np.dot(u, offres) + np.dot(v, demandes))
+    return {
+        "verifie": feasible and dual_feasible and slackness,
+        "realisable": feasible,
+        "duale_realisable": dual_feasible,
+        "ecarts_complementaires": slackness,
+        "cout_plan": round(plan_cost, 6),
+        "borne_duale": round(dual_bound, 6),
+        "cout_reduit_min": None if min_reduced == np.inf else round(min_reduced, 6),
+    }
@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 EPSILON = 1e-6 # Define a small epsilon value
 
 def solve_coin_nord_ouest(offres, demandes, couts):
@@ -0,0 +1,278 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from solvers.basis import EPSILON_BASIS, allocation_from_basis, plan_basis, primal_simplex
+
+EPSILON = 1e-6 # Same degeneracy marker as the CNO/Hammer solvers
+
+# Below this many cells the cost of spawning worker processes outweighs the gain
+PARALLEL_MIN_CELLS = 10_000
+DEFAULT_MAX_WORKERS = os.cpu_count() or 1
+
+Component = Tuple[List[int], List[int]] # (rows, cols) of one independent block
+
+
+def find_components(couts: List[List[Optional[float]]]) -> List[Component]:
+    """
+    Splits the supplier/customer route graph into connected components.
+    A route (i, j) exists when couts[i][j] is not None; None marks a forbidden route.
+    Rows are nodes 0..n-1 and columns are nodes n..n+m-1 of a union-find.
+    """
+    n = len(couts)
+    m = len(couts[0]) if n else 0
+    parent = list(range(n + m))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i in range(n):
+        row = couts[i]
+        for j in range(m):
+            if row[j] is not None:
+                ri, rj = find(i), find(n + j)
+                if ri != rj:
+                    parent[rj] = ri
+
+    groups: Dict[int, Component] = {}
+    for node in range(n + m):
+        rows, cols = groups.setdefault(find(node), ([], []))
+        if node < n:
+            rows.append(node)
+        else:
+            cols.append(node - n)
+
+    # Order by first row/col so the result is stable for a given matrix
+    return sorted(groups.values(), key=lambda rc: (rc[0][0] if rc[0] else n, rc[1][0] if rc[1] else m))
+
+
+def has_forbidden_routes(couts: List[List[Optional[float]]]) -> bool:
+    return any(c is None for row in couts for c in row)
+
+
+def forbidden_penalty(sub_couts: List[List[Optional[float]]], total_supply: float) -> float:
+    # Big-M: any plan shipping a single unit on a forbidden route costs more than
+    # the most expensive plan that only uses allowed routes.
+    max_cost = max((abs(c) for row in sub_couts for c in row if c is not None), default=0)
+    return (max_cost + 1) * (total_supply + 1)
+
+
+def _extract_component(
+    component: Component,
+    offres: List[float],
+    demandes: List[float],
+    couts: List[List[Optional[float]]]
+) -> Tuple[List[float], List[float], List[List[Optional[float]]], List[List[float]], float]:
+    rows, cols = component
+    sub_offres = [offres[i] for i in rows]
+    sub_demandes = [demandes[j] for j in cols]
+    sub_couts = [[couts[i][j] for j in cols] for i in rows]
+    penalty = forbidden_penalty(sub_couts, sum(sub_offres))
+    penalized = [[penalty if c is None else c for c in row] for row in sub_couts]
+    return sub_offres, sub_demandes, sub_couts, penalized, penalty
+
+
+def _check_balance(component: Component, sub_offres: List[float], sub_demandes: List[float]) -> None:
+    if sum(sub_offres) != sum(sub_demandes):
+        rows, cols = component
+        raise ValueError(
+            f"Le bloc indépendant (offres {rows}, demandes {cols}) n'est pas équilibré : "
+            f"{sum(sub_offres)} offerts pour {sum(sub_demandes)} demandés."
+        )
+
+
+def _plan_cost(allocation: List[List[Optional[float]]], sub_couts: List[List[Optional[float]]], penalty: float) -> float:
+    # Degeneracy markers (EPSILON) are not real flows and must not pick up the big-M penalty
+    total = 0
+    for r, row in enumerate(allocation):
+        for c, val in enumerate(row):
+            if val is not None and val > EPSILON:
+                cost = sub_couts[r][c]
+                total += val * (penalty if cost is None else cost)
+    return total
+
+
+def _allowed_plan(component: Component, result: Dict, sub_couts: List[List[Optional[float]]]) -> Dict:
+    """
+    The block's plan with no flow on a forbidden route. CNO ignores costs and the
+    other solvers only see the big-M, so a plan can still ship on one: the flow is
+    moved off by a phase-one simplex that prices the forbidden routes alone, leaving
+    the rest of the plan as the solver chose it. Raises ValueError when the block
+    has no plan on its allowed routes.
+    """
+    allocation = result["allocation"]
+    cells = [(r, c) for r, row in enumerate(allocation) for c, val in enumerate(row) if val is not None and val > EPSILON_BASIS]
+    if not any(sub_couts[r][c] is None and allocation[r][c] > EPSILON for r, c in cells):
+        return result
+    phase_one = np.array([[1.0 if c is None else 0.0 for c in row] for row in sub_couts])
+    n, m = phase_one.shape
+    tree, flows = plan_basis(phase_one, cells, [allocation[r][c] for r, c in cells])
+    tree, flows, _, _ = primal_simplex(phase_one, tree, flows, max_iterations=2 * n * m)
+    if any(phase_one[cell] and flow > EPSILON for cell, flow in zip(tree, flows)):
+        rows, cols = component
+        raise ValueError(
+            f"Le bloc indépendant (offres {rows}, demandes {cols}) n'a aucun plan réalisable : "
+            "les routes autorisées ne permettent pas de satisfaire toutes les demandes."
+        )
+    # Rebuilt from the flows alone, so the zero-flow cells joining the tree are allowed ones where possible
+    shipping = [(cell, flow) for cell, flow in zip(tree, flows) if flow > EPSILON]
+    tree, flows = plan_basis(phase_one, [cell for cell, _ in shipping], [flow for _, flow in shipping])
+    allowed = {**result, **allocation_from_basis(n, m, tree, flows, phase_one)}
+    return allowed # cout_total is recomputed on the real costs by _stitch
+
+
+def _basis_markers(allocation: List[List[Optional[float]]]) -> List[List[Optional[float]]]:
+    """
+    Zero cells the Stepping Stone leaves behind: an EPSILON marker where the cell
+    still joins the basis tree, None where it is off the basis (closes a cycle).
+    """
+    n, m = len(allocation), len(allocation[0]) if allocation else 0
+    parent = list(range(n + m))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def join(i: int, j: int) -> bool:
+        ri, rj = find(i), find(n + j)
+        if ri == rj:
+            return False
+        parent[rj] = ri
+        return True
+
+    marked = [row[:] for row in allocation]
+    for i, row in enumerate(allocation):
+        for j, val in enumerate(row):
+            if val is not None and val > EPSILON:
+                join(i, j)
+    for i, row in enumerate(allocation):
+        for j, val in enumerate(row):
+            if val is not None and val <= EPSILON:
+                marked[i][j] = EPSILON if join(i, j) else None
+    return marked
+
+
+def _run_jobs(func: Callable, jobs: List[tuple], n_cells: int, max_workers: Optional[int]) -> List[Dict]:
+    workers = min(max_workers or DEFAULT_MAX_WORKERS, len(jobs))
+    if workers <= 1 or n_cells < PARALLEL_MIN_CELLS:
+        return [func(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, *zip(*jobs)))
+
+
+def _stitch(
+    n: int, m: int,
+    components: List[Component],
+    results: List[Dict],
+    sub_couts_list: List[List[List[Optional[float]]]],
+    penalties: List[float]
+) -> Dict:
+    allocation = [[None for _ in range(m)] for _ in range(n)]
+    total_cost = 0
+    for (rows, cols), result, sub_couts, penalty in zip(components, results, sub_couts_list, penalties):
+        sub_alloc = result["allocation"]
+        for r, i in enumerate(rows):
+            target_row = allocation[i]
+            for c, j in enumerate(cols):
+                target_row[j] = sub_alloc[r][c]
+        if any(c is None for row in sub_couts for c in row):
+            total_cost += _plan_cost(sub_alloc, sub_couts, penalty)
+        else:
+            total_cost += result["cout_total"]
+    stitched = {
+        "allocation": allocation,
+        "cout_total": total_cost
+    }
+    if results and all("borne_duale" in result for result in results):
+        # Independent blocks: their dual bounds add up
+        bound = sum(result["borne_duale"] for result in results)
+        stitched["borne_duale"] = round(bound, 2)
+        stitched["ecart"] = round(max(total_cost - bound, 0.0), 2)
+    return stitched
+
+
+def _solvable(components: List[Component], offres: List[float], demandes: List[float]) -> List[Component]:
+    """Checks every block's balance and drops the blocks with no route at all (zero supply/demand)."""
+    solvable = []
+    for component in components:
+        rows, cols = component
+        sub_offres = [offres[i] for i in rows]
+        sub_demandes = [demandes[j] for j in cols]
+        _check_balance(component, sub_offres, sub_demandes)
+        if rows and cols:
+            solvable.append(component)
+    return solvable
+
+
+def solve_decomposed(
+    solver: Callable[[List[float], List[float], List[List[float]]], Dict],
+    offres: List[float],
+    demandes: List[float],
+    couts: List[List[Optional[float]]],
+    max_workers: Optional[int] = None
+) -> Dict:
+    """
+    Runs an initial-solution solver (CNO/Hammer) block by block.
+    Independent blocks are solved concurrently in a process pool and stitched
+    back into a single n x m allocation; no plan ships on a forbidden route. Raises
+    ValueError if a block is unbalanced or has no plan on its allowed routes.
+    """
+    n, m = len(offres), len(demandes)
+    if not has_forbidden_routes(couts):
+        return solver(offres, demandes, couts)
+
+    components = _solvable(find_components(couts), offres, demandes)
+    jobs, sub_couts_list, penalties = [], [], []
+    for component in components:
+        sub_offres, sub_demandes, sub_couts, penalized, penalty = _extract_component(component, offres, demandes, couts)
+        jobs.append((sub_offres, sub_demandes, penalized))
+        sub_couts_list.append(sub_couts)
+        penalties.append(penalty)
+
+    results = _run_jobs(solver, jobs, n * m, max_workers)
+    results = [_allowed_plan(*block) for block in zip(components, results, sub_couts_list)]
+    return _stitch(n, m, components, results, sub_couts_list, penalties)
+
+
+def optimize_decomposed(
+    solver: Callable[[Dict, List[List[float]]], Dict],
+    initial_solution: Dict,
+    offres: List[float],
+    demandes: List[float],
+    couts: List[List[Optional[float]]],
+    max_workers: Optional[int] = None
+) -> Dict:
+    """
+    Same as solve_decomposed for an optimizer (Stepping Stone) that improves an
+    existing solution: the initial allocation is cut along the blocks and each
+    block is optimized on its own.
+    """
+    n, m = len(offres), len(demandes)
+    if not has_forbidden_routes(couts):
+        result = solver(initial_solution, couts)
+        return {**result, "allocation": _basis_markers(result["allocation"])}
+
+    components = _solvable(find_components(couts), offres, demandes)
+    allocation = initial_solution["allocation"]
+    jobs, sub_couts_list, penalties = [], [], []
+    for component in components:
+        rows, cols = component
+        _, _, sub_couts, penalized, penalty = _extract_component(component, offres, demandes, couts)
+        sub_alloc = [[allocation[i][j] for j in cols] for i in rows]
+        sub_initial = {"allocation": sub_alloc, "cout_total": _plan_cost(sub_alloc, sub_couts, penalty)}
+        jobs.append((sub_initial, penalized))
+        sub_couts_list.append(sub_couts)
+        penalties.append(penalty)
+
+    results = _run_jobs(solver, jobs, n * m, max_workers)
+    results = [_allowed_plan(*block) for block in zip(components, results, sub_couts_list)]
+    stitched = _stitch(n, m, components, results, sub_couts_list, penalties)
+    stitched["allocation"] = _basis_markers(stitched["allocation"])
+    return stitched
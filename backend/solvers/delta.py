@@ -0,0 +1,195 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from solvers.basis import (
+    EPSILON_BASIS, allocation_from_basis, basic_cells, compute_potentials, cost_array, dual_simplex,
+    primal_simplex, spanning_basis, tree_flows, tree_order
+)
+from solvers.decomposition import forbidden_penalty
+from solvers.sensitivity import OPTIMALITY_TOLERANCE
+
+# Small edits to a solved task: which cells change, whether the current plan
+# survives them, and a warm re-optimization from its basis when it does not.
+
+CostChange = Tuple[int, int, Optional[float]] # (i, j, new cost), None forbids the route
+
+
+def apply_cost_changes(couts: List[List[Optional[float]]], changes: Sequence[CostChange]) -> List[List[Optional[float]]]:
+    """New matrix sharing every untouched row with couts, which is left as is."""
+    edited = list(couts)
+    copied = set()
+    for i, j, cout in changes:
+        if i not in copied:
+            edited[i] = list(edited[i])
+            copied.add(i)
+        edited[i][j] = cout
+    return edited
+
+
+def _flow(allocation: List[List[Optional[float]]], i: int, j: int) -> float:
+    value = allocation[i][j]
+    return value if value is not None and value > EPSILON_BASIS * 10 else 0.0
+
+
+def plan_cost_after(
+    allocation: List[List[Optional[float]]],
+    cout_total: float,
+    couts: List[List[Optional[float]]],
+    changes: Sequence[CostChange]
+) -> Optional[float]:
+    """
+    Cost of the same plan under the edited costs, from the changed cells only;
+    None when the plan ships on a route the edit forbids.
+    """
+    total = cout_total
+    for i, j, cout in changes:
+        flow = _flow(allocation, i, j)
+        if not flow:
+            continue
+        if cout is None:
+            return None
+        total += flow * (cout - couts[i][j])
+    return round(total, 2)
+
+
+def still_optimal(
+    allocation: List[List[Optional[float]]],
+    couts: List[List[Optional[float]]],
+    changes: Sequence[CostChange],
+    potentiels: Optional[Dict] = None
+) -> bool:
+    """
+    Whether an optimal plan stays optimal after cost edits. Editing a basic cell
+    moves the potentials, so only edits to non-basic cells are decided here: the
+    plan survives when each new reduced cost c'_ij - u_i - v_j is non-negative.
+    """
+    if any(allocation[i][j] is not None and cout != couts[i][j] for i, j, cout in changes):
+        return False
+    if potentiels:
+        u, v = potentiels["offres"], potentiels["demandes"]
+    else:
+        u, v = compute_potentials(cost_array(couts), basic_cells(allocation))
+    return all(
+        cout is None or (u[i] is not None and v[j] is not None and cout - u[i] - v[j] >= -OPTIMALITY_TOLERANCE)
+        for i, j, cout in changes
+    )
+
+
+def reoptimize(
+    allocation: List[List[Optional[float]]],
+    couts: List[List[Optional[float]]],
+    offres: Sequence[float],
+    demandes: Sequence[float],
+    max_iterations: Optional[int] = None
+) -> Dict:
+    """
+    Re-optimizes from the basis of a previous plan after costs and/or supplies
+    changed: the basis tree gives the new flows, a dual simplex restores their
+    feasibility when supplies moved, then Stepping Stone (primal simplex) restores
+    optimality. Raises ValueError when the old basis cannot be reused (forbidden
+    routes in the way, no convergence); the caller then solves from scratch.
+    """
+    n, m = len(couts), len(couts[0]) if couts else 0
+    if max_iterations is None:
+        max_iterations = (n * m) * 2
+    penalty = forbidden_penalty(couts, sum(offres))
+    cost = cost_array([[penalty if c is None else c for c in row] for row in couts])
+    forbidden = np.isnan(cost_array(couts))
+
+    flows_first = sorted(basic_cells(allocation), key=lambda cell: -allocation[cell[0]][cell[1]])
+    cells = spanning_basis(cost, flows_first)
+    flows = tree_flows(n, m, cells, tree_order(n, m, cells), offres, demandes)
+    if len(flows) and flows.min() < -EPSILON_BASIS:
+        cells, flows, _ = dual_simplex(cost, cells, offres, demandes, max_iterations)
+    cells, flows, _, optimal = primal_simplex(cost, cells, flows, max_iterations)
+    if any(forbidden[i, j] and q > EPSILON_BASIS for (i, j), q in zip(cells, flows)):
+        raise ValueError("Le plan réoptimisé emprunte une route interdite.")
+    result = allocation_from_basis(n, m, cells, flows, cost)
+    result["optimal"] = optimal
+    return result
+
+
+def allocation_changes(
+    before: Optional[List[List[Optional[float]]]],
+    after: List[List[Optional[float]]]
+) -> List[List]:
+    """Cells whose value differs between two allocations, as [i, j, new value]."""
+    if before is None or len(before) != len(after) or (after and len(before[0]) != len(after[0])):
+        return [[i, j, v] for i, row in enumerate(after) for j, v in enumerate(row) if v is not None]
+    return [
+        [i, j, new]
+        for i, (old_row, new_row) in enumerate(zip(before, after))
+        if old_row != new_row
+        for j, (old, new) in enumerate(zip(old_row, new_row))
+        if old != new
+    ]
+
+
+def result_changes(before: Optional[Dict], after: Dict) -> List[List]:
+    """Changed cells between two results, dense (allocation) or sparse (cellules/flux)."""
+    if "allocation" in after:
+        return allocation_changes((before or {}).get("allocation"), after["allocation"])
+    old = {} if before is None else {tuple(c): q for c, q in zip(before.get("cellules", []), before.get("flux", []))}
+    new = {tuple(c): q for c, q in zip(after["cellules"], after["flux"])}
+    changed = [[i, j, q] for (i, j), q in new.items() if old.get((i, j)) != q]
+    changed += [[i, j, None] for (i, j) in old if (i, j) not in new]
+    return sorted(changed)
+
+
+# Result history (history.py): a plan is the {(i, j): value} map of the cells a
+# result stores (basic cells of a dense allocation, cellules/flux of a sparse one),
+# and a version is kept as the changes [i, j, before, after] from its predecessor,
+# None standing for a cell the plan does not hold.
+
+Plan = Dict[Tuple[int, int], float]
+
+
+def result_plan(result: Dict) -> Plan:
+    if result.get("cellules") is not None:
+        return {(int(i), int(j)): q for (i, j), q in zip(result["cellules"], result["flux"])}
+    return {
+        (i, j): value
+        for i, row in enumerate(result["allocation"])
+        for j, value in enumerate(row)
+        if value is not None
+    }
+
+
+def plan_changes(before: Plan, after: Plan) -> List[List]:
+    changed = [[i, j, before.get((i, j)), q] for (i, j), q in after.items() if before.get((i, j)) != q]
+    changed += [[i, j, q, None] for (i, j), q in before.items() if (i, j) not in after]
+    return sorted(changed)
+
+
+def apply_plan_changes(plan: Plan, changes: Sequence[Sequence]) -> Plan:
+    """Applies [i, j, before, after] changes in place and returns the plan."""
+    for i, j, _, after in changes:
+        if after is None:
+            plan.pop((i, j), None)
+        else:
+            plan[(i, j)] = after
+    return plan
+
+
+def compose_changes(steps: Sequence[Sequence[Sequence]]) -> List[List]:
+    """Net changes of consecutive change lists: first value before, last value after."""
+    net: Dict[Tuple[int, int], List] = {}
+    for changes in steps:
+        for i, j, before, after in changes:
+            if (i, j) in net:
+                net[(i, j)][1] = after
+            else:
+                net[(i, j)] = [before, after]
+    return sorted([i, j, before, after] for (i, j), (before, after) in net.items() if before != after)
+
+
+def plan_result(plan: Plan, n: int, m: int, dense: bool) -> Dict:
+    """The plan in the form its result was stored in: a dense allocation (None off the basis) or cellules/flux."""
+    if dense:
+        allocation: List[List[Optional[float]]] = [[None] * m for _ in range(n)]
+        for (i, j), q in plan.items():
+            allocation[i][j] = q
+        return {"allocation": allocation}
+    cells = sorted(plan)
+    return {"cellules": [[i, j] for i, j in cells], "flux": [plan[cell] for cell in cells]}
@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 EPSILON = 1e-6 # Define a small epsilon value
 
 def solve_hammer(offres, demandes, couts):
@@ -10,7 +8,7 @@ def solve_hammer(offres, demandes, couts):
     current_offres = offres[:]
     current_demandes = demandes[:]
 
-    costs = deepcopy(couts)
+    costs = couts # Read-only: never modified, so no copy is needed
 
     n, m = len(offres_orig), len(demandes_orig)
     allocation = [[None for _ in range(m)] for _ in range(n)]
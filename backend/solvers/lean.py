@@ -0,0 +1,249 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from solvers.basis import allocation_from_basis, basic_cells, plan_basis, primal_simplex
+from solvers.decomposition import forbidden_penalty
+from solvers.sinkhorn import solve_sinkhorn_lean
+
+# Memory-lean solver mode.
+# Costs live in one read-only NumPy buffer shared by every stage (never copied once
+# it is an array), and a solution is a sparse basic-cell store instead of a dense
+# n x m allocation:
+#     {"cellules": [(i, j), ...], "flux": np.ndarray, "cout_total": float}
+# holding exactly the n + m - 1 cells of a spanning basis tree.
+
+
+def cost_buffer(couts, total_supply: Optional[float] = None) -> np.ndarray:
+    """
+    Read-only cost buffer. An ndarray is wrapped as a view (no copy); a list of
+    lists is converted once. Forbidden routes (None, or NaN in a float array)
+    get the big-M penalty.
+    """
+    if isinstance(couts, np.ndarray):
+        forbidden = np.isnan(couts) if couts.dtype.kind == "f" else None
+        if forbidden is not None and forbidden.any():
+            # Same big-M as forbidden_penalty, computed without leaving NumPy
+            penalty = (float(np.abs(couts[~forbidden]).max(initial=0)) + 1) * ((total_supply or 0) + 1)
+            buffer = np.where(forbidden, penalty, couts)
+        else:
+            buffer = couts.view()
+    else:
+        buffer = np.asarray(couts)
+        if buffer.dtype == object:
+            penalty = forbidden_penalty(couts, total_supply or 0)
+            buffer = np.array([[penalty if c is None else c for c in row] for row in couts])
+    buffer.flags.writeable = False
+    return buffer
+
+
+def _plan_cost(cost: np.ndarray, cells: Sequence[Tuple[int, int]], flows: np.ndarray) -> float:
+    if not cells:
+        return 0
+    rows, cols = zip(*cells)
+    return round(float((flows * cost[list(rows), list(cols)]).sum()), 2)
+
+
+def _store(cost: np.ndarray, cells: List[Tuple[int, int]], flows: np.ndarray) -> Dict:
+    return {"cellules": cells, "flux": flows, "cout_total": _plan_cost(cost, cells, flows)}
+
+
+def _complete_basis(cost: np.ndarray, cells: List[Tuple[int, int]], flows: List[float]) -> Dict:
+    # Degenerate plans have fewer than n + m - 1 flows: join the pieces with the
+    # cheapest zero-flow cells (the lean counterpart of the EPSILON cells). A plan
+    # with a cycle is split first, never by dropping a cell that ships.
+    tree, tree_flows = plan_basis(cost, cells, flows)
+    return _store(cost, tree, tree_flows)
+
+
+def solve_coin_nord_ouest_lean(offres, demandes, cost: np.ndarray) -> Dict:
+    n, m = cost.shape
+    supply = [float(x) for x in offres]
+    demand = [float(x) for x in demandes]
+    cells: List[Tuple[int, int]] = []
+    flows: List[float] = []
+
+    # Every step moves one index, so the walk visits exactly n + m - 1 cells and
+    # a zero quantity simply becomes a degenerate basic cell.
+    i, j = 0, 0
+    while i < n and j < m:
+        qte = min(supply[i], demand[j])
+        cells.append((i, j))
+        flows.append(qte)
+        supply[i] -= qte
+        demand[j] -= qte
+        if supply[i] == 0 and i < n - 1:
+            i += 1
+        else:
+            j += 1
+    return _store(cost, cells, np.array(flows, dtype=np.float64))
+
+
+def _next_active(order: np.ndarray, start: int, active: np.ndarray) -> int:
+    k = start
+    while k < len(order) and not active[order[k]]:
+        k += 1
+    return k
+
+
+def _penalty(cost_line: np.ndarray, order: np.ndarray, first: int, second: int) -> float:
+    if first >= len(order):
+        return -np.inf
+    if second >= len(order):
+        return float(cost_line[order[first]])
+    return float(cost_line[order[second]] - cost_line[order[first]])
+
+
+def solve_hammer_lean(offres, demandes, cost: np.ndarray) -> Dict:
+    """
+    Hammer (Vogel) with the same tie-breaking as solve_hammer, but incremental:
+    each row and column keeps its cost order once (int32) and two pointers to its
+    cheapest active cells, so removing a line only refreshes the lines pointing at it.
+    """
+    n, m = cost.shape
+    supply = [float(x) for x in offres]
+    demand = [float(x) for x in demandes]
+
+    row_order = np.empty((n, m), dtype=np.int32)
+    for i in range(n):
+        row_order[i] = np.argsort(cost[i], kind="stable")
+    col_order = np.empty((m, n), dtype=np.int32)
+    for j in range(m):
+        col_order[j] = np.argsort(cost[:, j], kind="stable")
+
+    row_active = np.ones(n, dtype=bool)
+    col_active = np.ones(m, dtype=bool)
+    row_first, row_second = np.zeros(n, dtype=np.int64), np.ones(n, dtype=np.int64)
+    col_first, col_second = np.zeros(m, dtype=np.int64), np.ones(m, dtype=np.int64)
+    row_pen = np.array([_penalty(cost[i], row_order[i], 0, 1) for i in range(n)])
+    col_pen = np.array([_penalty(cost[:, j], col_order[j], 0, 1) for j in range(m)])
+
+    def refresh(orders, firsts, seconds, penalties, line_costs, removed, active):
+        # Lines whose cheapest or second cheapest cell sat on the removed line
+        idx = np.flatnonzero(penalties > -np.inf)
+        size = orders.shape[1]
+        first_hit = orders[idx, np.minimum(firsts[idx], size - 1)] == removed
+        second_hit = orders[idx, np.minimum(seconds[idx], size - 1)] == removed
+        for line in idx[first_hit | second_hit]:
+            order = orders[line]
+            f = _next_active(order, int(firsts[line]), active)
+            s = _next_active(order, max(int(seconds[line]), f + 1), active)
+            firsts[line], seconds[line] = f, s
+            penalties[line] = _penalty(line_costs(line), order, f, s)
+
+    cells: List[Tuple[int, int]] = []
+    flows: List[float] = []
+    n_rows_left, n_cols_left = n, m
+    while n_rows_left and n_cols_left:
+        ri, ci = int(np.argmax(row_pen)), int(np.argmax(col_pen))
+        if row_pen[ri] >= col_pen[ci]: # rows come first on ties, as in solve_hammer
+            i, j = ri, int(row_order[ri, row_first[ri]])
+        else:
+            i, j = int(col_order[ci, col_first[ci]]), ci
+
+        qte = min(supply[i], demand[j])
+        if qte > 0:
+            cells.append((i, j))
+            flows.append(qte)
+        supply[i] -= qte
+        demand[j] -= qte
+
+        if supply[i] == 0:
+            row_active[i] = False
+            row_pen[i] = -np.inf
+            n_rows_left -= 1
+            refresh(col_order, col_first, col_second, col_pen, lambda c: cost[:, c], i, row_active)
+        if demand[j] == 0:
+            col_active[j] = False
+            col_pen[j] = -np.inf
+            n_cols_left -= 1
+            refresh(row_order, row_first, row_second, row_pen, lambda r: cost[r], j, col_active)
+
+    return _complete_basis(cost, cells, flows)
+
+
+def solve_stepping_stone_lean(
+    solution: Dict,
+    cost: np.ndarray,
+    max_iterations: Optional[int] = None,
+    on_checkpoint: Optional[Callable[[Dict], None]] = None,
+    checkpoint_interval: Optional[float] = None
+) -> Dict:
+    """
+    Stepping Stone with MODI pricing on the sparse basis; the input store is left untouched.
+    on_checkpoint receives sparse stores of the current basis (see primal_simplex).
+    A store resumed from a checkpoint keeps its "iteration": the count goes on from
+    there and max_iterations bounds the whole run, not each attempt.
+    """
+    n, m = cost.shape
+    if max_iterations is None:
+        max_iterations = (n * m) * 2
+    done = int(solution.get("iteration", 0)) # > 0 when resuming from a checkpoint
+    snapshot = None
+    if on_checkpoint is not None:
+        def snapshot(cells, flows, pivots):
+            store = _store(cost, cells, flows)
+            store["iteration"] = done + pivots
+            on_checkpoint(store)
+    cells, flows, _, optimal = primal_simplex(
+        cost, solution["cellules"], solution["flux"], max(max_iterations - done, 0),
+        on_checkpoint=snapshot, checkpoint_interval=checkpoint_interval
+    )
+    store = _store(cost, cells, flows)
+    store["optimal"] = optimal
+    return store
+
+
+def store_from_result(result: Dict, cost: np.ndarray) -> Dict:
+    """Sparse store from a dense repo result (allocation matrix with EPSILON cells); a checkpoint keeps its iteration."""
+    allocation = result["allocation"]
+    cells = basic_cells(allocation)
+    return _resumed(_complete_basis(cost, cells, [allocation[i][j] for i, j in cells]), result)
+
+
+def _resumed(store: Dict, result: Dict) -> Dict:
+    if result.get("iteration"):
+        store["iteration"] = result["iteration"]
+    return store
+
+
+def result_from_store(store: Dict, cost: np.ndarray) -> Dict:
+    """Dense {"allocation", "cout_total"} result, only built at the API boundary."""
+    n, m = cost.shape
+    result = allocation_from_basis(n, m, store["cellules"], store["flux"], cost)
+    result.update((key, store[key]) for key in APPROXIMATION_KEYS if key in store)
+    return result
+
+
+LEAN_INITIAL_SOLVERS = {
+    "cno": solve_coin_nord_ouest_lean,
+    "hammer": solve_hammer_lean,
+    "sinkhorn": solve_sinkhorn_lean,
+}
+
+def solve_initial_lean(algo: str, offres, demandes, couts) -> Dict:
+    """Dense result of a lean initial solver; a module-level function so solve_decomposed can run it in worker processes."""
+    cost = cost_buffer(couts, sum(offres))
+    return result_from_store(LEAN_INITIAL_SOLVERS[algo](offres, demandes, cost), cost)
+
+
+# Reported by approximate solvers (solvers/sinkhorn.py), kept in the stored result
+APPROXIMATION_KEYS = ("borne_duale", "ecart")
+
+
+def sparse_result(store: Dict) -> Dict:
+    """
+    JSON result of a task whose costs are a registered matrix file: the basis cells
+    and their flows (zero flows included) instead of a dense n x m allocation.
+    """
+    result = {
+        "cellules": [[int(i), int(j)] for i, j in store["cellules"]],
+        "flux": [float(x) for x in store["flux"]],
+        "cout_total": store["cout_total"],
+    }
+    result.update((key, store[key]) for key in APPROXIMATION_KEYS if key in store)
+    return result
+
+
+def store_from_sparse(result: Dict, cost: np.ndarray) -> Dict:
+    return _resumed(_complete_basis(cost, [(i, j) for i, j in result["cellules"]], result["flux"]), result)
@@ -0,0 +1,62 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from solvers.certificate import FLOW_TOLERANCE, certificate_potentials, check_certificate, plan_cells
+
+# Re-pricing stored plans under new costs (a tariff change): the plans stay as
+# they are, only their cost moves. The plans of a whole batch of tasks are priced
+# with one gather on the cost matrix and one bincount; no solver runs. Whether a
+# plan is still optimal is its basis's certificate under the new costs (one
+# vectorized pass over the matrix, see certificate.py).
+
+CostOverlay = Optional[Sequence[Sequence]] # a task's own cell edits [[i, j, cout]] on top of the matrix
+
+
+def plan_costs(results: Sequence[Dict], cost: np.ndarray, overlays: Optional[Sequence[CostOverlay]] = None) -> List[Optional[float]]:
+    """
+    Cost of each result's plan under cost (NaN: forbidden route), each task's
+    overlay taking precedence over the matrix; None for a plan that ships on a
+    forbidden route.
+    """
+    n, m = cost.shape
+    plans = [plan_cells(result, n, m) for result in results]
+    sizes = [len(rows) for rows, _, _ in plans]
+    if not plans or not sum(sizes):
+        return [0.0] * len(plans)
+    segment = np.repeat(np.arange(len(plans)), sizes)
+    rows = np.concatenate([p[0] for p in plans]).astype(np.intp)
+    cols = np.concatenate([p[1] for p in plans]).astype(np.intp)
+    flows = np.concatenate([p[2] for p in plans])
+    values = np.asarray(cost[rows, cols], dtype=np.float64)
+
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    for k, overlay in enumerate(overlays or []):
+        if not overlay:
+            continue
+        start, stop = offsets[k], offsets[k + 1]
+        edited = np.asarray([i * m + j for i, j, _ in overlay], dtype=np.int64)
+        edited_costs = np.asarray([np.nan if cout is None else cout for _, _, cout in overlay], dtype=np.float64)
+        order = np.argsort(edited)
+        edited, edited_costs = edited[order], edited_costs[order]
+        keys = rows[start:stop].astype(np.int64) * m + cols[start:stop]
+        found = np.minimum(np.searchsorted(edited, keys), len(edited) - 1)
+        hit = edited[found] == keys
+        values[start:stop][hit] = edited_costs[found[hit]]
+
+    shipped = flows > FLOW_TOLERANCE
+    forbidden = shipped & np.isnan(values)
+    totals = np.bincount(segment, weights=np.where(shipped, np.nan_to_num(values) * flows, 0.0), minlength=len(plans))
+    blocked = np.bincount(segment, weights=forbidden, minlength=len(plans)) > 0
+    return [None if blocked[k] else round(float(totals[k]), 2) for k in range(len(plans))]
+
+
+def recertify(offres, demandes, couts, result: Dict) -> Dict:
+    """
+    The result re-priced under new costs, with the potentials of its basis and
+    their certificate for those costs in place of the stale ones.
+    """
+    repriced = {key: value for key, value in result.items() if key not in ("potentiels", "certificat")}
+    repriced["potentiels"] = certificate_potentials(repriced, couts, sum(offres))
+    repriced["certificat"] = check_certificate(offres, demandes, couts, repriced)
+    return repriced
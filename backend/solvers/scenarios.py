@@ -0,0 +1,115 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from solvers.basis import (
+    EPSILON_BASIS, allocation_from_basis, basic_cells, cost_array, dual_simplex, primal_simplex,
+    spanning_basis, tree_flows, tree_order
+)
+from solvers.decomposition import forbidden_penalty
+
+Scenario = Tuple[Sequence[float], Sequence[float]] # (offres, demandes)
+
+
+def _validate(scenarios: Sequence[Scenario], n: int, m: int) -> None:
+    for k, (offres, demandes) in enumerate(scenarios):
+        if len(offres) != n or len(demandes) != m:
+            raise ValueError(f"Scénario {k} : {len(offres)}x{len(demandes)} au lieu de {n}x{m}.")
+        if sum(offres) != sum(demandes):
+            raise ValueError(f"Scénario {k} : la somme des offres doit être égale à la somme des demandes.")
+
+
+def chain_order(vectors: np.ndarray) -> List[Tuple[int, Optional[int]]]:
+    """
+    Order in which to solve the scenarios, as (scenario, warm start source) pairs.
+    Starts from the scenario closest to the centroid, then repeatedly takes the
+    unsolved scenario nearest (L1) to any solved one, like Prim's algorithm.
+    """
+    k = len(vectors)
+    if k == 0:
+        return []
+    start = int(np.abs(vectors - vectors.mean(axis=0)).sum(axis=1).argmin())
+    best_dist = np.abs(vectors - vectors[start]).sum(axis=1)
+    best_source = np.full(k, start)
+    solved = np.zeros(k, dtype=bool)
+    solved[start] = True
+    order: List[Tuple[int, Optional[int]]] = [(start, None)]
+    for _ in range(k - 1):
+        nxt = int(np.where(solved, np.inf, best_dist).argmin())
+        order.append((nxt, int(best_source[nxt])))
+        solved[nxt] = True
+        dist = np.abs(vectors - vectors[nxt]).sum(axis=1)
+        closer = dist < best_dist
+        best_dist[closer] = dist[closer]
+        best_source[closer] = nxt
+    return order
+
+
+def _cold_start(initial_solver: Callable, offres, demandes, penalized: List[List[float]], cost: np.ndarray):
+    n, m = cost.shape
+    initial = initial_solver(list(offres), list(demandes), penalized)
+    allocation = initial["allocation"]
+    # Real flows first so they are kept in the tree, degeneracy markers only to fill it up
+    flows_first = sorted(basic_cells(allocation), key=lambda cell: -allocation[cell[0]][cell[1]])
+    cells = spanning_basis(cost, flows_first)
+    flows = tree_flows(n, m, cells, tree_order(n, m, cells), offres, demandes)
+    return cells, flows
+
+
+def solve_scenarios(
+    couts,
+    scenarios: Sequence[Scenario],
+    initial_solver: Callable[[List[float], List[float], List[List[float]]], Dict],
+    max_iterations: Optional[int] = None
+) -> List[Dict]:
+    """
+    Solves many (offres, demandes) scenarios over one fixed cost matrix.
+    The first scenario goes through the usual initial solver; every other one
+    starts from the optimal basis of its nearest solved neighbour, which is still
+    dual feasible (same costs), so a few dual simplex pivots usually restore
+    feasibility before a short Stepping Stone polish.
+    """
+    n = len(couts)
+    m = len(couts[0]) if n else 0
+    _validate(scenarios, n, m)
+    if not scenarios:
+        return []
+
+    max_supply = max(sum(offres) for offres, _ in scenarios)
+    penalty = forbidden_penalty(couts, max_supply)
+    penalized = [[penalty if c is None else c for c in row] for row in couts]
+    cost = cost_array(penalized)
+    forbidden = np.isnan(cost_array(couts))
+    if max_iterations is None:
+        max_iterations = (n * m) * 2
+
+    vectors = np.array([list(o) + list(d) for o, d in scenarios], dtype=np.float64)
+    bases: Dict[int, List[Tuple[int, int]]] = {}
+    results: List[Optional[Dict]] = [None] * len(scenarios)
+    for index, source in chain_order(vectors):
+        offres, demandes = scenarios[index]
+        cells = flows = None
+        iterations = 0
+        if source is not None:
+            try:
+                cells, flows, iterations = dual_simplex(cost, bases[source], offres, demandes, max_iterations)
+            except ValueError:
+                cells = None
+        if cells is None:
+            source = None
+            cells, flows = _cold_start(initial_solver, offres, demandes, penalized, cost)
+
+        cells, flows, pivots, optimal = primal_simplex(cost, cells, flows, max_iterations)
+        bases[index] = cells
+        result = allocation_from_basis(n, m, cells, flows, cost)
+        results[index] = {
+            "index": index,
+            "cout_total": result["cout_total"],
+            # Compact form: only the cells carrying flow, as [i, j, quantity]
+            "cellules": [[i, j, float(q)] for (i, j), q in zip(cells, flows) if q > EPSILON_BASIS],
+            "realisable": not any(forbidden[i, j] and q > EPSILON_BASIS for (i, j), q in zip(cells, flows)),
+            "optimal": optimal,
+            "depart": source,
+            "iterations": iterations + pivots,
+        }
+    return results
@@ -0,0 +1,220 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from solvers.basis import (
+    SCAN_CHUNK_CELLS, basic_cells, compute_potentials, cost_array, euler_times, flow_array, reduced_costs, tree_order
+)
+
+OPTIMALITY_TOLERANCE = 1e-7
+
+Perturbation = Tuple[int, int, float] # (i, j, delta on couts[i][j])
+
+
+def _json_list(values: np.ndarray) -> list:
+    """tolist() with +/-inf and NaN turned into None (JSON has no infinity)."""
+    if values.ndim == 1:
+        return [x if math.isfinite(x) else None for x in values.tolist()]
+    return [[x if math.isfinite(x) else None for x in row] for row in values.tolist()]
+
+
+def _stored_potentials(potentiels: Optional[Dict], n: int, m: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    if not potentiels:
+        return None
+    u = np.array([np.nan if x is None else x for x in potentiels["offres"]], dtype=np.float64)
+    v = np.array([np.nan if x is None else x for x in potentiels["demandes"]], dtype=np.float64)
+    if u.shape != (n,) or v.shape != (m,):
+        return None
+    return u, v
+
+
+def basis_potentials(allocation: List[List[Optional[float]]], couts) -> Dict:
+    """Dual potentials (u for supplies, v for demands) of the basis held by an allocation."""
+    cost = cost_array(couts)
+    u, v = compute_potentials(cost, basic_cells(allocation))
+    return {"offres": _json_list(u), "demandes": _json_list(v)}
+
+
+def _analysis_context(allocation, couts, potentiels: Optional[Dict]):
+    cost = cost_array(couts)
+    n, m = cost.shape
+    cells = basic_cells(allocation)
+    tree = tree_order(n, m, cells)
+    stored = _stored_potentials(potentiels, n, m)
+    u, v = stored if stored is not None else compute_potentials(cost, cells, tree)
+
+    is_basic = np.zeros((n, m), dtype=bool)
+    if cells:
+        rows, cols = zip(*cells)
+        is_basic[list(rows), list(cols)] = True
+    d = reduced_costs(cost, u, v)
+    # Entering candidates: allowed non-basic cells. Everything else can never enter.
+    candidates = np.where(is_basic | np.isnan(d), np.inf, d)
+    return cost, cells, tree, u, v, d, is_basic, candidates
+
+
+def _crossing_minima(candidates: np.ndarray, tree: Dict, n: int, m: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For every node x of the basis forest: the smallest candidate among the cells
+    with their row below x and their column elsewhere in x's tree (row_out), and
+    the other way round (col_out). A cell (r, c) crosses exactly the edges on its
+    tree path, row_out for those on r's side and col_out on c's side, so the cells
+    are taken once in increasing order and each one fills the nodes of its path
+    still empty, skipped with a union-find: a sort of the n*m reduced costs, then
+    nearly linear. Stops as soon as every node is filled.
+    """
+    parent = tree["parent"]
+    component = tree["component"]
+    tin, tout = euler_times(n, m, tree)
+    tin, tout = tin.tolist(), tout.tolist()
+    row_out = np.full(n + m, np.inf)
+    col_out = np.full(n + m, np.inf)
+    # jump[x]: x itself while x is empty, else a higher node on its way to the root
+    jumps = (list(range(n + m)), list(range(n + m)))
+    empty = [sum(1 for node in range(n + m) if parent[node] != -1)] * 2
+
+    def find(jump: List[int], x: int) -> int:
+        root = x
+        while jump[root] != root:
+            root = jump[root]
+        while jump[x] != root:
+            jump[x], x = root, jump[x]
+        return root
+
+    def fill(side: int, out: np.ndarray, start: int, other: int, value: float) -> None:
+        jump = jumps[side]
+        x = find(jump, start)
+        # Up to the lowest common ancestor: the first node that is an ancestor of the other end
+        while parent[x] != -1 and not (tin[x] <= tin[other] <= tout[x]):
+            out[x] = value
+            jump[x] = parent[x]
+            empty[side] -= 1
+            x = find(jump, parent[x])
+
+    flat = candidates.ravel()
+    allowed = np.flatnonzero(np.isfinite(flat))
+    ordered = allowed[np.argsort(flat[allowed], kind="stable")]
+    for start in range(0, len(ordered), SCAN_CHUNK_CELLS):
+        chunk = ordered[start:start + SCAN_CHUNK_CELLS]
+        for cell, value in zip(chunk.tolist(), flat[chunk].tolist()):
+            r, c = divmod(cell, m)
+            if component[r] != component[n + c]:
+                continue
+            fill(0, row_out, r, n + c, value)
+            fill(1, col_out, n + c, r, value)
+            if not empty[0] and not empty[1]:
+                return row_out, col_out
+    return row_out, col_out
+
+
+def sensitivity_analysis(
+    allocation: List[List[Optional[float]]],
+    couts,
+    potentiels: Optional[Dict] = None
+) -> Dict:
+    """
+    Post-optimal analysis of a final basis, without re-solving.
+
+    - Shadow prices: u_i and v_j. Shipping one more unit from supply i to demand j
+      (both increased by the same amount) changes the optimal cost by u_i + v_j,
+      as long as the basis stays feasible.
+    - Non-basic cell (i, j): the plan is unchanged while its cost stays above
+      c_ij - d_ij, where d_ij is the reduced cost.
+    - Basic cell (i, j): removing it splits the basis tree in two sides; a cost
+      change only moves the reduced costs of the cells crossing the cut, which
+      bounds the change in each direction. All the cuts come from one pass over
+      the reduced costs (see _crossing_minima), not one pass per basic cell.
+    """
+    cost, cells, tree, u, v, d, is_basic, candidates = _analysis_context(allocation, couts, potentiels)
+    n, m = cost.shape
+
+    cout_min = np.where(is_basic, np.nan, cost - d)
+    cout_max = np.where(is_basic, np.nan, np.inf)
+    cout_max[np.isnan(cost)] = np.nan
+
+    row_out, col_out = _crossing_minima(candidates, tree, n, m)
+    for node in tree["order"]:
+        k = tree["parent_edge"][node]
+        if k == -1:
+            continue
+        i, j = cells[k]
+        # Raising c_ij lowers the reduced costs of the cells whose loop enters the
+        # subtree below the edge through a node of the subtree's own type (a row for
+        # a row child): theirs bound the rise; the other crossing cells bound the fall.
+        up, down = (row_out[node], col_out[node]) if node < n else (col_out[node], row_out[node])
+        cout_min[i, j] = cost[i, j] - down
+        cout_max[i, j] = cost[i, j] + up
+
+    finite_candidates = candidates[np.isfinite(candidates)]
+    return {
+        "base_optimale": bool(tree["is_tree"]) and not bool((finite_candidates < -OPTIMALITY_TOLERANCE).any()),
+        "potentiels": {"offres": _json_list(u), "demandes": _json_list(v)},
+        "couts_reduits": _json_list(np.where(is_basic, 0.0, d)),
+        "cout_min": _json_list(cout_min),
+        "cout_max": _json_list(cout_max),
+    }
+
+
+def what_if(
+    allocation: List[List[Optional[float]]],
+    couts,
+    scenarios: Sequence[Sequence[Perturbation]],
+    potentiels: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Evaluates many cost perturbations against the current plan without re-solving:
+    new plan cost, and whether the basis stays optimal. Potential shifts are
+    propagated along the basis tree for all scenarios at once.
+    """
+    cost, cells, tree, u, v, d, is_basic, candidates = _analysis_context(allocation, couts, potentiels)
+    n, m = cost.shape
+    flows = np.where(is_basic, flow_array(allocation), 0.0)
+    base_cost = float(np.nansum(flows * cost))
+
+    for scenario in scenarios:
+        for i, j, _ in scenario:
+            if not (0 <= i < n and 0 <= j < m):
+                raise ValueError(f"Cellule ({i}, {j}) hors de la matrice {n}x{m}.")
+            if math.isnan(cost[i, j]):
+                raise ValueError(f"La route ({i}, {j}) est interdite.")
+
+    # Cost deltas on basic cells move the potentials: delta(child) = delta(edge) - delta(parent)
+    edge_index = {cell: k for k, cell in enumerate(cells)}
+    edge_delta = np.zeros((len(scenarios), len(cells)))
+    for s, scenario in enumerate(scenarios):
+        for i, j, delta in scenario:
+            k = edge_index.get((i, j))
+            if k is not None:
+                edge_delta[s, k] += delta
+    shift = np.zeros((len(scenarios), n + m))
+    for node in tree["order"]:
+        if tree["parent"][node] != -1:
+            shift[:, node] = edge_delta[:, tree["parent_edge"][node]] - shift[:, tree["parent"][node]]
+
+    base_ok = not bool((candidates < -OPTIMALITY_TOLERANCE).any())
+    results = []
+    for s, scenario in enumerate(scenarios):
+        pi = np.array([p[0] for p in scenario], dtype=np.int64)
+        pj = np.array([p[1] for p in scenario], dtype=np.int64)
+        deltas = np.array([p[2] for p in scenario], dtype=np.float64)
+        variation = float((deltas * flows[pi, pj]).sum())
+        nonbasic = ~is_basic[pi, pj]
+
+        du, dv = shift[s, :n], shift[s, n:]
+        if du.any() or dv.any() or not base_ok:
+            new_d = candidates - du[:, None] - dv[None, :]
+            np.add.at(new_d, (pi[nonbasic], pj[nonbasic]), deltas[nonbasic])
+            stays_optimal = not bool((new_d < -OPTIMALITY_TOLERANCE).any())
+        else:
+            # Only non-basic cells moved: every other reduced cost is untouched
+            touched, inverse = np.unique(pi[nonbasic] * m + pj[nonbasic], return_inverse=True)
+            new_values = candidates.ravel()[touched] + np.bincount(inverse, weights=deltas[nonbasic])
+            stays_optimal = not bool((new_values < -OPTIMALITY_TOLERANCE).any())
+
+        results.append({
+            "cout_total": round(base_cost + variation, 2),
+            "variation": round(variation, 2),
+            "reste_optimal": stays_optimal,
+        })
+    return results
@@ -0,0 +1,254 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from solvers.basis import (
+    EPSILON_BASIS, SCAN_CHUNK_CELLS, allocation_from_basis, cost_array, dual_simplex, primal_simplex, spanning_basis,
+    tree_flows, tree_order
+)
+
+# Fast approximate plans for very large matrices.
+# Entropic-regularized transport (Sinkhorn, in the log domain with epsilon scaling)
+# gives potentials f, g whose plan P_ij = exp((f_i + g_j - c_ij) / eps) nearly
+# meets supplies and demands. It is turned into an exact integral basic solution
+# within a budget of simplex pivots: the spanning tree of the heaviest cells of P
+# is usually a near-optimal basis whose few negative flows a dual simplex repairs;
+# when that would take more pivots than allowed, the plan is rounded by shipping
+# greedily in decreasing order of P and the pivots go to Stepping Stone instead.
+# The result comes with a dual lower bound, so the remaining gap is known.
+# Every pass over the costs works by row chunks: a memory-mapped matrix is never
+# copied whole.
+
+REGULARIZATION = 0.002    # Final eps, relative to the cost scale
+MAX_ITERATIONS = 1000     # Sinkhorn iterations (each one reads the matrix twice)
+TOLERANCE = 1e-4          # Supply violation of the entropic plan, relative to the total
+SUPPORT_TOLERANCE = 1e-3  # Cells kept for rounding: P_ij above this share of the row's supply
+SCALE_SAMPLE_CELLS = 4096 # Cells sampled to estimate the cost scale
+POLISH_PIVOTS = 50        # Exact simplex pivots after rounding (each one prices the whole matrix)
+
+
+def _blocks(cost: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> Iterator[Tuple[int, np.ndarray]]:
+    """(offset in rows, float block of cost[rows][:, cols]) by row chunks; forbidden routes are +inf."""
+    n, m = cost.shape
+    all_rows, all_cols = len(rows) == n, len(cols) == m
+    step = max(1, SCAN_CHUNK_CELLS // max(len(cols), 1))
+    for s in range(0, len(rows), step):
+        block = cost[s:s + step] if all_rows else cost[rows[s:s + step]]
+        block = np.asarray(block if all_cols else block[:, cols], dtype=np.float64)
+        if np.isnan(block).any():
+            block = np.where(np.isnan(block), np.inf, block)
+        yield s, block
+
+
+def _cost_scale(cost: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> float:
+    """
+    Typical cost spread, from a fixed sample: the median is not thrown off by the
+    big-M penalties standing for forbidden routes, the maximum would be.
+    """
+    rng = np.random.default_rng(0)
+    sample = np.asarray(
+        cost[rows[rng.integers(len(rows), size=SCALE_SAMPLE_CELLS)], cols[rng.integers(len(cols), size=SCALE_SAMPLE_CELLS)]],
+        dtype=np.float64
+    )
+    sample = sample[np.isfinite(sample)]
+    if not len(sample):
+        return 1.0
+    scale = float(np.median(sample) - sample.min()) or float(sample.max() - sample.min())
+    return scale or 1.0
+
+
+def _row_potentials(cost, rows, cols, log_a, f, g, eps) -> Tuple[np.ndarray, float]:
+    """f making every row of the plan sum to its supply, and the supply violation before the update."""
+    lse = np.empty(len(rows))
+    for s, block in _blocks(cost, rows, cols):
+        z = (g[None, :] - block) / eps
+        top = z.max(axis=1)
+        top[~np.isfinite(top)] = 0
+        lse[s:s + len(block)] = top + np.log(np.exp(z - top[:, None]).sum(axis=1))
+    new_f = eps * (log_a - lse)
+    violation = float(np.abs(np.exp(log_a + (f - new_f) / eps) - np.exp(log_a)).sum())
+    return new_f, violation
+
+
+def _column_potentials(cost, rows, cols, log_b, f, eps) -> np.ndarray:
+    """g making every column of the plan sum to its demand: log-sum-exp accumulated over row chunks."""
+    top = np.full(len(cols), -np.inf)
+    total = np.zeros(len(cols))
+    for s, block in _blocks(cost, rows, cols):
+        z = (f[s:s + len(block), None] - block) / eps
+        block_top = np.maximum(top, z.max(axis=0))
+        shift = np.where(np.isfinite(block_top), block_top, 0)
+        total = total * np.exp(np.where(np.isfinite(top), top - shift, -np.inf)) + np.exp(z - shift).sum(axis=0)
+        top = block_top
+    return eps * (log_b - (np.where(np.isfinite(top), top, 0) + np.log(total)))
+
+
+def _dual_bound(cost, rows, cols, a, b, f) -> float:
+    """
+    Lower bound on the optimal cost from the entropic potentials: their c-transforms
+    v_j = min_i (c_ij - f_i) then u_i = min_j (c_ij - v_j) are dual feasible.
+    """
+    v = np.full(len(cols), np.inf)
+    for s, block in _blocks(cost, rows, cols):
+        v = np.minimum(v, (block - f[s:s + len(block), None]).min(axis=0))
+    u = np.empty(len(rows))
+    for s, block in _blocks(cost, rows, cols):
+        u[s:s + len(block)] = (block - v[None, :]).min(axis=1)
+    return float(a @ u + b @ v)
+
+
+def _entropic_potentials(cost, rows, cols, a, b, regularization, max_iterations, tolerance):
+    log_a, log_b = np.log(a), np.log(b)
+    f, g = np.zeros(len(rows)), np.zeros(len(cols))
+    scale = _cost_scale(cost, rows, cols)
+    # Epsilon scaling: halve eps from the cost scale down to the target, each stage
+    # starting from the previous potentials, which converges far faster than a
+    # cold start at the small eps
+    stages = max(1, int(np.ceil(np.log2(1 / regularization))) + 1)
+    per_stage = max(1, max_iterations // stages)
+    total = float(a.sum())
+    eps = scale
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"): # routes that are all forbidden
+        for stage in range(stages):
+            eps = scale * max(regularization, 0.5 ** stage)
+            for _ in range(per_stage):
+                f, violation = _row_potentials(cost, rows, cols, log_a, f, g, eps)
+                g = _column_potentials(cost, rows, cols, log_b, f, eps)
+                if violation <= tolerance * total:
+                    break
+    return f, g, eps
+
+
+def _rounding_order(cost, rows, cols, a, f, g, eps) -> Tuple[List[int], List[int]]:
+    """Cells carrying a noticeable share of the entropic plan, largest first."""
+    cand_i, cand_j, mass = [], [], []
+    for s, block in _blocks(cost, rows, cols):
+        plan = np.exp((f[s:s + len(block), None] + g[None, :] - block) / eps)
+        r, c = np.nonzero(plan >= SUPPORT_TOLERANCE * a[s:s + len(block), None])
+        cand_i.append(rows[s + r])
+        cand_j.append(cols[c])
+        mass.append(plan[r, c])
+    if not mass:
+        return [], []
+    order = np.argsort(-np.concatenate(mass), kind="stable")
+    return np.concatenate(cand_i)[order].tolist(), np.concatenate(cand_j)[order].tolist()
+
+
+def _ship_greedily(cost, cand_i, cand_j, offres, demandes, u, v) -> Tuple[List[Tuple[int, int]], List[float]]:
+    """
+    Integral feasible plan: ships min(supply left, demand left) on each candidate in
+    order, then what is left over the remaining rows and columns by increasing
+    reduced cost c_ij - u_i - v_j. Every shipment exhausts a row or a column, so the
+    plan is a forest of at most n + m - 1 cells, ready to be completed into a basis;
+    integral supplies give integral flows.
+    """
+    supply = [float(x) for x in offres]
+    demand = [float(x) for x in demandes]
+    cells, flows = [], []
+
+    def ship(i: int, j: int) -> None:
+        q = min(supply[i], demand[j])
+        supply[i] -= q
+        demand[j] -= q
+        cells.append((i, j))
+        flows.append(q)
+
+    for i, j in zip(cand_i, cand_j):
+        if supply[i] > EPSILON_BASIS and demand[j] > EPSILON_BASIS:
+            ship(i, j)
+
+    rows_left = np.array([i for i, q in enumerate(supply) if q > EPSILON_BASIS], dtype=np.intp)
+    cols_left = np.array([j for j, q in enumerate(demand) if q > EPSILON_BASIS], dtype=np.intp)
+    if len(rows_left) and len(cols_left):
+        # The rounding leaves few rows and columns unserved: their sub-matrix is small
+        reduced = np.asarray(cost[rows_left][:, cols_left], dtype=np.float64) - u[rows_left, None] - v[None, cols_left]
+        reduced[np.isnan(reduced)] = np.inf
+        for flat in np.argsort(reduced, axis=None, kind="stable"):
+            r, c = divmod(int(flat), len(cols_left))
+            i, j = int(rows_left[r]), int(cols_left[c])
+            if supply[i] > EPSILON_BASIS and demand[j] > EPSILON_BASIS:
+                if not np.isfinite(reduced[r, c]):
+                    raise ValueError("Les routes autorisées ne permettent pas d'arrondir le plan approché.")
+                ship(i, j)
+    return cells, flows
+
+
+def _heaviest_basis(cost, cand_i, cand_j, offres, demandes, max_pivots: int):
+    """
+    Spanning tree of the heaviest entropic cells, made feasible by the dual simplex;
+    None when its negative flows would take more than max_pivots pivots to repair.
+    """
+    n, m = cost.shape
+    tree = spanning_basis(cost, list(zip(cand_i, cand_j)))
+    flows = tree_flows(n, m, tree, tree_order(n, m, tree), offres, demandes)
+    if int((flows < -EPSILON_BASIS).sum()) > max_pivots: # about one pivot per negative flow
+        return None
+    try:
+        return dual_simplex(cost, tree, offres, demandes, max_pivots)
+    except ValueError: # not repaired within the budget
+        return None
+
+
+def solve_sinkhorn_lean(
+    offres,
+    demandes,
+    cost: np.ndarray,
+    polish_pivots: int = POLISH_PIVOTS,
+    regularization: float = REGULARIZATION,
+    max_iterations: int = MAX_ITERATIONS,
+    tolerance: float = TOLERANCE
+) -> Dict:
+    """
+    Approximate plan as a sparse basis store (see solvers/lean.py), with
+    "borne_duale" (lower bound on the optimal cost) and "ecart" (cout_total minus
+    that bound). polish_pivots bounds the exact simplex pivots spent on top of the
+    entropic solve (0: plain greedy rounding); a plan proven optimal has a zero gap.
+    """
+    n, m = cost.shape
+    a_all, b_all = np.asarray(offres, dtype=np.float64), np.asarray(demandes, dtype=np.float64)
+    rows, cols = np.flatnonzero(a_all > 0), np.flatnonzero(b_all > 0)
+    bound = 0.0
+    cand_i, cand_j = [], []
+    u, v = np.zeros(n), np.zeros(m)
+    if len(rows) and len(cols):
+        a, b = a_all[rows], b_all[cols]
+        f, g, eps = _entropic_potentials(cost, rows, cols, a, b, regularization, max_iterations, tolerance)
+        cand_i, cand_j = _rounding_order(cost, rows, cols, a, f, g, eps)
+        bound = _dual_bound(cost, rows, cols, a, b, f)
+        u[rows], v[cols] = f, g
+
+    repaired = _heaviest_basis(cost, cand_i, cand_j, offres, demandes, polish_pivots) if polish_pivots > 0 else None
+    if repaired is not None:
+        tree, flows, pivots = repaired
+    else:
+        cells, flows = _ship_greedily(cost, cand_i, cand_j, offres, demandes, u, v)
+        tree = spanning_basis(cost, cells)
+        flow_of = dict(zip(cells, flows))
+        flows = np.array([flow_of.get(cell, 0.0) for cell in tree], dtype=np.float64)
+        pivots = 0
+    optimal = False
+    if polish_pivots > pivots:
+        tree, flows, _, optimal = primal_simplex(cost, tree, flows, polish_pivots - pivots)
+
+    rows_of, cols_of = zip(*tree) if tree else ((), ())
+    cout_total = round(float((flows * np.asarray(cost[list(rows_of), list(cols_of)], dtype=np.float64)).sum()), 2)
+    if optimal:
+        bound = cout_total
+    return {
+        "cellules": tree,
+        "flux": flows,
+        "cout_total": cout_total,
+        "borne_duale": round(min(bound, cout_total), 2),
+        "ecart": round(max(cout_total - bound, 0.0), 2),
+    }
+
+
+def solve_sinkhorn(offres, demandes, couts, polish_pivots: int = POLISH_PIVOTS) -> Dict:
+    """Same as the other initial solvers: dense allocation (EPSILON on zero-flow basic cells) and cout_total."""
+    cost = cost_array(couts)
+    n, m = cost.shape
+    store = solve_sinkhorn_lean(offres, demandes, cost, polish_pivots)
+    result = allocation_from_basis(n, m, store["cellules"], store["flux"], cost)
+    result["borne_duale"] = store["borne_duale"]
+    result["ecart"] = store["ecart"]
+    return result
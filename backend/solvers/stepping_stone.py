@@ -1,5 +1,5 @@
-from copy import deepcopy
-from typing import List, Optional, Tuple, Dict
+import time
+from typing import Callable, List, Optional, Tuple, Dict
 
 EPSILON_SS = 1e-6
 DEBUG_STEPPING_STONE_VERBOSE = False # Set to False to disable detailed logs by default
@@ -101,13 +101,35 @@ def _find_closed_path(matrix: List[List[Optional[float]]], r0: int, c0: int) ->
     if DEBUG_STEPPING_STONE_VERBOSE: print(f"  No valid path found for NB({r0},{c0})")
     return None
 
-def solve_stepping_stone(initial_solution: Dict, couts: List[List[float]]) -> Dict:
-    allocation = deepcopy(initial_solution["allocation"])
+def _plan_cost(allocation: List[List[Optional[float]]], couts: List[List[float]]) -> float:
+    total = 0
+    for r_idx, row in enumerate(allocation):
+        for c_idx, val in enumerate(row):
+            if val is not None and val > 0:
+                total += val * couts[r_idx][c_idx]
+    return total
+
+
+def solve_stepping_stone(
+    initial_solution: Dict,
+    couts: List[List[float]],
+    on_checkpoint: Optional[Callable[[Dict], None]] = None,
+    checkpoint_interval: Optional[float] = None
+) -> Dict:
+    """
+    on_checkpoint, if given, receives a snapshot of the current basis at most every
+    checkpoint_interval seconds: {"allocation", "cout_total", "iteration"}. Passing
+    such a snapshot back as initial_solution resumes the run where it stopped.
+    """
+    # Row copies are enough: cells hold immutable numbers, so deepcopy would only add its memo overhead
+    allocation = [row[:] for row in initial_solution["allocation"]]
     n_rows = len(allocation)
     n_cols = len(allocation[0])
 
-    iteration_count = 0
+    iteration_count = initial_solution.get("iteration", 0) # > 0 when resuming from a checkpoint
     MAX_ITERATIONS = (n_rows * n_cols) * 2
+    # Only a clock read per pivot: the snapshot itself is taken once per interval
+    next_checkpoint = time.monotonic() + (checkpoint_interval or 0) if on_checkpoint else None
 
     if DEBUG_STEPPING_STONE_VERBOSE:
         cost_val = initial_solution.get('cout_total', 'N/A')
@@ -206,12 +228,15 @@ def solve_stepping_stone(initial_solution: Dict, couts: List[List[float]]) -> Di
             print(f"  Allocation after iteration {iteration_count}:")
             for r_idx, r_val in enumerate(allocation): print(f"    {r_idx}: {[f'{x:.2f}' if x is not None else ' None ' for x in r_val]}")
 
-    final_cout_total = 0
-    for r_idx in range(n_rows):
-        for c_idx in range(n_cols):
-            val = allocation[r_idx][c_idx]
-            if val is not None and val > 0: # Changed EPSILON_SS to 0
-                final_cout_total += val * couts[r_idx][c_idx]
+        if next_checkpoint is not None and time.monotonic() >= next_checkpoint:
+            on_checkpoint({
+                "allocation": [row[:] for row in allocation],
+                "cout_total": round(_plan_cost(allocation, couts), 2),
+                "iteration": iteration_count,
+            })
+            next_checkpoint = time.monotonic() + (checkpoint_interval or 0)
+
+    final_cout_total = _plan_cost(allocation, couts)
 
     rounded_final_cout_total = round(final_cout_total, 2)
     if DEBUG_STEPPING_STONE_VERBOSE: print(f"\nStepping Stone finished. Final cost: {rounded_final_cout_total:.2f} (original: {final_cout_total})")
@@ -0,0 +1,48 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# Rectangular windows of a cost matrix and of a plan (tiles.py, GET /solve/{id}/matrix).
+# A plan is reduced once to its basis cells (n + m - 1 of them): a window is then a
+# filter over those cells, never a walk of the n x m allocation.
+
+
+class BasisCells(NamedTuple):
+    rows: np.ndarray
+    cols: np.ndarray
+    values: np.ndarray
+
+
+def plan_cells(result: Optional[Dict]) -> Optional[BasisCells]:
+    """The cells of a result, dense (allocation) or sparse (cellules/flux)."""
+    if not result:
+        return None
+    if result.get("cellules") is not None:
+        cells = np.asarray(result["cellules"], dtype=np.intp).reshape(-1, 2)
+        return BasisCells(cells[:, 0], cells[:, 1], np.asarray(result["flux"], dtype=np.float64))
+    allocation = result.get("allocation")
+    if allocation is None:
+        return None
+    found = [(i, j, value) for i, row in enumerate(allocation) for j, value in enumerate(row) if value is not None]
+    rows, cols, values = zip(*found) if found else ((), (), ())
+    return BasisCells(np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp), np.array(values, dtype=np.float64))
+
+
+def edited_window(couts: List[List[Any]], overlay: Optional[List[List]], row0: int, row1: int, col0: int, col1: int) -> List[List[Any]]:
+    """Costs of rows [row0, row1) x columns [col0, col1) of a list matrix, with the edits [[i, j, cout], ...] on top."""
+    window = [row[col0:col1] for row in couts[row0:row1]]
+    for i, j, cout in overlay or []:
+        if row0 <= i < row1 and col0 <= j < col1:
+            window[i - row0][j - col0] = cout
+    return window
+
+
+def allocation_window(cells: Optional[BasisCells], row0: int, row1: int, col0: int, col1: int) -> Optional[List[List[Optional[float]]]]:
+    """Dense window of an allocation: None off the basis, as in the stored matrix."""
+    if cells is None:
+        return None
+    window: List[List[Optional[float]]] = [[None] * (col1 - col0) for _ in range(row1 - row0)]
+    inside = (cells.rows >= row0) & (cells.rows < row1) & (cells.cols >= col0) & (cells.cols < col1)
+    for i, j, value in zip(cells.rows[inside].tolist(), cells.cols[inside].tolist(), cells.values[inside].tolist()):
+        window[i - row0][j - col0] = value
+    return window
@@ -0,0 +1,153 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session, load_only
+
+from matrices import acquire, acquire_inline, merge_cost_changes, release
+from models import CostMatrix, TransportTask
+from solvers.basis import cost_array
+from solvers.repricing import plan_costs, recertify
+
+# Tariff changes on a shared cost matrix (POST /matrices/{id}/tarifs). The tasks on
+# the matrix are walked by id in batches of REPRICE_BATCH_SIZE; each batch's stored
+# plans are priced under the new costs in one vectorized pass (solvers/repricing.py),
+# each task's own cell edits still taking precedence. No solver runs: with
+# verifier_optimalite, a plan's basis is checked against the new costs instead.
+#
+# Applied, the tasks move to the matrix holding the new tariff and their stored
+# results get the new costs. A task is left optimized only when its basis was
+# checked and is still optimal; the background scheduler re-optimizes the others.
+# A task whose plan the tariff makes infeasible is reset and flagged in erreur_calcul;
+# re-solving it (PUT /solve/{id}) is left to the caller.
+
+REPRICE_BATCH_SIZE = int(os.getenv("REPRICE_BATCH_SIZE", "200"))
+
+REPRICED_COLUMNS = ("resultat", "initial_result", "optimized_result")
+
+INFEASIBLE_MESSAGE = "Le nouveau tarif interdit une route du plan : la tâche est à résoudre de nouveau."
+
+
+def _task_cost(cost: np.ndarray, overlay: Optional[List[List]]) -> np.ndarray:
+    if not overlay:
+        return cost
+    edited = cost.copy()
+    for i, j, cout in overlay:
+        edited[i, j] = np.nan if cout is None else cout
+    return edited
+
+
+def _repriced(result: Dict, cout_total: float) -> Dict:
+    # The stored potentials and certificate belong to the old costs
+    repriced = {key: value for key, value in result.items() if key not in ("potentiels", "certificat")}
+    repriced["cout_total"] = cout_total
+    return repriced
+
+
+def _apply(task: TransportTask, costs: Dict[str, Optional[float]], checked: Optional[Dict]) -> bool:
+    """Writes the new costs on a task; True when its plan is no longer feasible and it needs a new solve."""
+    task.optimization_checkpoint = None
+    task.date_derniere_maj = datetime.utcnow()
+    if costs["resultat"] is None:
+        task.resultat = task.initial_result = task.optimized_result = None
+        task.cout_total = None
+        task.is_optimized = False
+        task.erreur_calcul = INFEASIBLE_MESSAGE
+        return True
+    for column in REPRICED_COLUMNS:
+        result = getattr(task, column)
+        if result is not None:
+            # A stored plan the tariff makes infeasible cannot be kept (the active one is feasible)
+            setattr(task, column, None if costs[column] is None else _repriced(result, costs[column]))
+    if checked is not None and task.is_optimized:
+        task.resultat = task.optimized_result = checked # the new certificate, whichever way it went
+    task.cout_total = costs["resultat"]
+    task.is_optimized = bool(task.is_optimized and checked is not None and checked["certificat"]["verifie"])
+    return False
+
+
+def reprice_matrix(db: Session, matrix: CostMatrix, couts: List[List[Any]], check: bool, apply: bool) -> Dict:
+    """
+    Report of the tasks on matrix re-priced under couts (same shape). Applied, the
+    changes are left in the session for the caller to commit.
+    """
+    matrix_id, nom = matrix.id, matrix.nom
+    cost = cost_array(couts)
+    new_id = None
+    seen = 0
+    report = []
+    last_id = 0
+    while True:
+        query = (
+            db.query(TransportTask)
+            .options(load_only(
+                TransportTask.id, TransportTask.nom, TransportTask.offres, TransportTask.demandes,
+                TransportTask.resultat, TransportTask.initial_result, TransportTask.optimized_result,
+                TransportTask.modifications_couts, TransportTask.is_optimized, TransportTask.cout_total,
+                TransportTask.matrice_id
+            ))
+            .filter(TransportTask.matrice_id == matrix_id, TransportTask.id > last_id)
+            .order_by(TransportTask.id)
+            .limit(REPRICE_BATCH_SIZE)
+        )
+        if apply:
+            query = query.with_for_update()
+        batch = query.all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        seen += len(batch)
+
+        # Every stored plan of the batch in one pass
+        pairs = [(task, column) for task in batch for column in REPRICED_COLUMNS if getattr(task, column)]
+        priced = plan_costs(
+            [getattr(task, column) for task, column in pairs], cost, [task.modifications_couts for task, _ in pairs]
+        )
+        costs: Dict[int, Dict[str, Optional[float]]] = {}
+        for (task, column), cout in zip(pairs, priced):
+            costs.setdefault(task.id, {})[column] = cout
+
+        if apply and new_id is None:
+            new_id = acquire_inline(db, couts, nom) # one reference now, the others after the walk
+        for task in batch:
+            if apply:
+                task.matrice_id = new_id
+                if task.modifications_couts:
+                    task.modifications_couts = merge_cost_changes(couts, task.modifications_couts, [])
+            if not task.resultat:
+                continue
+            task_costs = costs[task.id]
+            entry = {
+                "id": task.id,
+                "nom": task.nom,
+                "cout_avant": task.cout_total,
+                "cout_apres": task_costs["resultat"],
+                "realisable": task_costs["resultat"] is not None,
+                "optimal": None,
+                "a_resoudre": False,
+            }
+            checked = None
+            if check and entry["realisable"]:
+                checked = recertify(
+                    task.offres, task.demandes, _task_cost(cost, task.modifications_couts),
+                    _repriced(task.resultat, task_costs["resultat"])
+                )
+                entry["optimal"] = checked["certificat"]["verifie"]
+            if apply:
+                entry["a_resoudre"] = _apply(task, task_costs, checked)
+            report.append(entry)
+        if apply:
+            db.flush()
+        db.expunge_all() # memory stays at one batch whatever the number of tasks
+
+    if apply and seen:
+        acquire(db, new_id, seen - 1)
+        release(db, matrix_id, seen) # the old inline matrix goes when no task uses it any more
+    return {
+        "matrice_id": matrix_id,
+        "nouvelle_matrice_id": new_id,
+        "applique": apply,
+        "nb_taches": seen,
+        "taches": report,
+    }
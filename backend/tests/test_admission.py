@@ -0,0 +1,182 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timezone
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Quotas are read from solver_timings and solver_jobs: a disposable database, as in test_jobs.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL non défini")
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from database import Base
+        import admission
+
+        engine = create_engine(TEST_DATABASE_URL)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        admission._models.clear()
+
+    def tearDown(self):
+        self.db.close()
+
+    def profile(self, n, m, solveur="hammer"):
+        from services import SolverProfile
+        return SolverProfile("solve", solveur, n, m, 1.0)
+
+    def test_decision_follows_the_estimate(self):
+        import admission
+        from admission import ADMISSION_MAX_SECONDS, ADMISSION_SYNC_SECONDS, AdmissionRefused, admit, estimate
+
+        small = self.profile(10, 10)
+        with admit(self.db, "a", small) as decision:
+            self.assertEqual(decision.decision, admission.EXECUTE)
+
+        # Sizes just past each threshold, from the model itself
+        n = 10
+        while estimate(self.db, self.profile(n, n)) <= ADMISSION_SYNC_SECONDS:
+            n *= 2
+        with admit(self.db, "a", self.profile(n, n)) as decision:
+            self.assertTrue(decision.deferred)
+        with admit(self.db, "a", self.profile(n, n), deferrable=False) as decision:
+            self.assertEqual(decision.decision, admission.EXECUTE)
+        while estimate(self.db, self.profile(n, n)) <= ADMISSION_MAX_SECONDS:
+            n *= 2
+        with self.assertRaises(AdmissionRefused) as refused:
+            admit(self.db, "a", self.profile(n, n))
+        self.assertEqual(refused.exception.status_code, 413)
+        self.assertEqual(admission._inline.by_client, {}) # every slot released
+
+    def test_active_jobs_count_against_concurrency(self):
+        import jobs
+        from admission import CLIENT_MAX_CONCURRENT, AdmissionRefused, admit
+        from models import TransportTask
+
+        task = TransportTask(nom="t", offres=[1], demandes=[1], couts=[[1]], algo_utilise="cno", n_rows=1, n_cols=1)
+        self.db.add(task)
+        self.db.flush()
+        for _ in range(CLIENT_MAX_CONCURRENT):
+            jobs.enqueue(self.db, "solve", task.id, client="a", estimation=0.1)
+        self.db.commit()
+        with self.assertRaises(AdmissionRefused) as refused:
+            admit(self.db, "a", self.profile(10, 10))
+        self.assertEqual(refused.exception.status_code, 429)
+        with admit(self.db, "b", self.profile(10, 10)):
+            pass # another client is not affected
+
+    def test_recorded_timings_count_against_the_quota(self):
+        from admission import CLIENT_COMPUTE_SECONDS, AdmissionRefused, admit
+        from models import SolverTiming
+
+        self.db.add(SolverTiming(
+            operation="solve", solveur="hammer", n_rows=10, n_cols=10, densite=1.0,
+            duree_secondes=CLIENT_COMPUTE_SECONDS, client="a", date_creation=datetime.now(timezone.utc)
+        ))
+        self.db.commit()
+        with self.assertRaises(AdmissionRefused) as refused:
+            admit(self.db, "a", self.profile(10, 10))
+        self.assertEqual(refused.exception.status_code, 429)
+        self.assertGreaterEqual(refused.exception.retry_after, 1)
+
+    def test_model_is_fitted_on_recorded_timings(self):
+        import admission
+        from admission import estimate
+        from models import SolverTiming
+
+        before = estimate(self.db, self.profile(50, 50, "cno"))
+        for n in (20, 40, 80, 160, 320):
+            self.db.add(SolverTiming(
+                operation="solve", solveur="cno", n_rows=n, n_cols=n, densite=1.0,
+                duree_secondes=1e-4 * n * n, client="x", date_creation=datetime.now(timezone.utc)
+            ))
+        self.db.commit()
+        admission._models.clear() # refit now rather than after the TTL
+        after = estimate(self.db, self.profile(50, 50, "cno"))
+        self.assertNotAlmostEqual(before, after)
+        self.assertAlmostEqual(after, 1e-4 * 2500, places=6)
+
+    def test_client_header_is_only_trusted_from_proxies(self):
+        import admission
+        from types import SimpleNamespace
+
+        def request(host, header=None, user=None):
+            scope = {"user": user} if user is not None else {}
+            headers = {admission.CLIENT_HEADER: header} if header else {}
+            return SimpleNamespace(scope=scope, headers=headers, client=SimpleNamespace(host=host))
+
+        self.assertEqual(admission.client_id(request("10.0.0.7", "nouveau-nom")), "10.0.0.7")
+        trusted = admission.TRUSTED_PROXIES
+        admission.TRUSTED_PROXIES = frozenset({"10.0.0.1"})
+        try:
+            self.assertEqual(admission.client_id(request("10.0.0.1", "equipe-a")), "equipe-a")
+            self.assertEqual(admission.client_id(request("10.0.0.1")), "10.0.0.1")
+        finally:
+            admission.TRUSTED_PROXIES = trusted
+        user = SimpleNamespace(is_authenticated=True, identity="alice")
+        self.assertEqual(admission.client_id(request("10.0.0.7", "autre", user)), "utilisateur:alice")
+
+    def test_batch_is_estimated_as_a_whole(self):
+        import admission
+        from admission import admit, estimate
+        from models import SolverTiming
+        from services import SolverProfile, solver_profile
+
+        profile = solver_profile("scenarios", "hammer", [1] * 100, [1] * 100, [[1] * 100] * 100)
+        self.assertEqual(profile.solveur, "stepping_stone_lean")
+        # A batch of 100 x 100 scenarios runs in well under a second each: never refused
+        self.assertLess(estimate(self.db, profile) * 50, admission.ADMISSION_SYNC_SECONDS)
+        with admit(self.db, "a", profile, count=12) as decision:
+            self.assertAlmostEqual(decision.estimate, 12 * estimate(self.db, profile))
+
+        # Batches are recorded whole (quota) and fitted per scenario (model)
+        for n in (20, 40, 80, 160, 320):
+            with admit(self.db, "a", SolverProfile("scenarios", "stepping_stone_lean", n, n, 1.0), count=10) as batch:
+                batch.seconds = 10 * 1e-5 * n * n
+                batch.record(self.db)
+        self.db.commit()
+        self.assertEqual({row.nb_calculs for row in self.db.query(SolverTiming)}, {10})
+        admission._models.clear()
+        self.assertAlmostEqual(estimate(self.db, SolverProfile("scenarios", "stepping_stone_lean", 50, 50, 1.0)), 1e-5 * 2500)
+
+    def test_edits_are_admitted_only_when_they_solve(self):
+        from contextlib import contextmanager
+        from types import SimpleNamespace
+        from admission import estimate
+        from services import edited_result, initial_result, optimized_result, solver_profile
+
+        offres, demandes = [20, 30, 25], [10, 25, 15, 25]
+        couts = [[4, 6, 9, 5], [7, 3, 8, 6], [5, 8, 4, 7]]
+        result = optimized_result(initial_result("hammer", offres, demandes, couts), offres, demandes, couts)
+        task = SimpleNamespace(resultat=result, is_optimized=True, algo_utilise="hammer", offres=offres, demandes=demandes)
+        admitted = []
+
+        @contextmanager
+        def admit(recalcul):
+            admitted.append(recalcul)
+            yield
+
+        i, j = next((i, j) for i, row in enumerate(result["allocation"]) for j, v in enumerate(row) if v is None)
+        recalcul, _, _ = edited_result(task, couts, couts, [[i, j, couts[i][j] + 10]], False, admit)
+        self.assertEqual((recalcul, admitted), ("aucun", []))
+
+        i, j = next((i, j) for i, row in enumerate(result["allocation"]) for j, v in enumerate(row) if v)
+        changed = [row[:] for row in couts]
+        changed[i][j] += 10
+        recalcul, _, _ = edited_result(task, couts, changed, [[i, j, changed[i][j]]], False, admit)
+        self.assertEqual((recalcul, admitted), ("reoptimisation", ["reoptimisation"]))
+        # The warm start is priced on the lean simplex, far below a dense optimization
+        warm = solver_profile("reoptimize", "hammer", [2] * 200, [2] * 200, [[1] * 200] * 200)
+        cold = solver_profile("optimize", "hammer", [2] * 200, [2] * 200, [[1] * 200] * 200)
+        self.assertEqual(warm.solveur, "stepping_stone_lean")
+        self.assertLess(estimate(self.db, warm) * 100, estimate(self.db, cold))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import random
+import sys
+import os
+import tracemalloc
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from solvers.assignment import is_assignment, hungarian, solve_assignment, solve_assignment_lean
+from solvers.hammer import solve_hammer
+from solvers.stepping_stone import solve_stepping_stone
+from solvers.lean import cost_buffer, solve_stepping_stone_lean, store_from_result
+
+
+def optimum(offres, demandes, couts):
+    # Reference optimum: the lean Stepping Stone run to completion
+    cost = cost_buffer(couts, sum(offres))
+    return solve_stepping_stone_lean(store_from_result(solve_hammer(offres, demandes, couts), cost), cost)["cout_total"]
+
+
+class TestAssignment(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.n = 40
+        self.couts = [[rng.randint(1, 60) for _ in range(self.n)] for _ in range(self.n)]
+        self.ones = [1] * self.n
+
+    def test_detection(self):
+        self.assertTrue(is_assignment([1, 1], [1, 1]))
+        self.assertTrue(is_assignment(np.ones(3), np.ones(3)))
+        self.assertFalse(is_assignment([1, 1], [2]))
+        self.assertFalse(is_assignment([1, 2], [2, 1]))
+        self.assertFalse(is_assignment([], []))
+
+    def test_hungarian_matching_and_duals_are_optimal(self):
+        cost = np.array(self.couts, dtype=np.float64)
+        col_of, u, v = hungarian(cost)
+        self.assertEqual(sorted(col_of.tolist()), list(range(self.n)))
+        reduced = cost - u[:, None] - v[None, :]
+        self.assertGreaterEqual(reduced.min(), -1e-9)
+        self.assertTrue(np.allclose(reduced[np.arange(self.n), col_of], 0))
+        self.assertAlmostEqual(cost[np.arange(self.n), col_of].sum(), optimum(self.ones, self.ones, self.couts))
+
+    def test_result_is_an_optimal_basic_plan(self):
+        result = solve_assignment(self.ones, self.ones, self.couts)
+        allocation = result["allocation"]
+        self.assertEqual(sum(v is not None for row in allocation for v in row), 2 * self.n - 1)
+        flows = [[1 if v is not None and v > 0.5 else 0 for v in row] for row in allocation]
+        self.assertEqual([sum(row) for row in flows], self.ones)
+        self.assertEqual([sum(col) for col in zip(*flows)], self.ones)
+        self.assertEqual(result["cout_total"], optimum(self.ones, self.ones, self.couts))
+        # Stepping Stone finds nothing to improve from this basis
+        self.assertEqual(solve_stepping_stone(result, self.couts)["cout_total"], result["cout_total"])
+
+    def test_forbidden_routes(self):
+        couts = [[None, 1, 9], [2, None, 9], [9, 9, 1]]
+        result = solve_assignment([1] * 3, [1] * 3, couts)
+        self.assertEqual(result["cout_total"], 4)
+        self.assertIsNone(result["allocation"][0][0])
+        with self.assertRaises(ValueError):
+            solve_assignment([1] * 2, [1] * 2, [[None, 1], [None, 2]])
+
+    def test_lean_store(self):
+        store = solve_assignment_lean(np.array([[4.0, 1.0], [2.0, 8.0]]))
+        self.assertEqual(store["cout_total"], 3)
+        self.assertEqual(len(store["cellules"]), 3)
+
+    def test_lean_store_memory_stays_below_matrix_size(self):
+        # The reduced costs are priced by row chunks: no n x n temporary besides the input
+        import solvers.assignment as assignment
+        import solvers.basis as basis
+        couts = np.random.default_rng(0).integers(1, 1000, size=(300, 300), dtype=np.int64)
+        chunk = assignment.SCAN_CHUNK_CELLS, basis.SCAN_CHUNK_CELLS
+        assignment.SCAN_CHUNK_CELLS = basis.SCAN_CHUNK_CELLS = 1 << 14
+        tracemalloc.start()
+        try:
+            store = solve_assignment_lean(couts)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            assignment.SCAN_CHUNK_CELLS, basis.SCAN_CHUNK_CELLS = chunk
+        self.assertLess(peak, couts.nbytes, f"Peak {peak} bytes for a {couts.nbytes} bytes matrix")
+        col_of, _, _ = hungarian(couts)
+        self.assertAlmostEqual(store["cout_total"], couts[np.arange(300), col_of].sum())
+        self.assertEqual(len(store["cellules"]), 599)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import random
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from solvers.hammer import solve_hammer
+from solvers.decomposition import solve_decomposed
+from solvers.lean import cost_buffer, result_from_store, solve_stepping_stone_lean, sparse_result, store_from_result
+from solvers.certificate import certificate_potentials, check_certificate
+
+# services.py needs the application's database settings, as in test_admission.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def optimal_plan(offres, demandes, couts):
+    # Reference optimum: the lean Stepping Stone run to completion
+    cost = cost_buffer(couts, sum(offres))
+    store = solve_stepping_stone_lean(store_from_result(solve_decomposed(solve_hammer, offres, demandes, couts), cost), cost)
+    return store, result_from_store(store, cost)
+
+
+class TestOptimalityCertificate(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(8)
+        self.n, self.m = 10, 12
+        self.couts = [[rng.randint(1, 40) for _ in range(self.m)] for _ in range(self.n)]
+        self.offres = [rng.randint(5, 30) for _ in range(self.n)]
+        self.demandes = [0] * self.m
+        for _ in range(sum(self.offres)):
+            self.demandes[rng.randrange(self.m)] += 1
+
+    def test_optimal_basis_is_certified(self):
+        store, result = optimal_plan(self.offres, self.demandes, self.couts)
+        result["potentiels"] = certificate_potentials(result, self.couts, sum(self.offres))
+        certificate = check_certificate(self.offres, self.demandes, self.couts, result)
+        self.assertTrue(certificate["verifie"])
+        self.assertAlmostEqual(certificate["borne_duale"], result["cout_total"], places=4)
+        self.assertAlmostEqual(certificate["cout_plan"], result["cout_total"], places=4)
+
+        # Same check on the sparse form, against a memory-mapped style array
+        sparse = sparse_result(store)
+        sparse["potentiels"] = result["potentiels"]
+        self.assertTrue(check_certificate(self.offres, self.demandes, np.array(self.couts), sparse)["verifie"])
+
+    def test_suboptimal_plan_fails_dual_feasibility(self):
+        initial = solve_hammer(self.offres, self.demandes, self.couts)
+        certificate = check_certificate(self.offres, self.demandes, self.couts, initial)
+        self.assertTrue(certificate["realisable"])
+        self.assertFalse(certificate["verifie"])
+        self.assertLess(certificate["cout_reduit_min"], 0)
+
+    def test_infeasible_plan_fails(self):
+        _, result = optimal_plan(self.offres, self.demandes, self.couts)
+        result["potentiels"] = certificate_potentials(result, self.couts, sum(self.offres))
+        i, j = next((i, j) for i in range(self.n) for j in range(self.m) if (result["allocation"][i][j] or 0) > 1)
+        result["allocation"][i][j] -= 1
+        certificate = check_certificate(self.offres, self.demandes, self.couts, result)
+        self.assertFalse(certificate["realisable"])
+        self.assertFalse(certificate["verifie"])
+
+    def test_forbidden_routes(self):
+        couts = [[1, None, 3], [None, 2, 1], [4, 2, None]]
+        offres, demandes = [4, 3, 5], [5, 4, 3]
+        _, result = optimal_plan(offres, demandes, couts)
+        result["potentiels"] = certificate_potentials(result, couts, sum(offres))
+        self.assertTrue(all(x is not None for x in result["potentiels"]["offres"]))
+        self.assertTrue(check_certificate(offres, demandes, couts, result)["verifie"])
+
+        # Shipping on a forbidden route is never certified
+        result["allocation"] = [[3, 1, None], [None, None, 3], [2, 3, None]]
+        self.assertFalse(check_certificate(offres, demandes, couts, result)["realisable"])
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL non défini")
+class TestCertifiedResult(unittest.TestCase):
+
+    def test_infeasible_plan_is_never_kept(self):
+        from services import certified
+
+        rng = random.Random(4)
+        couts = [[rng.randint(1, 30) for _ in range(6)] for _ in range(5)]
+        offres, demandes = [8, 6, 9, 7, 5], [6, 7, 4, 8, 5, 5]
+        initial = solve_hammer(offres, demandes, couts)
+        _, optimum = optimal_plan(offres, demandes, couts)
+        broken = {"allocation": [row[:] for row in optimum["allocation"]], "cout_total": optimum["cout_total"]}
+        i, j = next((i, j) for i in range(5) for j in range(6) if (broken["allocation"][i][j] or 0) > 1)
+        broken["allocation"][i][j] -= 1
+
+        result = certified({**broken, "allocation": [row[:] for row in broken["allocation"]]}, offres, demandes, couts, initial)
+        self.assertTrue(result["certificat"]["verifie"])
+        self.assertAlmostEqual(result["cout_total"], optimum["cout_total"])
+        with self.assertRaises(ValueError):
+            certified(broken, offres, demandes, couts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cost_model import MIN_SAMPLES, REFERENCE_CELLS, CostModel, fit, prior
+
+
+def timings(model, shapes):
+    return [(n, m, d, model.estimate(n, m, d)) for n, m, d in shapes]
+
+
+class TestCostModel(unittest.TestCase):
+
+    def test_few_samples_keep_the_prior(self):
+        base = prior("optimize", "stepping_stone_lean")
+        samples = timings(CostModel(10.0, 2.0), [(100, 100, 1.0)] * (MIN_SAMPLES - 1))
+        self.assertEqual(fit(samples, base), base)
+
+    def test_fit_recovers_size_and_density_exponents(self):
+        truth = CostModel(0.3, 1.7, 0.8)
+        shapes = [(n, m, d) for n in (10, 40, 160) for m in (20, 80) for d in (0.2, 0.6, 1.0)]
+        model = fit(timings(truth, shapes), prior("solve", "hammer"))
+        self.assertAlmostEqual(model.t_ref, truth.t_ref, places=6)
+        self.assertAlmostEqual(model.exposant, truth.exposant, places=6)
+        self.assertAlmostEqual(model.exposant_densite, truth.exposant_densite, places=6)
+        self.assertEqual(model.echantillons, len(shapes))
+
+    def test_single_size_only_moves_the_level(self):
+        # Every sample at one size: the slope stays the prior's, the level follows the data
+        base = CostModel(1.0, 1.5)
+        samples = [(100, 100, 1.0, 4.0)] * MIN_SAMPLES
+        model = fit(samples, base)
+        self.assertEqual(model.exposant, base.exposant)
+        self.assertAlmostEqual(model.estimate(100, 100), 4.0)
+        self.assertAlmostEqual(model.estimate(200, 100) / model.estimate(100, 100), 2 ** 1.5)
+
+    def test_implausible_slope_falls_back_to_the_prior_exponent(self):
+        # Larger problems measured faster (noise, cache effects): no negative exponent
+        samples = [(n, n, 1.0, 1.0 / n) for n in (10, 20, 40, 80, 160)]
+        model = fit(samples, CostModel(1.0, 2.0))
+        self.assertEqual(model.exposant, 2.0)
+
+    def test_estimate_scales_from_the_reference_size(self):
+        model = CostModel(2.0, 2.0, 1.0)
+        self.assertAlmostEqual(model.estimate(100, REFERENCE_CELLS // 100), 2.0)
+        self.assertAlmostEqual(model.estimate(200, REFERENCE_CELLS // 100, 0.5), 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
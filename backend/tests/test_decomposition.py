@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from solvers.decomposition import find_components, solve_decomposed, optimize_decomposed
+from solvers.cno import solve_coin_nord_ouest
+from solvers.hammer import solve_hammer
+from solvers.stepping_stone import solve_stepping_stone
+
+
+class TestDecomposition(unittest.TestCase):
+
+    def setUp(self):
+        # Two regional blocks: rows {0,1} x cols {0,1} and row {2} x cols {2,3}
+        self.offres = [20, 30, 25]
+        self.demandes = [25, 25, 10, 15]
+        self.couts = [
+            [4, 6, None, None],
+            [5, 3, None, None],
+            [None, None, 7, 2],
+        ]
+
+    def test_find_components(self):
+        components = find_components(self.couts)
+        self.assertEqual(components, [([0, 1], [0, 1]), ([2], [2, 3])])
+
+    def test_no_forbidden_route_is_a_single_block(self):
+        couts = [[1, 2], [3, 4]]
+        self.assertEqual(find_components(couts), [([0, 1], [0, 1])])
+        self.assertEqual(
+            solve_decomposed(solve_hammer, [20, 30], [20, 30], couts),
+            solve_hammer([20, 30], [20, 30], couts)
+        )
+
+    def test_stitched_allocation_respects_blocks(self):
+        result = solve_decomposed(solve_hammer, self.offres, self.demandes, self.couts)
+        allocation = result["allocation"]
+
+        for i in range(len(self.offres)):
+            for j in range(len(self.demandes)):
+                if self.couts[i][j] is None:
+                    self.assertIsNone(allocation[i][j], f"Forbidden route ({i},{j}) received an allocation")
+
+        for i, offre in enumerate(self.offres):
+            self.assertAlmostEqual(sum(v for v in allocation[i] if v is not None and v > 1e-3), offre)
+        # Block 2 is a single row: 10*7 + 15*2 = 100
+        block_cost = 10 * 7 + 15 * 2
+        block_1_cost = sum(
+            allocation[i][j] * self.couts[i][j]
+            for i in range(2) for j in range(2)
+            if allocation[i][j] is not None and allocation[i][j] > 1e-3
+        )
+        self.assertAlmostEqual(result["cout_total"], block_1_cost + block_cost, places=5)
+
+    def test_unbalanced_block_is_rejected(self):
+        offres = [30, 20, 25] # Block 1 ships 50 for 50 and block 2 25 for 25
+        demandes = [25, 25, 10, 15]
+        couts = [
+            [4, 6, None, None],
+            [5, 3, None, None],
+            [None, None, 7, 2],
+        ]
+        solve_decomposed(solve_hammer, offres, demandes, couts) # balanced: no error
+
+        demandes = [25, 20, 10, 20] # Global sum still matches, blocks do not
+        with self.assertRaises(ValueError):
+            solve_decomposed(solve_hammer, offres, demandes, couts)
+
+    def test_optimize_decomposed_reaches_block_optimum(self):
+        initial = solve_decomposed(solve_hammer, self.offres, self.demandes, self.couts)
+        optimized = optimize_decomposed(solve_stepping_stone, initial, self.offres, self.demandes, self.couts)
+        # Block 1 optimum: (0,0)=20, (1,0)=5, (1,1)=25 -> 80 + 25 + 75 = 180; block 2: 100
+        self.assertAlmostEqual(optimized["cout_total"], 280, places=2)
+        self.assertIsNone(optimized["allocation"][2][0])
+
+        self.assertTrue(all(v is None or v > 0 for row in optimized["allocation"] for v in row))
+
+    def test_no_flow_on_forbidden_routes(self):
+        # CNO ignores costs: its corner plan ships 10 on the forbidden (0, 0)
+        couts = [[None, 4], [5, 3]]
+        for solver in (solve_coin_nord_ouest, solve_hammer):
+            result = solve_decomposed(solver, [10, 15], [15, 10], couts)
+            self.assertIn(result["allocation"][0][0], (None, 1e-6))
+            self.assertEqual(result["allocation"][0][1], 10)
+            self.assertEqual(result["allocation"][1][0], 15)
+            self.assertAlmostEqual(result["cout_total"], 115)
+
+    def test_block_without_allowed_plan_is_rejected(self):
+        # Column 0 needs 20 but only row 1 (15) may serve it
+        with self.assertRaises(ValueError):
+            solve_decomposed(solve_hammer, [10, 15], [20, 5], [[None, 4], [5, 3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
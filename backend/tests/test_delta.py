@@ -0,0 +1,167 @@
+import unittest
+import random
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from solvers.hammer import solve_hammer
+from solvers.lean import solve_stepping_stone_lean, store_from_result, cost_buffer, result_from_store
+from solvers.delta import (
+    apply_cost_changes, plan_cost_after, still_optimal, reoptimize, allocation_changes, result_changes,
+    result_plan, plan_changes, apply_plan_changes, compose_changes, plan_result
+)
+
+
+def optimal_plan(offres, demandes, couts):
+    # Reference optimum: the lean Stepping Stone run to completion
+    cost = cost_buffer(couts, sum(offres))
+    return result_from_store(solve_stepping_stone_lean(store_from_result(solve_hammer(offres, demandes, couts), cost), cost), cost)
+
+
+def shipped(allocation, i, j):
+    value = allocation[i][j]
+    return value if value is not None and value > 1e-5 else 0
+
+
+class TestDeltaUpdates(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.n, self.m = 6, 7
+        self.couts = [[rng.randint(1, 30) for _ in range(self.m)] for _ in range(self.n)]
+        self.offres = [rng.randint(10, 40) for _ in range(self.n)]
+        self.demandes = [0] * self.m
+        for _ in range(sum(self.offres)):
+            self.demandes[rng.randrange(self.m)] += 1
+        self.plan = optimal_plan(self.offres, self.demandes, self.couts)
+
+    def test_apply_cost_changes_copies_only_edited_rows(self):
+        edited = apply_cost_changes(self.couts, [[2, 3, 99]])
+        self.assertEqual(edited[2][3], 99)
+        self.assertNotEqual(self.couts[2][3], 99)
+        self.assertIs(edited[0], self.couts[0])
+
+    def test_raising_an_unused_route_keeps_the_plan(self):
+        i, j = next((i, j) for i in range(self.n) for j in range(self.m) if self.plan["allocation"][i][j] is None)
+        changes = [[i, j, self.couts[i][j] + 50]]
+        self.assertTrue(still_optimal(self.plan["allocation"], self.couts, changes))
+        self.assertEqual(plan_cost_after(self.plan["allocation"], self.plan["cout_total"], self.couts, changes),
+                         self.plan["cout_total"])
+
+    def test_editing_a_used_route_reoptimizes_to_the_optimum(self):
+        i, j = next((i, j) for i in range(self.n) for j in range(self.m) if shipped(self.plan["allocation"], i, j))
+        changes = [[i, j, self.couts[i][j] + 40]]
+        self.assertFalse(still_optimal(self.plan["allocation"], self.couts, changes))
+        couts = apply_cost_changes(self.couts, changes)
+        result = reoptimize(self.plan["allocation"], couts, self.offres, self.demandes)
+        self.assertTrue(result["optimal"])
+        self.assertAlmostEqual(result["cout_total"], optimal_plan(self.offres, self.demandes, couts)["cout_total"], places=2)
+
+    def test_supply_deltas_reoptimize_to_the_optimum(self):
+        offres, demandes = list(self.offres), list(self.demandes)
+        offres[0] += 5
+        offres[3] -= 2
+        demandes[6] += 3
+        result = reoptimize(self.plan["allocation"], self.couts, offres, demandes)
+        self.assertTrue(result["optimal"])
+        allocation = result["allocation"]
+        self.assertEqual([round(sum(shipped(allocation, i, j) for j in range(self.m))) for i in range(self.n)], offres)
+        self.assertAlmostEqual(result["cout_total"], optimal_plan(offres, demandes, self.couts)["cout_total"], places=2)
+
+    def test_changes_list_only_modified_cells(self):
+        before = [[1.0, None], [None, 2.0]]
+        after = [[1.0, None], [3.0, None]]
+        self.assertEqual(allocation_changes(before, after), [[1, 0, 3.0], [1, 1, None]])
+        self.assertEqual(allocation_changes(before, before), [])
+
+        sparse_before = {"cellules": [[0, 0], [1, 1]], "flux": [1.0, 2.0]}
+        sparse_after = {"cellules": [[0, 0], [1, 0]], "flux": [1.0, 3.0]}
+        self.assertEqual(result_changes(sparse_before, sparse_after), [[1, 0, 3.0], [1, 1, None]])
+
+
+
+class TestResultHistoryDeltas(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.n, self.m = 8, 9
+        self.offres = [rng.randint(5, 20) for _ in range(self.n)]
+        self.demandes = [0] * self.m
+        for _ in range(sum(self.offres)):
+            self.demandes[rng.randrange(self.m)] += 1
+        self.couts = [[rng.randint(1, 40) for _ in range(self.m)] for _ in range(self.n)]
+
+    def test_dense_and_sparse_plans_round_trip(self):
+        initial = solve_hammer(self.offres, self.demandes, self.couts)
+        plan = result_plan(initial)
+        self.assertEqual(plan_result(plan, self.n, self.m, dense=True)["allocation"], initial["allocation"])
+        sparse = plan_result(plan, self.n, self.m, dense=False)
+        self.assertEqual(result_plan(sparse), plan)
+
+    def test_changes_rebuild_the_next_version(self):
+        initial = result_plan(solve_hammer(self.offres, self.demandes, self.couts))
+        optimal = result_plan(optimal_plan(self.offres, self.demandes, self.couts))
+        changes = plan_changes(initial, optimal)
+        self.assertLessEqual(len(changes), len(initial) + len(optimal))
+        self.assertEqual(apply_plan_changes(dict(initial), changes), optimal)
+        # Reversed, the changes go back
+        self.assertEqual(apply_plan_changes(dict(optimal), [[i, j, b, a] for i, j, a, b in changes]), initial)
+
+    def test_composed_changes_skip_the_versions_in_between(self):
+        v1 = {(0, 0): 5.0, (0, 1): 2.0, (1, 1): 3.0}
+        v2 = {(0, 0): 4.0, (0, 1): 3.0, (1, 1): 3.0}
+        v3 = {(0, 0): 5.0, (1, 0): 1.0, (1, 1): 3.0}
+        net = compose_changes([plan_changes(v1, v2), plan_changes(v2, v3)])
+        self.assertEqual(net, plan_changes(v1, v3))
+        self.assertEqual(net, [[0, 1, 2.0, None], [1, 0, None, 1.0]]) # (0, 0) went back to 5
+
+
+
+@unittest.skipUnless(os.getenv("TEST_DATABASE_URL"), "TEST_DATABASE_URL non défini")
+class TestEditedResult(unittest.TestCase):
+    # services.edited_result (PATCH); services.py sits on the database layer
+
+    def test_cost_edit_on_a_cno_plan_drops_its_potentials(self):
+        from types import SimpleNamespace
+        from services import edited_result, initial_result
+        from solvers.sensitivity import basis_potentials, sensitivity_analysis
+
+        offres, demandes = [20, 30, 25], [10, 25, 15, 25]
+        couts = [[4, 6, 9, 5], [7, 3, 8, 6], [5, 8, 4, 7]]
+        current = initial_result("cno", offres, demandes, couts)
+        current["potentiels"] = basis_potentials(current["allocation"], couts) # as a sensitivity run would leave them
+        task = SimpleNamespace(resultat=current, is_optimized=False, algo_utilise="cno", offres=offres, demandes=demandes)
+
+        changed = [row[:] for row in couts]
+        changed[0][0] += 5 # a basic cell: the North-West Corner plan stands, its duals do not
+        recalcul, result, _ = edited_result(task, couts, changed, [[0, 0, changed[0][0]]], False)
+        self.assertEqual(recalcul, "cout")
+        self.assertEqual(result["allocation"], current["allocation"])
+        self.assertNotIn("potentiels", result)
+        fresh = sensitivity_analysis(result["allocation"], changed)
+        self.assertEqual(sensitivity_analysis(result["allocation"], changed, result.get("potentiels")), fresh)
+        self.assertNotEqual(sensitivity_analysis(result["allocation"], changed, current["potentiels"]), fresh)
+
+    def test_cost_edit_on_an_assignment_is_solved_again(self):
+        from itertools import permutations
+        from types import SimpleNamespace
+        from services import edited_result, initial_result
+
+        offres = demandes = [1, 1, 1]
+        couts = [[4, 6, 9], [7, 3, 8], [5, 8, 4]]
+        current = initial_result("cno", offres, demandes, couts)
+        self.assertEqual(current["methode"], "hongroise")
+        task = SimpleNamespace(resultat=current, is_optimized=False, algo_utilise="cno", offres=offres, demandes=demandes)
+
+        changed = [row[:] for row in couts]
+        changed[1][1] = 50 # the optimal assignment used it
+        recalcul, result, _ = edited_result(task, couts, changed, [[1, 1, 50]], False)
+        self.assertEqual(recalcul, "complet")
+        best = min(sum(changed[i][j] for i, j in enumerate(p)) for p in permutations(range(3)))
+        self.assertAlmostEqual(result["cout_total"], best)
+
+
+if __name__ == '__main__':
+    unittest.main()
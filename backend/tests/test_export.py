@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import csv
+import io
+import json
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The export reads transport_tasks through a cursor: a disposable database, as in test_jobs.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL non défini")
+class TestTaskExport(unittest.TestCase):
+
+    def setUp(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from database import Base
+        from models import TransportTask
+
+        engine = create_engine(TEST_DATABASE_URL)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.sessions = sessionmaker(bind=engine)
+        db = self.sessions()
+        dense = {"allocation": [[3, None, 0.0], [None, 4, 1]], "cout_total": 25.0}
+        sparse = {"cellules": [[0, 0], [1, 2]], "flux": [2.0, 5.0], "cout_total": 12.0}
+        for k in range(7):
+            db.add(TransportTask(
+                nom=f"t{k}", offres=[3, 5], demandes=[3, 4, 1], couts=None, algo_utilise="hammer",
+                n_rows=2, n_cols=3, resultat=(dense, sparse, None)[k % 3],
+                cout_total=(25.0, 12.0, None)[k % 3], is_optimized=k % 2 == 0
+            ))
+        db.commit()
+        db.close()
+
+    def export(self, fmt, statement=None):
+        import export
+        return list(export.stream_export(self.sessions, statement if statement is not None else export.export_statement(), fmt))
+
+    def test_one_chunk_per_batch(self):
+        import export
+        size = export.EXPORT_BATCH_SIZE
+        export.EXPORT_BATCH_SIZE = 3
+        try:
+            chunks = self.export(export.NDJSON)
+        finally:
+            export.EXPORT_BATCH_SIZE = size
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [3, 3, 1])
+
+    def test_results_are_exported_sparse(self):
+        import export
+        records = [json.loads(line) for line in b"".join(self.export(export.NDJSON)).splitlines()]
+        self.assertEqual([r["nom"] for r in records], [f"t{k}" for k in range(7)])
+        # Basic cells of the dense allocation, degeneracy markers included
+        self.assertEqual(records[0]["cellules"], [[0, 0], [0, 2], [1, 1], [1, 2]])
+        self.assertEqual(records[0]["flux"], [3, 0.0, 4, 1])
+        self.assertEqual((records[1]["cellules"], records[1]["flux"]), ([[0, 0], [1, 2]], [2.0, 5.0]))
+        self.assertIsNone(records[2]["cellules"])
+        self.assertNotIn("allocation", records[0])
+
+    def test_filtered_csv(self):
+        import export
+        from models import TransportTask
+        statement = export.export_statement().filter(TransportTask.is_optimized == True)
+        rows = list(csv.reader(io.StringIO(b"".join(self.export(export.CSV, statement)).decode("utf-8"))))
+        self.assertEqual(tuple(rows[0]), export.EXPORT_FIELDS)
+        self.assertEqual([row[1] for row in rows[1:]], ["t0", "t2", "t4", "t6"])
+        self.assertEqual(json.loads(rows[1][export.EXPORT_FIELDS.index("cellules")]), [[0, 0], [0, 2], [1, 1], [1, 2]])
+
+    def test_arrow_and_parquet(self):
+        import export
+        if export.pa is None:
+            self.skipTest("pyarrow non installé")
+        table = export.pa.ipc.open_stream(b"".join(self.export(export.ARROW))).read_all()
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column("flux").to_pylist()[1], [2.0, 5.0])
+        parquet = export.pq.ParquetFile(io.BytesIO(b"".join(self.export(export.PARQUET))))
+        self.assertEqual(parquet.read().column("nom").to_pylist(), [f"t{k}" for k in range(7)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Versions and result columns live in transport_tasks / result_versions: a disposable database, as in test_jobs.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL non défini")
+class TestResultStorage(unittest.TestCase):
+
+    def setUp(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from database import Base
+
+        self.engine = create_engine(TEST_DATABASE_URL)
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        from database import Base
+        Base.metadata.drop_all(self.engine)
+        self.engine.dispose()
+
+    def add_task(self, db, result):
+        from models import TransportTask
+        task = TransportTask(
+            nom="t", offres=[3, 5], demandes=[3, 4, 1], couts=[[1, 2, 3], [4, 5, 6]], algo_utilise="hammer",
+            n_rows=2, n_cols=3, resultat=result, initial_result=result, cout_total=result["cout_total"]
+        )
+        db.add(task)
+        db.flush()
+        return task
+
+    def test_dense_allocation_is_stored_as_its_cells(self):
+        from sqlalchemy import text
+        from models import TransportTask
+
+        dense = {"allocation": [[3, None, 0.0], [None, 4, 1]], "cout_total": 29.0, "methode": None}
+        db = self.Session()
+        try:
+            task_id = self.add_task(db, dense).id
+            db.commit()
+            raw = db.execute(text("SELECT resultat FROM transport_tasks WHERE id = :id"), {"id": task_id}).scalar()
+            self.assertNotIn('"allocation"', raw if isinstance(raw, str) else str(raw))
+            db.expire_all()
+            self.assertEqual(db.get(TransportTask, task_id).resultat, dense)
+            # Light keys are still plain JSON keys for SQL extraction
+            self.assertEqual(db.query(TransportTask.resultat["cout_total"]).scalar(), 29.0)
+        finally:
+            db.close()
+
+    def test_cells_are_read_without_the_dense_rebuild(self):
+        from models import TransportTask, stored_result
+        from tiles import result_cells
+
+        dense = {"allocation": [[3, None, 0.0], [None, 4, 1]], "cout_total": 29.0}
+        db = self.Session()
+        try:
+            task_id = self.add_task(db, dense).id
+            db.commit()
+            stored = db.query(stored_result(TransportTask.resultat)).filter(TransportTask.id == task_id).scalar()
+            self.assertNotIn("allocation", stored)
+            cells = result_cells(stored)
+            self.assertEqual(list(zip(cells.rows.tolist(), cells.cols.tolist())), [(0, 0), (0, 2), (1, 1), (1, 2)])
+            self.assertEqual(cells.values.tolist(), [3.0, 0.0, 4.0, 1.0])
+        finally:
+            db.close()
+
+    def test_versions_are_numbered_per_task(self):
+        from history import EDITED, INITIAL, record_version
+        from models import ResultVersion
+
+        first = {"allocation": [[3, None, 0.0], [None, 4, 1]], "cout_total": 29.0}
+        second = {"allocation": [[3, 0.0, None], [None, 4, 1]], "cout_total": 29.0}
+        db = self.Session()
+        try:
+            task = self.add_task(db, first)
+            record_version(db, task, first, INITIAL)
+            db.flush()
+            record_version(db, task, second, EDITED)
+            db.commit()
+            rows = db.query(ResultVersion.version, ResultVersion.nb_modifications).order_by(ResultVersion.version).all()
+            self.assertEqual([tuple(row) for row in rows], [(1, 4), (2, 2)])
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
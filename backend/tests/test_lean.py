@@ -0,0 +1,178 @@
+import unittest
+import random
+import tracemalloc
+import tempfile
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from solvers.cno import solve_coin_nord_ouest
+from solvers.hammer import solve_hammer
+from solvers.stepping_stone import solve_stepping_stone
+from solvers.lean import (
+    cost_buffer, solve_coin_nord_ouest_lean, solve_hammer_lean, solve_stepping_stone_lean,
+    store_from_result, result_from_store, sparse_result, store_from_sparse
+)
+import solvers.basis as basis
+
+# Peak extra memory allowed for a whole lean pipeline, as a multiple of the raw cost matrix
+PEAK_MEMORY_FACTOR = 3
+
+
+def random_problem(rng, n, m, max_cost=20):
+    offres = [rng.randint(0, 30) for _ in range(n)]
+    demandes = [0] * m
+    for _ in range(sum(offres)):
+        demandes[rng.randrange(m)] += 1
+    couts = [[rng.randint(1, max_cost) for _ in range(m)] for _ in range(n)]
+    return offres, demandes, couts
+
+
+class TestLeanSolvers(unittest.TestCase):
+
+    def test_cost_buffer_shares_array_inputs(self):
+        couts = np.arange(12, dtype=np.int64).reshape(3, 4)
+        buffer = cost_buffer(couts)
+        self.assertTrue(np.shares_memory(buffer, couts))
+        self.assertFalse(buffer.flags.writeable)
+        self.assertTrue(couts.flags.writeable, "The caller's array must stay writable")
+
+    def test_lean_solvers_match_classic_ones(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            offres, demandes, couts = random_problem(rng, rng.randint(1, 7), rng.randint(1, 7), max_cost=9)
+            cost = cost_buffer(couts)
+            n, m = cost.shape
+
+            hammer, hammer_lean = solve_hammer(offres, demandes, couts), solve_hammer_lean(offres, demandes, cost)
+            flows = {(i, j): v for i, row in enumerate(hammer["allocation"]) for j, v in enumerate(row) if v and v > 1e-3}
+            flows_lean = {cell: q for cell, q in zip(hammer_lean["cellules"], hammer_lean["flux"]) if q > 0}
+            self.assertEqual(flows, flows_lean)
+            self.assertEqual(len(hammer_lean["cellules"]), n + m - 1)
+
+            cno_lean = solve_coin_nord_ouest_lean(offres, demandes, cost)
+            self.assertAlmostEqual(solve_coin_nord_ouest(offres, demandes, couts)["cout_total"], cno_lean["cout_total"])
+            self.assertEqual(len(cno_lean["cellules"]), n + m - 1)
+
+            optimal = solve_stepping_stone_lean(hammer_lean, cost)
+            self.assertTrue(optimal["optimal"])
+            self.assertAlmostEqual(optimal["cout_total"], solve_stepping_stone_lean(cno_lean, cost)["cout_total"])
+
+    def test_round_trip_with_dense_result(self):
+        offres, demandes, couts = random_problem(random.Random(3), 4, 5)
+        cost = cost_buffer(couts)
+        store = solve_hammer_lean(offres, demandes, cost)
+        dense = result_from_store(store, cost)
+        self.assertAlmostEqual(dense["cout_total"], store["cout_total"])
+        self.assertAlmostEqual(store_from_result(dense, cost)["cout_total"], store["cout_total"])
+
+    def test_resume_continues_the_iteration_count(self):
+        offres, demandes, couts = random_problem(random.Random(5), 12, 15)
+        cost = cost_buffer(couts)
+        start = solve_coin_nord_ouest_lean(offres, demandes, cost)
+        checkpoints = []
+        full_run = solve_stepping_stone_lean(start, cost, on_checkpoint=checkpoints.append, checkpoint_interval=0)
+        self.assertGreater(len(checkpoints), 2)
+        checkpoint = result_from_store(checkpoints[1], cost)
+        checkpoint["iteration"] = checkpoints[1]["iteration"]
+
+        resumed = []
+        store = store_from_result(checkpoint, cost)
+        self.assertEqual(store["iteration"], 2)
+        final = solve_stepping_stone_lean(store, cost, on_checkpoint=resumed.append, checkpoint_interval=0)
+        self.assertAlmostEqual(final["cout_total"], full_run["cout_total"])
+        self.assertEqual(resumed[0]["iteration"], 3)
+        # The budget covers the whole run: an exhausted one stops without pivoting
+        self.assertFalse(solve_stepping_stone_lean(store, cost, max_iterations=2)["optimal"])
+
+    def test_plan_with_a_cycle_keeps_every_shipment(self):
+        # The dense Stepping Stone leaves basis cells (3,5),(3,6),(4,5),(4,6) all shipping here
+        offres = [17, 25, 24, 26, 22, 8]
+        demandes = [13, 14, 29, 11, 18, 20, 17]
+        couts = [
+            [3, 20, 12, 19, 5, 14, 10], [17, 9, 15, 12, 14, 10, 14], [19, 14, 2, 14, 5, 7, 1],
+            [16, 20, 17, 14, 18, 8, 2], [15, 17, 10, 18, 11, 8, 3], [19, 10, 4, 8, 2, 2, 17],
+        ]
+        dense = solve_stepping_stone(solve_hammer(offres, demandes, couts), couts)
+        cost = cost_buffer(couts)
+        store = store_from_result(dense, cost)
+        self.assertEqual(len(store["cellules"]), len(offres) + len(demandes) - 1)
+        self.assertLessEqual(store["cout_total"], dense["cout_total"]) # split in the direction that does not cost more
+        flows = np.zeros(cost.shape)
+        for (i, j), q in zip(store["cellules"], store["flux"]):
+            flows[i, j] = q
+        np.testing.assert_allclose(flows.sum(axis=1), offres)
+        np.testing.assert_allclose(flows.sum(axis=0), demandes)
+
+    def test_peak_memory_stays_proportional_to_matrix(self):
+        rng = np.random.default_rng(0)
+        n, m = 300, 400
+        couts = rng.integers(1, 1000, size=(n, m), dtype=np.int64)
+        offres = rng.integers(1, 50, size=n).tolist()
+        demandes = np.bincount(rng.integers(0, m, size=sum(offres)), minlength=m).tolist()
+
+        tracemalloc.start()
+        try:
+            cost = cost_buffer(couts)
+            store = solve_hammer_lean(offres, demandes, cost)
+            solve_stepping_stone_lean(store, cost, max_iterations=50)
+            solve_coin_nord_ouest_lean(offres, demandes, cost)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, PEAK_MEMORY_FACTOR * couts.nbytes,
+                        f"Peak {peak} bytes for a {couts.nbytes} bytes matrix")
+
+
+class TestMemoryMappedCosts(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.offres, self.demandes, couts = random_problem(rng, 40, 55)
+        self.couts = np.array(couts, dtype=np.float32)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "couts.npy")
+        np.save(self.path, self.couts)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_mapped_matrix_solves_like_in_memory_one(self):
+        mapped = np.load(self.path, mmap_mode="r")
+        self.assertIsInstance(mapped, np.memmap)
+        in_memory = cost_buffer(self.couts)
+        for solver in (solve_coin_nord_ouest_lean, solve_hammer_lean):
+            expected = solve_stepping_stone_lean(solver(self.offres, self.demandes, in_memory), in_memory)
+            got = solve_stepping_stone_lean(solver(self.offres, self.demandes, mapped), mapped)
+            self.assertEqual(got["cellules"], expected["cellules"])
+            self.assertEqual(got["cout_total"], expected["cout_total"])
+
+    def test_sparse_result_round_trip(self):
+        cost = np.load(self.path, mmap_mode="r")
+        store = solve_hammer_lean(self.offres, self.demandes, cost)
+        result = sparse_result(store)
+        self.assertEqual(len(result["cellules"]), len(self.offres) + len(self.demandes) - 1)
+        restored = store_from_sparse(result, cost)
+        self.assertEqual(restored["cellules"], store["cellules"])
+        self.assertEqual(restored["cout_total"], store["cout_total"])
+
+    def test_chunked_pricing_keeps_the_same_pivots(self):
+        cost = cost_buffer(self.couts)
+        start = solve_coin_nord_ouest_lean(self.offres, self.demandes, cost)
+        expected = solve_stepping_stone_lean(start, cost)
+        chunk = basis.SCAN_CHUNK_CELLS
+        basis.SCAN_CHUNK_CELLS = 3 * self.couts.shape[1] + 1 # a few rows per chunk
+        try:
+            got = solve_stepping_stone_lean(start, cost)
+        finally:
+            basis.SCAN_CHUNK_CELLS = chunk
+        self.assertEqual(got["cellules"], expected["cellules"])
+        self.assertEqual(got["cout_total"], expected["cout_total"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import sys
+import os
+import random
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from loadtest import generate_instance, parse_mix, parse_sizes, percentile, summarize
+
+
+class TestLoadTestHelpers(unittest.TestCase):
+
+    def test_generated_instances_are_balanced_and_reproducible(self):
+        for n, m in [(1, 1), (3, 7), (20, 20)]:
+            instance = generate_instance(n, m, random.Random(42))
+            self.assertEqual(len(instance["offres"]), n)
+            self.assertEqual(len(instance["demandes"]), m)
+            self.assertEqual(sum(instance["offres"]), sum(instance["demandes"]))
+            self.assertTrue(all(d > 0 for d in instance["demandes"]))
+            self.assertEqual(instance, generate_instance(n, m, random.Random(42)))
+
+    def test_percentile_is_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([3.0], 90), 3.0)
+
+    def test_options_and_summary(self):
+        self.assertEqual(parse_mix("create=2,get"), {"create": 2, "get": 1})
+        self.assertEqual(parse_sizes("5x5,10X20"), [(5, 5), (10, 20)])
+        with self.assertRaises(SystemExit):
+            parse_mix("delete=1")
+
+        samples = [("GET /solve/{id}", "5x5", 200, 0.01), ("GET /solve/{id}", "5x5", 500, 0.5),
+                   ("GET /solve/{id}", "10x10", 200, 0.03)]
+        rows = {(r["endpoint"], r["taille"]): r for r in summarize(samples, elapsed=2.0)}
+        self.assertEqual(rows[("GET /solve/{id}", "*")]["requetes"], 3)
+        self.assertEqual(rows[("GET /solve/{id}", "5x5")]["erreurs"], 1)
+        self.assertEqual(rows[("GET /solve/{id}", "5x5")]["max_ms"], 10.0) # errors are not timed
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import random
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from solvers.basis import cost_array
+from solvers.hammer import solve_hammer
+from solvers.decomposition import solve_decomposed
+from solvers.lean import cost_buffer, result_from_store, solve_stepping_stone_lean, store_from_result
+from solvers.repricing import plan_costs, recertify
+
+
+def optimal_result(offres, demandes, couts):
+    # Reference optimum: the lean Stepping Stone run to completion, as in test_certificate.py
+    cost = cost_buffer(couts, sum(offres))
+    store = solve_stepping_stone_lean(store_from_result(solve_decomposed(solve_hammer, offres, demandes, couts), cost), cost)
+    return result_from_store(store, cost)
+
+
+def manual_cost(result, couts):
+    return sum(q * couts[i][j] for i, row in enumerate(result["allocation"]) for j, q in enumerate(row) if q)
+
+
+class TestRepricing(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(21)
+        self.n, self.m = 8, 9
+        self.couts = [[rng.randint(1, 40) for _ in range(self.m)] for _ in range(self.n)]
+        self.offres = [rng.randint(5, 30) for _ in range(self.n)]
+        self.demandes = [0] * self.m
+        for _ in range(sum(self.offres)):
+            self.demandes[rng.randrange(self.m)] += 1
+        self.result = optimal_result(self.offres, self.demandes, self.couts)
+        rng_new = random.Random(5)
+        self.new_couts = [[c + rng_new.randint(-3, 3) for c in row] for row in self.couts]
+
+    def test_batch_matches_a_manual_sum(self):
+        basis = [(i, j) for i, row in enumerate(self.result["allocation"]) for j, q in enumerate(row) if q is not None]
+        sparse = {
+            "cellules": [[i, j] for i, j in basis],
+            "flux": [self.result["allocation"][i][j] for i, j in basis],
+            "cout_total": self.result["cout_total"],
+        }
+        costs = plan_costs([self.result, sparse], cost_array(self.new_couts))
+        expected = round(manual_cost(self.result, self.new_couts), 2)
+        self.assertEqual(costs, [expected, expected])
+
+    def test_forbidden_route_in_the_plan_is_infeasible(self):
+        i, j = next((i, j) for i, row in enumerate(self.result["allocation"]) for j, q in enumerate(row) if q)
+        blocked = [row[:] for row in self.new_couts]
+        blocked[i][j] = None
+        self.assertEqual(plan_costs([self.result], cost_array(blocked)), [None])
+
+    def test_overlay_takes_precedence_over_the_matrix(self):
+        i, j = next((i, j) for i, row in enumerate(self.result["allocation"]) for j, q in enumerate(row) if q)
+        q = self.result["allocation"][i][j]
+        cost = cost_array(self.new_couts)
+        plain, edited, other = plan_costs([self.result] * 3, cost, [None, [[i, j, self.new_couts[i][j] + 10]], None])
+        self.assertAlmostEqual(edited - plain, round(10 * q, 2), places=2)
+        self.assertEqual(other, plain) # an overlay only applies to its own plan
+        self.assertEqual(plan_costs([self.result], cost, [[[i, j, None]]]), [None])
+
+    def test_recertify_detects_a_plan_no_longer_optimal(self):
+        kept = recertify(self.offres, self.demandes, self.couts, self.result)
+        self.assertTrue(kept["certificat"]["verifie"])
+
+        # An unused route becomes free: the plan should now use it
+        i, j = next((i, j) for i, row in enumerate(self.result["allocation"]) for j, q in enumerate(row) if q is None)
+        cheaper = [row[:] for row in self.couts]
+        cheaper[i][j] = 0
+        for row in cheaper:
+            row[:] = [c + 50 if c else c for c in row]
+        stale = recertify(self.offres, self.demandes, cheaper, self.result)
+        self.assertFalse(stale["certificat"]["verifie"])
+        self.assertEqual(stale["allocation"], self.result["allocation"]) # the plan itself is untouched
+
+
+
+@unittest.skipUnless(os.getenv("TEST_DATABASE_URL"), "TEST_DATABASE_URL non défini")
+class TestTariffChange(unittest.TestCase):
+    # tariffs.reprice_matrix walks the tasks of a shared matrix: a disposable database, as in test_matrices.py
+
+    def setUp(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from database import Base
+
+        self.engine = create_engine(os.getenv("TEST_DATABASE_URL"))
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        from database import Base
+        Base.metadata.drop_all(self.engine)
+        self.engine.dispose()
+
+    def test_infeasible_plan_is_flagged_not_solved(self):
+        from matrices import acquire_inline
+        from models import CostMatrix, SolverJob, TransportTask
+        from tariffs import INFEASIBLE_MESSAGE, reprice_matrix
+
+        couts = [[1, 2, 3], [4, 5, 6]]
+        result = {"allocation": [[3, None, 0.0], [None, 4, 1]], "cout_total": 29.0}
+        db = self.Session()
+        try:
+            task = TransportTask(
+                nom="t", offres=[3, 5], demandes=[3, 4, 1], couts=None, matrice_id=acquire_inline(db, couts, "t"),
+                algo_utilise="hammer", n_rows=2, n_cols=3, resultat=result, initial_result=result, cout_total=29.0
+            )
+            db.add(task)
+            db.commit()
+            task_id = task.id
+            matrix = db.get(CostMatrix, task.matrice_id)
+            report = reprice_matrix(db, matrix, [[None, 2, 3], [4, 5, 6]], check=False, apply=True)
+            db.commit()
+            self.assertTrue(report["taches"][0]["a_resoudre"])
+            task = db.get(TransportTask, task_id)
+            self.assertIsNone(task.resultat)
+            self.assertEqual(task.erreur_calcul, INFEASIBLE_MESSAGE)
+            self.assertEqual(db.query(SolverJob).count(), 0, "No solver runs on a tariff change")
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
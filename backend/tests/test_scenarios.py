@@ -0,0 +1,68 @@
+import unittest
+import random
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from solvers.hammer import solve_hammer
+from solvers.stepping_stone import solve_stepping_stone
+from solvers.scenarios import solve_scenarios, chain_order
+
+
+class TestScenarioBatch(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.n, self.m = 4, 5
+        self.couts = [[rng.randint(1, 20) for _ in range(self.m)] for _ in range(self.n)]
+        base = [rng.randint(10, 30) for _ in range(self.n)]
+        self.scenarios = []
+        for _ in range(8):
+            offres = [b + rng.randint(-3, 3) for b in base]
+            demandes = [0] * self.m
+            for _ in range(sum(offres)):
+                demandes[rng.randrange(self.m)] += 1
+            self.scenarios.append((offres, demandes))
+
+    def test_chain_order_visits_every_scenario_once(self):
+        vectors = np.array([o + d for o, d in self.scenarios], dtype=float)
+        order = chain_order(vectors)
+        self.assertEqual(sorted(index for index, _ in order), list(range(len(self.scenarios))))
+        self.assertIsNone(order[0][1])
+        solved = {order[0][0]}
+        for index, source in order[1:]:
+            self.assertIn(source, solved, "Warm start must come from an already solved scenario")
+            solved.add(index)
+
+    def test_results_are_feasible_and_not_worse_than_independent_solves(self):
+        results = solve_scenarios(self.couts, self.scenarios, solve_hammer)
+        self.assertEqual([r["index"] for r in results], list(range(len(self.scenarios))))
+        for result, (offres, demandes) in zip(results, self.scenarios):
+            self.assertTrue(result["optimal"])
+            self.assertTrue(result["realisable"])
+            supplied = [0.0] * self.n
+            received = [0.0] * self.m
+            cost = 0.0
+            for i, j, q in result["cellules"]:
+                supplied[int(i)] += q
+                received[int(j)] += q
+                cost += q * self.couts[int(i)][int(j)]
+            self.assertEqual(supplied, offres)
+            self.assertEqual(received, demandes)
+            self.assertAlmostEqual(cost, result["cout_total"], places=2)
+
+            independent = solve_stepping_stone(solve_hammer(offres, demandes, self.couts), self.couts)
+            self.assertLessEqual(result["cout_total"], independent["cout_total"] + 1e-6)
+
+    def test_unbalanced_scenario_is_rejected(self):
+        offres, demandes = self.scenarios[0]
+        with self.assertRaises(ValueError):
+            solve_scenarios(self.couts, [(offres, [d + 1 for d in demandes])], solve_hammer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+import time
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Idleness and pick-up state are shared through the database: a disposable one, as in test_jobs.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL non défini")
+class TestReoptimizationScheduler(unittest.TestCase):
+
+    def setUp(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from database import Base
+
+        self.engine = create_engine(TEST_DATABASE_URL)
+        Base.metadata.drop_all(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        from database import Base
+        Base.metadata.drop_all(self.engine)
+        self.engine.dispose()
+
+    def test_activity_of_another_process_keeps_it_busy(self):
+        import jobs
+        from scheduler import ActivityHeartbeat, RequestLoad, api_is_idle
+
+        load = RequestLoad() # the API process's counter, not the scheduler's
+        heartbeat = ActivityHeartbeat(self.Session, load)
+        db = self.Session()
+        try:
+            self.assertTrue(api_is_idle(db, 2))
+            load.begin()
+            heartbeat.publish()
+            self.assertFalse(api_is_idle(db, 2))
+            load.end()
+            load.last_activity = time.monotonic() - 10
+            heartbeat.publish()
+            db.rollback()
+            self.assertTrue(api_is_idle(db, 2))
+            jobs.enqueue(db, "solve", 1)
+            db.commit()
+            self.assertFalse(api_is_idle(db, 2), "Queued jobs go first")
+        finally:
+            db.close()
+
+    def test_uncertified_run_is_not_retried_until_edited(self):
+        from datetime import datetime
+        from models import ResultVersion, TransportTask
+        from scheduler import ReoptimizationScheduler
+
+        result = {"allocation": [[20, 0.0], [5, 25]], "cout_total": 130.0}
+        db = self.Session()
+        try:
+            task = TransportTask(
+                nom="t", offres=[20, 30], demandes=[25, 25], couts=[[1, 2], [3, 4]], algo_utilise="hammer",
+                n_rows=2, n_cols=2, resultat=result, initial_result=result, cout_total=130.0, is_optimized=False
+            )
+            db.add(task)
+            db.commit()
+            task_id, stamp = task.id, task.date_derniere_maj
+        finally:
+            db.close()
+
+        scheduler = ReoptimizationScheduler(self.Session, workers=0)
+        db = self.Session()
+        try:
+            self.assertEqual([t.id for t in scheduler._candidates(db, 5)], [task_id])
+        finally:
+            db.close()
+        # Same plan, no certificate: nothing stored, and the task is done
+        scheduler._store(task_id, stamp, {**result, "certificat": {"verifie": False}})
+        db = self.Session()
+        try:
+            self.assertEqual(db.query(ResultVersion).count(), 0)
+            self.assertEqual(scheduler._candidates(db, 5), [])
+            db.get(TransportTask, task_id).date_derniere_maj = datetime.utcnow()
+            db.commit()
+            self.assertEqual([t.id for t in scheduler._candidates(db, 5)], [task_id], "Edited: picked up again")
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
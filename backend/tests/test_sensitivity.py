@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from solvers.hammer import solve_hammer
+from solvers.stepping_stone import solve_stepping_stone
+from solvers.sensitivity import sensitivity_analysis, what_if, basis_potentials
+
+
+class TestSensitivityAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.offres = [30, 40, 50]
+        self.demandes = [20, 30, 30, 40]
+        self.couts = [
+            [8, 6, 10, 9],
+            [9, 12, 13, 7],
+            [14, 9, 16, 5],
+        ]
+        initial = solve_hammer(self.offres, self.demandes, self.couts)
+        self.optimal = solve_stepping_stone(initial, self.couts)
+        self.allocation = self.optimal["allocation"]
+
+    def resolve_cost(self, couts):
+        initial = solve_hammer(self.offres, self.demandes, couts)
+        return solve_stepping_stone(initial, couts)["cout_total"]
+
+    def test_potentials_price_basic_cells(self):
+        analysis = sensitivity_analysis(self.allocation, self.couts)
+        self.assertTrue(analysis["base_optimale"])
+        u = analysis["potentiels"]["offres"]
+        v = analysis["potentiels"]["demandes"]
+        for i, row in enumerate(self.allocation):
+            for j, val in enumerate(row):
+                if val is not None and val > 1e-7:
+                    self.assertAlmostEqual(u[i] + v[j], self.couts[i][j])
+                else:
+                    self.assertGreaterEqual(analysis["couts_reduits"][i][j], -1e-9)
+        self.assertEqual(basis_potentials(self.allocation, self.couts), analysis["potentiels"])
+
+    def test_cost_ranges_match_what_if(self):
+        analysis = sensitivity_analysis(self.allocation, self.couts)
+        scenarios = []
+        for i in range(len(self.offres)):
+            for j in range(len(self.demandes)):
+                low, high = analysis["cout_min"][i][j], analysis["cout_max"][i][j]
+                c = self.couts[i][j]
+                if low is not None:
+                    scenarios.append(((i, j), True, [(i, j, low - c + 0.5)]))
+                    scenarios.append(((i, j), False, [(i, j, low - c - 0.5)]))
+                if high is not None:
+                    scenarios.append(((i, j), True, [(i, j, high - c - 0.5)]))
+                    scenarios.append(((i, j), False, [(i, j, high - c + 0.5)]))
+
+        results = what_if(self.allocation, self.couts, [s[2] for s in scenarios])
+        for (cell, expected, _), result in zip(scenarios, results):
+            self.assertEqual(result["reste_optimal"], expected, f"Cell {cell}: {result}")
+
+    def test_what_if_cost_matches_resolve_when_optimal(self):
+        scenario = [(0, 1, 1.0), (2, 3, -1.0), (1, 0, 2.0)]
+        result = what_if(self.allocation, self.couts, [scenario])[0]
+        couts = [row[:] for row in self.couts]
+        for i, j, delta in scenario:
+            couts[i][j] += delta
+        if result["reste_optimal"]:
+            self.assertAlmostEqual(result["cout_total"], self.resolve_cost(couts), places=2)
+        else:
+            self.assertGreaterEqual(result["cout_total"], self.resolve_cost(couts) - 1e-6)
+
+    def test_what_if_rejects_out_of_range_cell(self):
+        with self.assertRaises(ValueError):
+            what_if(self.allocation, self.couts, [[(5, 0, 1.0)]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import io
+
+import numpy as np
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from serialization import MEDIA_JSON, MEDIA_NPZ, couts_to_json, decode_task, encode_task, negotiate
+from solvers.hammer import solve_hammer
+from solvers.lean import cost_buffer, result_from_store, solve_hammer_lean
+
+
+def npz_body(**arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+class TestBinaryPayloads(unittest.TestCase):
+
+    def setUp(self):
+        self.fields = dict(
+            nom=np.array("tache"),
+            algo_utilise=np.array("hammer"),
+            offres=np.array([30, 40, 50]),
+            demandes=np.array([20, 30, 30, 40]),
+            couts=np.array([[8, 6, 10, 9], [9, 12, 13, 7], [14, 9, 16, 5]], dtype=np.int32),
+        )
+
+    def test_decode_npz_keeps_typed_arrays(self):
+        task = decode_task(npz_body(**self.fields), MEDIA_NPZ)
+        self.assertEqual(task.nom, "tache")
+        self.assertEqual(task.couts.dtype, np.int64)
+        self.assertEqual(task.couts.shape, (3, 4))
+
+        cost = cost_buffer(task.couts, float(task.offres.sum()))
+        lean = result_from_store(solve_hammer_lean(task.offres, task.demandes, cost), cost)
+        reference = solve_hammer(task.offres.tolist(), task.demandes.tolist(), couts_to_json(task.couts))
+        self.assertAlmostEqual(lean["cout_total"], reference["cout_total"])
+
+    def test_nan_marks_forbidden_routes(self):
+        self.fields["couts"] = np.array([[8, np.nan, 10, 9], [9, 12, 13, 7], [14, 9, 16, 5]])
+        task = decode_task(npz_body(**self.fields), MEDIA_NPZ)
+        self.assertIsNone(couts_to_json(task.couts)[0][1])
+        self.assertEqual(couts_to_json(task.couts)[0][0], 8)
+
+    def test_rejects_bad_shape_and_values(self):
+        for key, value in [
+            ("couts", np.ones((3, 3), dtype=np.int64)),
+            ("couts", np.full((3, 4), 1.5)),
+            ("offres", np.array([[30, 40, 50]])),
+            ("algo_utilise", np.array("simplex")),
+        ]:
+            fields = dict(self.fields, **{key: value})
+            with self.assertRaises(ValueError, msg=key):
+                decode_task(npz_body(**fields), MEDIA_NPZ)
+        with self.assertRaises(ValueError):
+            decode_task(b"not an archive", MEDIA_NPZ)
+
+    def test_encode_npz_flattens_results(self):
+        payload = {
+            "id": 1,
+            "couts": [[1, None], [3, 4]],
+            "resultat": {"allocation": [[20, None], [5, 25]], "cout_total": 135.0},
+            "optimized_result": None,
+        }
+        with np.load(io.BytesIO(encode_task(payload, MEDIA_NPZ))) as archive:
+            self.assertEqual(set(archive.files), {"id", "couts", "resultat.allocation", "resultat.cout_total"})
+            self.assertTrue(np.isnan(archive["resultat.allocation"][0, 1]))
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate(None), MEDIA_JSON)
+        self.assertEqual(negotiate("*/*"), MEDIA_JSON)
+        self.assertEqual(negotiate("application/x-npz"), MEDIA_NPZ)
+        self.assertEqual(negotiate("application/json;q=0.5, application/x-npz;q=0.9"), MEDIA_NPZ)
+
+
+if __name__ == '__main__':
+    unittest.main()
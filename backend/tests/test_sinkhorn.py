@@ -0,0 +1,73 @@
+import unittest
+import random
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from solvers.sinkhorn import solve_sinkhorn, solve_sinkhorn_lean
+from solvers.decomposition import solve_decomposed
+from solvers.stepping_stone import solve_stepping_stone
+from solvers.hammer import solve_hammer
+from solvers.lean import cost_buffer, solve_stepping_stone_lean, store_from_result
+
+
+def optimum(offres, demandes, couts):
+    cost = cost_buffer(couts, sum(offres))
+    store = solve_stepping_stone_lean(store_from_result(solve_hammer(offres, demandes, couts), cost), cost)
+    return store["cout_total"]
+
+
+class TestSinkhorn(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.n, self.m = 25, 30
+        self.couts = [[rng.randint(1, 40) for _ in range(self.m)] for _ in range(self.n)]
+        self.offres = [rng.randint(0, 30) for _ in range(self.n)]
+        self.demandes = [0] * self.m
+        for _ in range(sum(self.offres)):
+            self.demandes[rng.randrange(self.m)] += 1
+
+    def assert_integral_basic_plan(self, result):
+        allocation = result["allocation"]
+        flows = [[v if v is not None and v > 1e-5 else 0 for v in row] for row in allocation]
+        self.assertEqual([sum(row) for row in flows], self.offres)
+        self.assertEqual([sum(col) for col in zip(*flows)], self.demandes)
+        self.assertTrue(all(float(q).is_integer() for row in flows for q in row))
+        self.assertEqual(sum(v is not None for row in allocation for v in row), self.n + self.m - 1)
+
+    def test_rounded_plan_is_feasible_and_bounded(self):
+        result = solve_sinkhorn(self.offres, self.demandes, self.couts, polish_pivots=0)
+        self.assert_integral_basic_plan(result)
+        best = optimum(self.offres, self.demandes, self.couts)
+        self.assertLessEqual(result["borne_duale"], best + 1e-6)
+        self.assertGreaterEqual(result["cout_total"], best - 1e-6)
+        self.assertAlmostEqual(result["ecart"], result["cout_total"] - result["borne_duale"], places=2)
+
+    def test_polish_reaches_the_optimum_with_zero_gap(self):
+        result = solve_sinkhorn(self.offres, self.demandes, self.couts)
+        self.assert_integral_basic_plan(result)
+        self.assertAlmostEqual(result["cout_total"], optimum(self.offres, self.demandes, self.couts), places=2)
+        self.assertEqual(result["ecart"], 0)
+        # The plan is a valid starting basis for Stepping Stone
+        self.assertAlmostEqual(solve_stepping_stone(result, self.couts)["cout_total"], result["cout_total"], places=2)
+
+    def test_forbidden_routes_are_never_used(self):
+        couts = [[1, 2, None], [4, None, 6], [None, 3, 2]]
+        result = solve_decomposed(solve_sinkhorn, [5, 5, 5], [5, 5, 5], couts)
+        for i, row in enumerate(result["allocation"]):
+            for j, value in enumerate(row):
+                if couts[i][j] is None:
+                    self.assertTrue(value is None or value < 1e-5)
+        self.assertEqual(result["cout_total"], 40)
+
+        store = solve_sinkhorn_lean([3, 0], [1, 2], np.array([[1.0, 2.0], [3.0, 4.0]]))
+        self.assertEqual(store["cout_total"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -244,6 +244,39 @@ class TestSteppingStoneSolver(unittest.TestCase):
 
         self.assertAlmostEqual(expected_cost_after_one_step, optimized_result["cout_total"], places=5)
 
+
+class TestSteppingStoneCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.couts = [
+            [19, 30, 50, 10],
+            [70, 30, 40, 60],
+            [40, 8, 70, 20],
+        ]
+        self.initial = solve_coin_nord_ouest([7, 9, 18], [5, 8, 7, 14], self.couts)
+
+    def test_resume_from_every_checkpoint(self):
+        checkpoints = []
+        full_run = solve_stepping_stone(self.initial, self.couts, on_checkpoint=checkpoints.append, checkpoint_interval=0)
+        self.assertGreater(len(checkpoints), 1)
+        self.assertEqual([c["iteration"] for c in checkpoints], list(range(1, len(checkpoints) + 1)))
+
+        for checkpoint in checkpoints:
+            resumed = solve_stepping_stone(checkpoint, self.couts)
+            self.assertAlmostEqual(resumed["cout_total"], full_run["cout_total"], places=5)
+            self.assertEqual(resumed["allocation"], full_run["allocation"])
+
+    def test_snapshots_are_copies(self):
+        checkpoints = []
+        solve_stepping_stone(self.initial, self.couts, on_checkpoint=checkpoints.append, checkpoint_interval=0)
+        self.assertNotEqual(checkpoints[0]["allocation"], checkpoints[-1]["allocation"])
+
+    def test_no_checkpoint_before_interval(self):
+        checkpoints = []
+        solve_stepping_stone(self.initial, self.couts, on_checkpoint=checkpoints.append, checkpoint_interval=3600)
+        self.assertEqual(checkpoints, [])
+
+
 if __name__ == '__main__':
     # To run with verbose solver logs, set DEBUG_SOLVER_LOGS = True at the top
     # Or, from command line:
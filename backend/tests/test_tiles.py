@@ -0,0 +1,38 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# tiles.py sits on the database layer (matrices.py, models.py): same setup as test_matrices.py.
+# The windows themselves are tested without a database in test_windows.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL non défini")
+class TestTiles(unittest.TestCase):
+
+    def setUp(self):
+        self.allocation = [[None] * 6 for _ in range(5)]
+        for i, j, q in [(0, 0, 3.0), (1, 2, 1e-6), (3, 4, 7.0), (4, 5, 2.0)]:
+            self.allocation[i][j] = q
+
+    def test_stored_and_loaded_results_give_the_same_cells(self):
+        from tiles import result_cells
+        stored = {"allocation_creuse": {"n_rows": 5, "n_cols": 6, "cellules": [[0, 0], [1, 2], [3, 4], [4, 5]], "flux": [3.0, 1e-6, 7.0, 2.0]}}
+        loaded, read = result_cells({"allocation": self.allocation}), result_cells(stored)
+        for got, expected in zip(read, loaded):
+            self.assertEqual(got.tolist(), expected.tolist())
+
+    def test_cells_are_loaded_once(self):
+        from tiles import cached_result_cells
+        loads = []
+        load = lambda: loads.append(1) or {"allocation": self.allocation}
+        cached_result_cells(("test", 1), load)
+        cached_result_cells(("test", 1), load)
+        self.assertEqual(len(loads), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import contextvars
+import json
+import sys
+import os
+
+# Adjust path to import modules from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import timing
+from timing import log_if_slow, note, stage, start_request
+
+
+def in_new_context(function):
+    # Each test is its own "request", as the middleware would make it
+    return lambda self: contextvars.copy_context().run(function, self)
+
+
+class TestRequestTimings(unittest.TestCase):
+
+    def test_stages_outside_a_request_do_nothing(self):
+        def outside():
+            with stage("solve"):
+                pass
+            note(n_rows=3)
+        contextvars.Context().run(outside) # no exception, nothing recorded anywhere
+
+    @in_new_context
+    def test_stages_add_up_in_the_header(self):
+        timings = start_request()
+        for _ in range(2):
+            with stage("solve"):
+                pass
+        with stage("db"):
+            pass
+        self.assertEqual(list(timings.stages), ["solve", "db"])
+        header = timings.header(12.34)
+        self.assertRegex(header, r"^solve;dur=\d+\.\d, db;dur=\d+\.\d, total;dur=12\.3$")
+
+    @in_new_context
+    def test_stage_is_timed_when_it_raises(self):
+        timings = start_request()
+        with self.assertRaises(ValueError):
+            with stage("solve"):
+                raise ValueError("x")
+        self.assertIn("solve", timings.stages)
+
+    @in_new_context
+    def test_slow_requests_are_logged_with_their_dimensions(self):
+        timings = start_request()
+        note(n_rows=2000, n_cols=1500)
+        with stage("solve"):
+            pass
+        with self.assertLogs("transport.slow_requests", level="WARNING") as logs:
+            log_if_slow(timings, "POST", "/solve/", 200, timing.SLOW_REQUEST_MS + 1)
+        line = json.loads(logs.output[0].split("Requête lente ", 1)[1])
+        self.assertEqual((line["chemin"], line["n_rows"], line["n_cols"]), ("/solve/", 2000, 1500))
+        self.assertIn("solve", line["etapes_ms"])
+
+        with self.assertNoLogs("transport.slow_requests"):
+            log_if_slow(timings, "GET", "/solve/1", 200, timing.SLOW_REQUEST_MS - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import solvers from the parent directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from solvers.windows import allocation_window, edited_window, plan_cells
+
+
+class TestWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.couts = [[i * 10 + j for j in range(6)] for i in range(5)]
+        self.allocation = [[None] * 6 for _ in range(5)]
+        for i, j, q in [(0, 0, 3.0), (1, 2, 1e-6), (3, 4, 7.0), (4, 5, 2.0)]:
+            self.allocation[i][j] = q
+
+    def test_cost_window_applies_the_task_edits(self):
+        window = edited_window(self.couts, [[1, 1, 99], [4, 0, None], [0, 5, 5]], 1, 3, 0, 3)
+        self.assertEqual(window, [[10, 99, 12], [20, 21, 22]])
+        self.assertEqual(self.couts[1][1], 11) # the shared matrix is never modified
+
+    def test_dense_and_sparse_results_give_the_same_windows(self):
+        dense = plan_cells({"allocation": self.allocation, "cout_total": 0})
+        sparse = plan_cells({"cellules": [[0, 0], [1, 2], [3, 4], [4, 5]], "flux": [3.0, 1e-6, 7.0, 2.0], "cout_total": 0})
+        expected = [row[2:5] for row in self.allocation[1:4]]
+        self.assertEqual(allocation_window(dense, 1, 4, 2, 5), expected)
+        self.assertEqual(allocation_window(sparse, 1, 4, 2, 5), expected)
+        self.assertIsNone(allocation_window(plan_cells(None), 0, 1, 0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+from typing import Any, List, Optional
+
+from matrices import Costs, LRUCache, MatrixFile, open_matrix
+from models import ResultJSON
+from solvers.windows import BasisCells, allocation_window, edited_window, plan_cells
+
+# Windows of a task's cost and allocation matrices (GET /solve/{id}/matrix), so the
+# detail page only ever moves the cells on screen. Costs come from the memory-mapped
+# file or the cached JSON matrix; a solution is reduced once to its basis cells
+# (n + m - 1 of them) and kept here, so each tile is a filter over those cells
+# instead of a parse of the whole stored allocation (the windows: solvers/windows.py).
+
+TILE_MAX_CELLS = int(os.getenv("TILE_MAX_CELLS", "250000")) # largest window one request may ask for
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "32"))   # solutions kept as basis cells per process
+
+# ?solution= values and the task column each one reads
+RESULT_COLUMNS = {"actif": "resultat", "initial": "initial_result", "optimise": "optimized_result"}
+MATRIX_KEYS = ("allocation", "cellules", "flux") # result keys that grow with n x m
+
+_cells = LRUCache(TILE_CACHE_SIZE) # keyed by (task id, date_derniere_maj, solution)
+
+
+def result_cells(result: Optional[dict]) -> Optional[BasisCells]:
+    """
+    The stored cells of a result: read as stored (models.stored_result), loaded
+    dense (allocation) or sparse (cellules/flux).
+    """
+    if not result:
+        return None
+    return plan_cells(result.get(ResultJSON.SPARSE_ALLOCATION_KEY) or result)
+
+
+def cached_result_cells(key: Any, load) -> Optional[BasisCells]:
+    """load() reads the result column, preferably as stored; only called when the cells are not cached."""
+    cells = _cells.get(key)
+    if cells is None:
+        cells = result_cells(load())
+        if cells is not None:
+            _cells.put(key, cells)
+    return cells
+
+
+def cost_window(costs: Costs, overlay: Optional[List[List]], row0: int, row1: int, col0: int, col1: int) -> List[List[Any]]:
+    """Costs of rows [row0, row1) x columns [col0, col1), with the task's own edits on top."""
+    if isinstance(costs, MatrixFile):
+        return open_matrix(costs)[row0:row1, col0:col1].tolist() # only these pages are read
+    return edited_window(costs, overlay, row0, row1, col0, col1)
@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# Per-request stage timings. The middleware in main.py opens a RequestTimings for each
+# request; the endpoints wrap their stages in `with stage("solve"):` and describe the
+# problem with note(n=..., m=...). The breakdown goes back in a Server-Timing header
+# (visible in the browser's network panel), and requests slower than SLOW_REQUEST_MS
+# are logged as one JSON line. Outside a request, stage() and note() do nothing.
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000")) # 0 logs every request
+
+logger = logging.getLogger("transport.slow_requests")
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {} # ms, summed when a stage runs more than once
+        self.fields: Dict[str, object] = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self, total_ms: float) -> str:
+        metrics = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        metrics.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(metrics)
+
+
+# The endpoint's threadpool copy of the context still points at the same object
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.stages[name] = timings.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def note(**fields) -> None:
+    """Problem dimensions and the like, for the slow-request log."""
+    timings = _current.get()
+    if timings is not None:
+        timings.fields.update(fields)
+
+
+def log_if_slow(timings: RequestTimings, method: str, path: str, status: int, total_ms: float) -> None:
+    if total_ms < SLOW_REQUEST_MS:
+        return
+    logger.warning("Requête lente %s", json.dumps({
+        "methode": method,
+        "chemin": path,
+        "statut": status,
+        "total_ms": round(total_ms, 1),
+        "etapes_ms": {name: round(ms, 1) for name, ms in timings.stages.items()},
+        **timings.fields,
+    }, ensure_ascii=False, default=str))
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+try: # Optional: much faster than the stdlib for large nested lists of numbers
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # update_task writes naive UTC datetimes, the database default is timezone-aware
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak validator built from cheap columns (id, date_derniere_maj, ...), never from the payload."""
+    tokens = []
+    for part in parts:
+        if isinstance(part, datetime):
+            part = int(_as_utc(part).timestamp() * 1_000_000)
+        tokens.append(str(part))
+    return 'W/"' + "-".join(tokens) + '"'
+
+
+def http_date(dt: datetime) -> str:
+    return format_datetime(_as_utc(dt), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} # always revalidate, but reuse on 304
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """RFC 9110: If-None-Match wins over If-Modified-Since when both are sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x"
+        bare = etag[2:] if etag.startswith("W/") else etag
+        return "*" in candidates or any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have a one-second resolution
+        return int(_as_utc(last_modified).timestamp()) <= int(_as_utc(since).timestamp())
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type {type(value).__name__} non sérialisable en JSON")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Compact UTF-8 JSON, with orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response that skips pydantic re-validation of the payload: the handler
+    returns plain dicts/lists and they are serialized once, with orjson if installed.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
@@ -0,0 +1,126 @@
+"""
+Standalone solver worker for the solver_jobs queue (jobs.py).
+
+    python worker.py                 # one worker
+    python worker.py --processes 4   # four worker processes on this machine
+    python worker.py --reoptimize 1  # also runs the background re-optimization (scheduler.py)
+
+Run it on as many machines as needed, all pointing at the same database (.env).
+SIGINT/SIGTERM stop the worker after the job in progress. Start --reoptimize in one
+process only: each scheduler polls the same tasks.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from database import SessionLocal, engine
+from jobs import JOB_LEASE_SECONDS, claim, execute, renew_lease
+from scheduler import REOPTIMIZE_WORKERS, ReoptimizationScheduler
+
+logger = logging.getLogger("worker")
+
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+
+class LeaseKeeper:
+    """Renews the lease of the running job until stopped, every third of its length."""
+
+    def __init__(self, job_id: int, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            db = SessionLocal()
+            try:
+                if not renew_lease(db, self.job_id, self.worker_id, self.lease_seconds):
+                    logger.warning("Job %s : bail perdu, le résultat sera ignoré", self.job_id)
+                    return
+            except Exception:
+                logger.exception("Job %s : renouvellement du bail échoué", self.job_id)
+            finally:
+                db.close()
+
+
+def work(stop: threading.Event, poll_seconds: float = JOB_POLL_SECONDS) -> None:
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info("Worker %s démarré", worker_id)
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            job = claim(db, worker_id)
+            job_id = job.id if job is not None else None
+        finally:
+            db.close()
+        if job_id is None:
+            stop.wait(poll_seconds)
+            continue
+        with LeaseKeeper(job_id, worker_id):
+            statut = execute(SessionLocal, job_id, worker_id)
+        logger.info("Job %s : %s", job_id, statut)
+    logger.info("Worker %s arrêté", worker_id)
+
+
+def _run_process(poll_seconds: float) -> None:
+    # Connections inherited through fork belong to the parent
+    engine.dispose(close=False)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    work(stop, poll_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker de la file de calcul (solver_jobs)")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKER_PROCESSES", "1")))
+    parser.add_argument("--poll", type=float, default=JOB_POLL_SECONDS, help="secondes entre deux scrutations d'une file vide")
+    parser.add_argument(
+        "--reoptimize", type=int, default=REOPTIMIZE_WORKERS,
+        help="processus de réoptimisation en arrière-plan (0 : désactivée)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    scheduler = ReoptimizationScheduler(SessionLocal, workers=args.reoptimize)
+    try:
+        _run_workers(args, scheduler)
+    finally:
+        scheduler.stop()
+
+
+def _run_workers(args, scheduler: ReoptimizationScheduler) -> None:
+    if args.processes <= 1:
+        scheduler.start()
+        _run_process(args.poll)
+        return
+    processes = [
+        multiprocessing.Process(target=_run_process, args=(args.poll,), name=f"worker-{k}")
+        for k in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    scheduler.start() # after the forks: the children must not inherit its thread's locks
+    # Children get the same SIGINT from the terminal; SIGTERM is forwarded
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
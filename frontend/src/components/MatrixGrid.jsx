@@ -0,0 +1,138 @@
+import React, { useCallback, useEffect, useRef, useState } from 'react'
+import { getTaskMatrixTile } from '@utils/transportService'
+
+// Virtualized view of a task's matrices: only the cells in the viewport are in the
+// DOM, and they come from GET /solve/{id}/matrix in fixed-size tiles, fetched on
+// scroll and kept until the task changes.
+
+const CELL_WIDTH = 130
+const CELL_HEIGHT = 36
+const HEADER_SIZE = 44
+const VIEWPORT_HEIGHT = 420
+const TILE_ROWS = 50
+const TILE_COLS = 20
+const OVERSCAN = 2 // extra rows / columns rendered around the viewport
+
+const EPSILON_VAL = 1e-6 // Same marker as the backend
+const IS_EPSILON_PRECISION = 1e-9
+
+const tileKey = (ti, tj) => `${ti}:${tj}`
+
+export const costCell = (cout) => ({ text: cout === null || cout === undefined ? '—' : cout, className: 'allocation-cell-allocated' })
+
+export const allocationCell = (cout, allocatedValue) => {
+  const unitCost = cout === null || cout === undefined ? 'N/A' : cout
+  if (allocatedValue !== null && Math.abs(allocatedValue - EPSILON_VAL) < IS_EPSILON_PRECISION) {
+    return { text: `ε (coût: ${unitCost})`, className: 'allocation-cell-epsilon' }
+  }
+  if (allocatedValue !== null && allocatedValue > 0) {
+    const formatted = Number.isInteger(allocatedValue) ? allocatedValue : parseFloat(allocatedValue).toFixed(2)
+    return { text: `${formatted} (coût: ${unitCost})`, className: 'allocation-cell-allocated' }
+  }
+  return { text: `0 (coût: ${unitCost})`, className: 'allocation-cell-not-allocated' }
+}
+
+const MatrixGrid = ({ taskId, nRows, nCols, solution = 'actif', version, renderCell = costCell }) => {
+  const tiles = useRef(new Map()) // tileKey -> tile, or 'loading'
+  const [, setLoadedCount] = useState(0)
+  const [scroll, setScroll] = useState({ top: 0, left: 0, width: 0 })
+  const [error, setError] = useState(null)
+  const viewport = useRef(null)
+
+  useEffect(() => {
+    tiles.current = new Map()
+    setLoadedCount(0)
+  }, [taskId, solution, version])
+
+  const onScroll = useCallback(() => {
+    const el = viewport.current
+    if (el) setScroll({ top: el.scrollTop, left: el.scrollLeft, width: el.clientWidth })
+  }, [])
+
+  useEffect(() => {
+    onScroll()
+    window.addEventListener('resize', onScroll)
+    return () => window.removeEventListener('resize', onScroll)
+  }, [onScroll])
+
+  const firstRow = Math.max(0, Math.floor(scroll.top / CELL_HEIGHT) - OVERSCAN)
+  const lastRow = Math.min(nRows, Math.ceil((scroll.top + VIEWPORT_HEIGHT) / CELL_HEIGHT) + OVERSCAN)
+  const firstCol = Math.max(0, Math.floor(scroll.left / CELL_WIDTH) - OVERSCAN)
+  const lastCol = Math.min(nCols, Math.ceil((scroll.left + (scroll.width || 900)) / CELL_WIDTH) + OVERSCAN)
+
+  useEffect(() => {
+    const wanted = []
+    for (let ti = Math.floor(firstRow / TILE_ROWS); ti * TILE_ROWS < lastRow; ti++) {
+      for (let tj = Math.floor(firstCol / TILE_COLS); tj * TILE_COLS < lastCol; tj++) {
+        if (!tiles.current.has(tileKey(ti, tj))) wanted.push([ti, tj])
+      }
+    }
+    wanted.forEach(([ti, tj]) => {
+      const cache = tiles.current
+      cache.set(tileKey(ti, tj), 'loading')
+      getTaskMatrixTile(taskId, { row0: ti * TILE_ROWS, rows: TILE_ROWS, col0: tj * TILE_COLS, cols: TILE_COLS, solution })
+        .then((tile) => {
+          if (cache !== tiles.current) return // task changed meanwhile
+          cache.set(tileKey(ti, tj), tile)
+          setLoadedCount((count) => count + 1) // a tile may land after further scrolling: always redraw
+        })
+        .catch((err) => {
+          console.error('Erreur lors du chargement de la matrice :', err)
+          cache.delete(tileKey(ti, tj))
+          setError('Impossible de charger une partie de la matrice.')
+        })
+    })
+  }, [taskId, solution, version, firstRow, lastRow, firstCol, lastCol])
+
+  const cells = []
+  for (let i = firstRow; i < lastRow; i++) {
+    for (let j = firstCol; j < lastCol; j++) {
+      const tile = tiles.current.get(tileKey(Math.floor(i / TILE_ROWS), Math.floor(j / TILE_COLS)))
+      const style = {
+        position: 'absolute',
+        top: HEADER_SIZE + i * CELL_HEIGHT,
+        left: HEADER_SIZE + j * CELL_WIDTH,
+        width: CELL_WIDTH,
+        height: CELL_HEIGHT,
+      }
+      if (!tile || tile === 'loading') {
+        cells.push(<div key={`${i}-${j}`} className="matrix-grid-cell matrix-grid-loading" style={style}>…</div>)
+        continue
+      }
+      const r = i - tile.row0
+      const c = j - tile.col0
+      const { text, className } = renderCell(tile.couts[r][c], tile.allocation ? tile.allocation[r][c] : null)
+      cells.push(<div key={`${i}-${j}`} className={`matrix-grid-cell ${className}`} style={style}>{text}</div>)
+    }
+  }
+
+  const headers = []
+  for (let i = firstRow; i < lastRow; i++) {
+    headers.push(
+      <div key={`r${i}`} className="matrix-grid-header" style={{ position: 'absolute', left: scroll.left, top: HEADER_SIZE + i * CELL_HEIGHT, width: HEADER_SIZE, height: CELL_HEIGHT }}>
+        O{i + 1}
+      </div>
+    )
+  }
+  for (let j = firstCol; j < lastCol; j++) {
+    headers.push(
+      <div key={`c${j}`} className="matrix-grid-header" style={{ position: 'absolute', top: scroll.top, left: HEADER_SIZE + j * CELL_WIDTH, width: CELL_WIDTH, height: HEADER_SIZE }}>
+        D{j + 1}
+      </div>
+    )
+  }
+
+  return (
+    <>
+      {error && <p className="error-message">{error}</p>}
+      <div ref={viewport} className="matrix-grid-viewport" style={{ height: VIEWPORT_HEIGHT }} onScroll={onScroll}>
+        <div style={{ position: 'relative', width: HEADER_SIZE + nCols * CELL_WIDTH, height: HEADER_SIZE + nRows * CELL_HEIGHT }}>
+          {cells}
+          {headers}
+        </div>
+      </div>
+    </>
+  )
+}
+
+export default MatrixGrid
@@ -79,6 +79,7 @@ const TaskForm = ({ initialData = null, onSubmit, isEditing }) => {
           <select id="algo" className="input-algo" value={algo} onChange={(e) => setAlgo(e.target.value)}>
             <option value="cno">Coin Nord-Ouest</option>
             <option value="hammer">Hammer</option>
+            <option value="sinkhorn">Sinkhorn (approché, grandes matrices)</option>
           </select>
         </div>
 
@@ -1,19 +1,43 @@
 import React, { useEffect, useState } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
-import { getTaskById, updateTask } from '@utils/transportService'
+import { getTaskById, patchTask, updateTask } from '@utils/transportService'
 import TaskForm from '@components/TaskForm'
 import Navbar from '@components/Navbar'
 
+// Cell-level edits between the loaded task and the form, or null when the
+// problem changed shape (dimensions, algorithm, stored matrix): then PUT resends it
+const taskEdits = (original, updated) => {
+  const sameShape = original.couts
+    && original.algo_utilise === updated.algo_utilise
+    && original.offres.length === updated.offres.length
+    && original.demandes.length === updated.demandes.length
+  if (!sameShape) return null
+  const couts = []
+  updated.couts.forEach((row, i) => row.forEach((cout, j) => {
+    if (original.couts[i][j] !== cout) couts.push({ i, j, cout })
+  }))
+  const offres = updated.offres
+    .map((value, i) => ({ i, delta: value - original.offres[i] }))
+    .filter(({ delta }) => delta !== 0)
+  const demandes = updated.demandes
+    .map((value, j) => ({ j, delta: value - original.demandes[j] }))
+    .filter(({ delta }) => delta !== 0)
+  return { couts, offres, demandes }
+}
+
 const EditTask = () => {
   const { id } = useParams()
   const navigate = useNavigate()
   const [initialData, setInitialData] = useState(null)
+  // TaskForm edits the cost rows in place: compare against an untouched copy
+  const [original, setOriginal] = useState(null)
   const [errorMessage, setErrorMessage] = useState(null)
 
   useEffect(() => {
     const fetchTask = async () => {
       try {
         const data = await getTaskById(id)
+        setOriginal(structuredClone(data))
         setInitialData(data)
       } catch (error) {
         console.error('Erreur de chargement :', error)
@@ -26,7 +50,12 @@ const EditTask = () => {
   const handleUpdate = async (updatedData) => {
     try {
       setErrorMessage(null)
-      await updateTask(id, updatedData)
+      const edits = taskEdits(original, updatedData)
+      if (edits === null) {
+        await updateTask(id, updatedData)
+      } else if (edits.couts.length || edits.offres.length || edits.demandes.length) {
+        await patchTask(id, edits) // only the edited cells travel, and only they are rewritten
+      }
       navigate(`/task/${id}`)
     } catch (error) {
       console.error('Erreur de mise à jour :', error)
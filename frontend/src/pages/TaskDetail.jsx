@@ -1,26 +1,40 @@
 import React, { useEffect, useState } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
-import { getTaskById, deleteTask, optimizeTaskWithSteppingStone } from '@utils/transportService' // Added optimizeTaskWithSteppingStone
+import { getTaskMetadata, getTaskVersions, deleteTask, optimizeTaskWithSteppingStone } from '@utils/transportService' // Added optimizeTaskWithSteppingStone
 import Navbar from '@components/Navbar'
+import MatrixGrid, { allocationCell, costCell } from '@components/MatrixGrid'
 import '@styles/TaskDetail.css';
 
+const ALGORITHM_LABELS = {
+  cno: 'Coin Nord-Ouest',
+  hammer: 'Hammer',
+  sinkhorn: 'Sinkhorn (approché)',
+}
+
+const VERSION_SOURCES = {
+  initial: 'Solution initiale',
+  optimise: 'Optimisation',
+  modification: 'Modification',
+}
+
 const TaskDetail = () => {
   const { id } = useParams()
   const navigate = useNavigate()
-  const [task, setTask] = useState(null) // Will hold the full task object
+  const [task, setTask] = useState(null) // Task metadata: the matrices are read by tiles (MatrixGrid)
   const [loading, setLoading] = useState(true)
   const [isOptimizing, setIsOptimizing] = useState(false) // For loading state during optimization
   // viewingOptimizedSolution will be true if task.is_optimized is true after fetching or optimization
   // and can be toggled by the user if is_optimized is true.
   const [viewingOptimizedSolution, setViewingOptimizedSolution] = useState(true)
   const [error, setError] = useState(null) // For displaying errors
+  const [versions, setVersions] = useState([]) // Result history, metadata only
 
   useEffect(() => {
     const fetchTask = async () => {
       setLoading(true)
       setError(null)
       try {
-        const data = await getTaskById(id)
+        const data = await getTaskMetadata(id)
         setTask(data)
         // If the fetched task is optimized, by default view the optimized solution.
         // Otherwise, this flag doesn't really matter until after an optimization is run.
@@ -40,6 +54,13 @@ const TaskDetail = () => {
     fetchTask()
   }, [id])
 
+  useEffect(() => {
+    if (!task) return
+    getTaskVersions(id)
+      .then(setVersions)
+      .catch((err) => console.error('Erreur lors du chargement de l\'historique :', err))
+  }, [id, task?.date_derniere_maj])
+
   const handleDelete = async () => {
     if (window.confirm('Voulez-vous vraiment supprimer cette tâche ?')) {
       try {
@@ -62,8 +83,8 @@ const TaskDetail = () => {
     setIsOptimizing(true);
     setError(null);
     try {
-      const updatedTaskData = await optimizeTaskWithSteppingStone(id);
-      setTask(updatedTaskData);
+      await optimizeTaskWithSteppingStone(id);
+      setTask(await getTaskMetadata(id));
       setViewingOptimizedSolution(true); // Default to viewing the new optimized solution
     } catch (err) {
       console.error('Erreur lors de l\'optimisation:', err);
@@ -87,7 +108,10 @@ const TaskDetail = () => {
     ? task.optimized_result
     : task.initial_result || task.resultat; // Fallback to initial_result, then to general resultat
 
-  const allocationMatrixToDisplay = currentDisplayResult?.allocation;
+  // Which stored allocation the grid reads (GET /solve/{id}/matrix?solution=...)
+  const displayedSolution = task.is_optimized && viewingOptimizedSolution && task.optimized_result
+    ? 'optimise'
+    : task.initial_result ? 'initial' : 'actif';
   const costToDisplay = currentDisplayResult?.cout_total;
 
   return (
@@ -97,7 +121,7 @@ const TaskDetail = () => {
       {error && <p className="error-message" style={{color: 'red', textAlign: 'center', marginBottom: '1rem'}}>{error}</p>}
       <h1 className="task-detail-header">Détails du projet : {task.nom}</h1>
 
-      <p className="info-paragraph"><strong className="info-label">Algorithme utilisé :</strong> {task.algo_utilise === 'cno' ? 'Coin Nord-Ouest' : 'Hammer'}</p>
+      <p className="info-paragraph"><strong className="info-label">Algorithme utilisé :</strong> {ALGORITHM_LABELS[task.algo_utilise] || task.algo_utilise}</p>
       <p className="info-paragraph"><strong className="info-label">Date de création :</strong> {new Date(task.date_creation).toLocaleString()}</p>
       <p className="info-paragraph">
         <strong className="info-label">Statut :</strong>
@@ -140,75 +164,34 @@ const TaskDetail = () => {
 
       <div className="detail-section">
         <h2 className="section-title">Coûts</h2>
-        <div className="detail-table-container">
-          <table className="detail-table">
-            <tbody>
-              {task.couts.map((row, i) => (
-                <tr key={i}>
-                  {row.map((val, j) => (
-                    <td key={j} className='allocation-cell-allocated'>{val}</td>
-                  ))}
-                </tr>
-              ))}
-            </tbody>
-          </table>
-        </div>
+        {task.matrice_id && (
+          <p className="info-paragraph">
+            Matrice de coûts enregistrée n° {task.matrice_id} ({task.offres.length} x {task.demandes.length})
+          </p>
+        )}
+        <MatrixGrid
+          taskId={task.id}
+          nRows={task.offres.length}
+          nCols={task.demandes.length}
+          version={task.date_derniere_maj}
+          renderCell={costCell}
+        />
       </div>
 
       {/* Display Allocation Table */}
-      {allocationMatrixToDisplay && Array.isArray(allocationMatrixToDisplay) && (
+      {currentDisplayResult && (
         <div className="detail-section">
           <h2 className="section-title">
             Allocation ({task.is_optimized ? (viewingOptimizedSolution ? 'Optimisée' : 'Initiale') : 'Initiale'})
           </h2>
-          <div className="detail-table-container">
-            <table className="detail-table">
-              <tbody>
-                {allocationMatrixToDisplay.map((row, i) => (
-                  <tr key={`alloc-row-${i}`}>
-                    {row.map((allocatedValue, j) => {
-                      // Ensure task.couts[i] and task.couts[i][j] are valid before accessing
-                      const unitCost = task.couts && task.couts[i] && task.couts[i][j] !== undefined
-                                       ? task.couts[i][j]
-                                       : 'N/A';
-                        const isEffectivelyZero = allocatedValue === null || allocatedValue === 0;
-                        // Define EPSILON based on the backend value
-                        const EPSILON_VAL = 1e-6;
-                        const IS_EPSILON_PRECISION = 1e-9; // Precision for comparing float
-
-                        // Check if the allocated value is our epsilon
-                        const isEpsilonAllocation =
-                          allocatedValue !== null &&
-                          Math.abs(allocatedValue - EPSILON_VAL) < IS_EPSILON_PRECISION;
-
-                        let displayValue;
-                        let cellClass = 'allocation-cell-not-allocated';
-
-                        if (isEpsilonAllocation) {
-                          displayValue = `ε (coût: ${unitCost})`;
-                          cellClass = 'allocation-cell-epsilon'; // New class for epsilon styling
-                        } else if (!isEffectivelyZero && allocatedValue > 0) {
-                          // Format to a reasonable number of decimal places if it's a float
-                          const formattedAllocatedValue = Number.isInteger(allocatedValue)
-                            ? allocatedValue
-                            : parseFloat(allocatedValue).toFixed(2);
-                          displayValue = `${formattedAllocatedValue} (coût: ${unitCost})`;
-                          cellClass = 'allocation-cell-allocated';
-                        } else {
-                          displayValue = `0 (coût: ${unitCost})`;
-                        }
-
-                        return (
-                          <td key={j} className={cellClass}>
-                            {displayValue}
-                          </td>
-                        );
-                      })}
-                    </tr>
-                  ))}
-                </tbody>
-              </table>
-            </div>
+          <MatrixGrid
+            taskId={task.id}
+            nRows={task.offres.length}
+            nCols={task.demandes.length}
+            solution={displayedSolution}
+            version={task.date_derniere_maj}
+            renderCell={allocationCell}
+          />
         </div>
       )}
 
@@ -221,6 +204,26 @@ const TaskDetail = () => {
             </strong>
             {typeof costToDisplay === 'number' ? costToDisplay.toFixed(2) : 'N/A'}
           </p>
+          {typeof currentDisplayResult?.ecart === 'number' && (
+            <p style={{marginTop: '0.5rem'}}>
+              <em className="info-label">(Solution approchée : au plus {currentDisplayResult.ecart.toFixed(2)} au-dessus
+              de l'optimum, borne inférieure {currentDisplayResult.borne_duale.toFixed(2)})</em>
+            </p>
+          )}
+          {currentDisplayResult?.certificat && (
+            <p style={{marginTop: '0.5rem'}}>
+              <em className="info-label">
+                {currentDisplayResult.certificat.verifie
+                  ? `(Optimalité certifiée : borne duale ${currentDisplayResult.certificat.borne_duale.toFixed(2)})`
+                  : '(Certificat d\'optimalité non vérifié)'}
+              </em>
+            </p>
+          )}
+          {currentDisplayResult?.methode === 'hongroise' && (
+            <p style={{marginTop: '0.5rem'}}>
+              <em className="info-label">(Problème d'affectation : solution optimale par la méthode hongroise)</em>
+            </p>
+          )}
           {task.is_optimized && task.initial_result?.cout_total !== undefined && task.optimized_result?.cout_total !== undefined && (
             <p style={{marginTop: '0.5rem'}}>
               <em className="info-label">(Coût Initial : {task.initial_result.cout_total.toFixed(2)},
@@ -230,6 +233,30 @@ const TaskDetail = () => {
         </div>
       )}
 
+      {versions.length > 0 && (
+        <div className="detail-section">
+          <h2 className="section-title">Historique des résultats</h2>
+          <div className="detail-table-container">
+            <table className="detail-table">
+              <thead>
+                <tr><th>Version</th><th>Origine</th><th>Coût total</th><th>Cellules modifiées</th><th>Date</th></tr>
+              </thead>
+              <tbody>
+                {versions.map((v) => (
+                  <tr key={v.version}>
+                    <td>{v.version}</td>
+                    <td>{VERSION_SOURCES[v.source] || v.source}</td>
+                    <td>{typeof v.cout_total === 'number' ? v.cout_total.toFixed(2) : 'N/A'}</td>
+                    <td>{v.nb_modifications}</td>
+                    <td>{v.date_creation ? new Date(v.date_creation).toLocaleString() : ''}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </div>
+      )}
+
       <div className="action-buttons-container">
         <button onClick={handleEdit} className="action-button edit-button">
           ✏️ Modifier
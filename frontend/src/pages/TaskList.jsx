@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react'
-import { getAllTasks } from '@utils/transportService'
+import { searchTasks } from '@utils/transportService'
 import { Link } from 'react-router-dom'
 
 import Table from '@mui/material/Table'
@@ -12,25 +12,53 @@ import Paper from '@mui/material/Paper'
 import Button from '@mui/material/Button'
 import Typography from '@mui/material/Typography'
 import Box from '@mui/material/Box'
+import TextField from '@mui/material/TextField'
+import MenuItem from '@mui/material/MenuItem'
+import TablePagination from '@mui/material/TablePagination'
 import Navbar from '@components/Navbar'
 import '@styles/TaskList.css';
 
+const EMPTY_FILTERS = {
+  nom: '',
+  algo_utilise: '',
+  is_optimized: '',
+  cout_min: '',
+  cout_max: '',
+  n_rows_min: '',
+  n_rows_max: '',
+  n_cols_min: '',
+  n_cols_max: '',
+  date_debut: '',
+  date_fin: '',
+}
+
+const SEARCH_DELAY_MS = 300
+
 const TaskList = () => {
   const [tasks, setTasks] = useState([])
+  const [total, setTotal] = useState(0)
+  const [filters, setFilters] = useState(EMPTY_FILTERS)
+  const [page, setPage] = useState(0)
+  const [rowsPerPage, setRowsPerPage] = useState(25)
 
+  // Filtering and paging happen on the server: only the current page is downloaded
   useEffect(() => {
-    const fetchTasks = async () => {
+    const timer = setTimeout(async () => {
       try {
-        const data = await getAllTasks()
+        const { tasks: data, total: count } = await searchTasks(filters, rowsPerPage, page * rowsPerPage)
         setTasks(data)
-        console.log('Tâches récentes récupérées :', data)
+        setTotal(count)
       } catch (error) {
-        console.error('Erreur lors de la récupération des tâches récentes :', error)
+        console.error('Erreur lors de la récupération des tâches :', error)
       }
-    }
+    }, SEARCH_DELAY_MS)
+    return () => clearTimeout(timer)
+  }, [filters, page, rowsPerPage])
 
-    fetchTasks()
-  }, [])
+  const updateFilter = (key) => (event) => {
+    setFilters((previous) => ({ ...previous, [key]: event.target.value }))
+    setPage(0)
+  }
 
   return (
     <>
@@ -40,6 +68,29 @@ const TaskList = () => {
         📋 Liste de mes projets
       </Typography>
 
+      <Box className="task-list-filters">
+        <TextField label="Nom" size="small" value={filters.nom} onChange={updateFilter('nom')} />
+        <TextField select label="Algorithme" size="small" value={filters.algo_utilise} onChange={updateFilter('algo_utilise')}>
+          <MenuItem value="">Tous</MenuItem>
+          <MenuItem value="cno">CNO</MenuItem>
+          <MenuItem value="hammer">HAMMER</MenuItem>
+          <MenuItem value="sinkhorn">SINKHORN</MenuItem>
+        </TextField>
+        <TextField select label="Optimisée" size="small" value={filters.is_optimized} onChange={updateFilter('is_optimized')}>
+          <MenuItem value="">Toutes</MenuItem>
+          <MenuItem value="true">Oui</MenuItem>
+          <MenuItem value="false">Non</MenuItem>
+        </TextField>
+        <TextField label="Coût min" type="number" size="small" value={filters.cout_min} onChange={updateFilter('cout_min')} />
+        <TextField label="Coût max" type="number" size="small" value={filters.cout_max} onChange={updateFilter('cout_max')} />
+        <TextField label="Lignes min" type="number" size="small" value={filters.n_rows_min} onChange={updateFilter('n_rows_min')} />
+        <TextField label="Lignes max" type="number" size="small" value={filters.n_rows_max} onChange={updateFilter('n_rows_max')} />
+        <TextField label="Colonnes min" type="number" size="small" value={filters.n_cols_min} onChange={updateFilter('n_cols_min')} />
+        <TextField label="Colonnes max" type="number" size="small" value={filters.n_cols_max} onChange={updateFilter('n_cols_max')} />
+        <TextField label="Créée après" type="date" size="small" InputLabelProps={{ shrink: true }} value={filters.date_debut} onChange={updateFilter('date_debut')} />
+        <TextField label="Créée avant" type="date" size="small" InputLabelProps={{ shrink: true }} value={filters.date_fin} onChange={updateFilter('date_fin')} />
+      </Box>
+
       {tasks.length === 0 ? (
         <Typography className="empty-task-list-message">Aucune tâche.</Typography>
       ) : (
@@ -49,6 +100,7 @@ const TaskList = () => {
               <TableRow>
                 <TableCell>Nom</TableCell>
                 <TableCell>Algorithme</TableCell>
+                <TableCell>Taille</TableCell>
                 <TableCell>Coût total</TableCell>
                 <TableCell>Date de création</TableCell>
                 <TableCell>Dernière mise à jour</TableCell>
@@ -60,6 +112,7 @@ const TaskList = () => {
                 <TableRow key={task.id}>
                   <TableCell>{task.nom}</TableCell>
                   <TableCell>{task.algo_utilise.toUpperCase()}</TableCell>
+                  <TableCell>{task.n_rows && task.n_cols ? `${task.n_rows} × ${task.n_cols}` : '—'}</TableCell>
                   <TableCell>{task.cout_total}</TableCell>
                   <TableCell>{new Date(task.date_creation).toLocaleString()}</TableCell>
                   <TableCell>
@@ -81,6 +134,19 @@ const TaskList = () => {
               ))}
             </TableBody>
           </Table>
+          <TablePagination
+            component="div"
+            count={total}
+            page={page}
+            onPageChange={(_, newPage) => setPage(newPage)}
+            rowsPerPage={rowsPerPage}
+            onRowsPerPageChange={(event) => {
+              setRowsPerPage(parseInt(event.target.value, 10))
+              setPage(0)
+            }}
+            rowsPerPageOptions={[10, 25, 50, 100]}
+            labelRowsPerPage="Lignes par page"
+          />
         </TableContainer>
       )}
     </Box>
@@ -2,10 +2,30 @@ import axios from 'axios'
 
 const SOLVE_API = 'http://127.0.0.1:8000/solve/'
 const TASKS_API = 'http://127.0.0.1:8000/tasks/'
+const JOBS_API = 'http://127.0.0.1:8000/jobs/'
+const MATRICES_API = 'http://127.0.0.1:8000/matrices/'
+const JOB_POLL_MS = 1000
 
-// 🔹 Créer une tâche (calcul immédiat)
+// 🔹 Attendre un calcul mis en file d'attente (réponse 202 : calcul estimé trop long pour la requête)
+const waitForJob = async (job) => {
+  while (job.statut === 'en_attente' || job.statut === 'en_cours') {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS))
+    job = (await axios.get(`${JOBS_API}${job.id}`)).data
+  }
+  if (job.statut === 'echoue') {
+    const detail = job.erreur || 'Le calcul a échoué.'
+    throw Object.assign(new Error(detail), { response: { data: { detail } } }) // same shape as an HTTP error
+  }
+  return job
+}
+
+// 🔹 Créer une tâche (calcul immédiat, ou via la file d'attente pour les gros problèmes)
 export const createTask = async (payload) => {
   const res = await axios.post(SOLVE_API, payload)
+  if (res.status === 202) {
+    const job = await waitForJob(res.data)
+    return getTaskById(job.task_id)
+  }
   return res.data
 }
 
@@ -15,12 +35,34 @@ export const getTaskById = async (id) => {
   return res.data
 }
 
+// 🔹 Métadonnées d'une tâche, sans les matrices de coûts ni d'allocation
+export const getTaskMetadata = async (id) => {
+  const res = await axios.get(`${SOLVE_API}${id}`, { params: { matrices: false } })
+  return res.data
+}
+
+// 🔹 Fenêtre des matrices d'une tâche
+// params : { row0, rows, col0, cols, solution: 'actif' | 'initial' | 'optimise' }
+// Réponse : { n_rows, n_cols, row0, col0, couts: [[...]], allocation: [[...]] | null }
+export const getTaskMatrixTile = async (id, params) => {
+  const res = await axios.get(`${SOLVE_API}${id}/matrix`, { params })
+  return res.data
+}
+
 // 🔹 Mettre à jour une tâche
 export const updateTask = async (id, payload) => {
   const res = await axios.put(`${SOLVE_API}${id}`, payload)
   return res.data
 }
 
+// 🔹 Modifier quelques cellules d'une tâche (coûts, écarts d'offres / demandes)
+// payload : { couts: [{ i, j, cout }], offres: [{ i, delta }], demandes: [{ j, delta }] }
+// Réponse : { recalcul, cout_total, is_optimized, allocation: [[i, j, valeur]] } (cellules modifiées)
+export const patchTask = async (id, payload) => {
+  const res = await axios.patch(`${SOLVE_API}${id}`, payload)
+  return res.data
+}
+
 // 🔹 Supprimer une tâche
 export const deleteTask = async (id) => {
   await axios.delete(`${SOLVE_API}${id}`)
@@ -32,9 +74,60 @@ export const getAllTasks = async () => {
   return res.data
 }
 
+// 🔹 Recherche filtrée et paginée côté serveur
+// filters : { nom, nom_prefixe, algo_utilise, is_optimized, cout_min, cout_max,
+//             n_rows_min, n_rows_max, n_cols_min, n_cols_max, date_debut, date_fin }
+export const searchTasks = async (filters = {}, limit = 25, offset = 0) => {
+  const params = { limit, offset }
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== '' && value !== null && value !== undefined) params[key] = value
+  })
+  const res = await axios.get(TASKS_API, { params })
+  return { tasks: res.data, total: Number(res.headers['x-total-count'] ?? res.data.length) }
+}
+
 // 🔹 Optimiser une tâche avec Stepping Stone
 export const optimizeTaskWithSteppingStone = async (taskId) => {
   const res = await axios.post(`${SOLVE_API}${taskId}/optimize/stepping-stone`)
+  if (res.status === 202) {
+    await waitForJob(res.data)
+    return getTaskById(taskId)
+  }
+  return res.data
+}
+
+// 🔹 Vérifier le certificat d'optimalité de la solution active (sans recalcul)
+// Réponse : { id, is_optimized, verifie, realisable, duale_realisable, ecarts_complementaires, cout_plan, borne_duale }
+export const verifyTask = async (taskId) => {
+  const res = await axios.post(`${SOLVE_API}${taskId}/verify`)
+  return res.data
+}
+
+// 🔹 Historique des résultats d'une tâche
+// Réponse : [{ version, source: 'initial' | 'optimise' | 'modification', cout_total, n_rows, n_cols, nb_modifications, date_creation }]
+export const getTaskVersions = async (taskId) => {
+  const res = await axios.get(`${SOLVE_API}${taskId}/versions`)
+  return res.data
+}
+
+// 🔹 Une version du résultat, reconstruite : { ...métadonnées, resultat: { allocation | cellules, flux, cout_total } }
+export const getTaskVersion = async (taskId, version) => {
+  const res = await axios.get(`${SOLVE_API}${taskId}/versions/${version}`)
+  return res.data
+}
+
+// 🔹 Cellules modifiées entre deux versions (depuis : par défaut la précédente)
+// Réponse : { depuis, version, cout_avant, cout_apres, modifications: [[i, j, avant, apres]] }
+export const getTaskVersionDiff = async (taskId, version, depuis) => {
+  const res = await axios.get(`${SOLVE_API}${taskId}/versions/${version}/diff`, { params: depuis ? { depuis } : {} })
+  return res.data
+}
+
+// 🔹 Nouveaux tarifs sur une matrice de coûts partagée : coût des plans de toutes ses tâches, sans recalcul
+// payload : { couts | modifications: [{ i, j, cout }], verifier_optimalite, appliquer }
+// Réponse : { matrice_id, nouvelle_matrice_id, applique, nb_taches, taches: [{ id, nom, cout_avant, cout_apres, realisable, optimal, a_resoudre }] }
+export const repriceMatrix = async (matrixId, payload) => {
+  const res = await axios.post(`${MATRICES_API}${matrixId}/tarifs`, payload)
   return res.data
 }
 